@@ -10,6 +10,7 @@ from PyQt6.QtGui import *
 from PyQt6.QtWidgets import *
 import threading
 
+from mainDir.errorClass.asyncLogger import rtLogger
 from mainDir.mainWindow import MainWindow
 
 # Define constants for colors
@@ -68,6 +69,8 @@ def main():
     def clean_up():
         # Assicurati di fermare tutti i thread e timer qui
         print("Eseguendo la pulizia prima di uscire.")
+        print(f"Realtime log: {rtLogger.getStats()}")
+        rtLogger.stop()  # svuota la coda dei log real-time
         app.quit()  # Chiude l'applicazione Qt
     # Prima di creare l'applicazione, imposta l'attributo DPI
     set_dpi_awareness()
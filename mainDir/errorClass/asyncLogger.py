@@ -0,0 +1,204 @@
+import atexit
+import logging
+import logging.handlers
+import queue
+import threading
+import time
+
+"""
+Logging per il percorso real-time (thread di cattura, tally, stderr di FFmpeg).
+
+I messaggi non vengono scritti dal thread che li produce: un QueueHandler li mette
+in una coda limitata e un QueueListener li scrive in background. Prima di entrare
+in coda ogni messaggio passa da un limitatore per chiave: una camera che fallisce
+a ogni frame o un encoder molto loquace producono al massimo `burst` righe ogni
+`interval` secondi per chiave, e la riga successiva riporta quante ne sono state
+soppresse. Se la coda è piena il messaggio viene scartato e contato, mai atteso.
+
+Uso:
+    from mainDir.errorClass.asyncLogger import rtLogger
+    rtLogger.warning("camera.readFailed", "Failed to read frame from camera", camera=0)
+
+Il testo finale è "messaggio | chiave=valore ...", così resta leggibile a console
+ma si può anche filtrare per campo.
+"""
+
+
+class RateLimiter:
+    """
+    Limitatore a finestra fissa per chiave.
+
+    :param burst: messaggi concessi per chiave in ogni finestra.
+    :param interval: durata della finestra in secondi.
+    """
+
+    def __init__(self, burst=5, interval=1.0, idleExpiry=60.0):
+        """
+        :param idleExpiry: secondi dopo cui una finestra ferma con messaggi soppressi da riportare
+                           viene comunque dimenticata.
+        """
+        self.burst = burst
+        self.interval = interval
+        self.idleExpiry = max(idleExpiry, interval)
+        self._windows = {}
+        self._lock = threading.Lock()
+        self._nextPurge = time.monotonic() + self.interval
+
+    def allow(self, key):
+        """
+        :return: (True se il messaggio può passare, numero di messaggi soppressi dall'ultimo passato)
+        """
+        now = time.monotonic()
+        with self._lock:
+            if now >= self._nextPurge:
+                self._purge(now)
+            window = self._windows.get(key)
+            if window is None or now - window[0] >= self.interval:
+                suppressed = window[2] if window else 0
+                self._windows[key] = [now, 1, 0]
+                return True, suppressed
+            if window[1] < self.burst:
+                window[1] += 1
+                suppressed, window[2] = window[2], 0
+                return True, suppressed
+            window[2] += 1
+            return False, 0
+
+    def _purge(self, now):
+        """
+        Toglie le finestre scadute (sotto lock): senza soppressi da riportare una finestra
+        scaduta equivale a nessuna finestra, quindi le chiavi non si accumulano.
+        """
+        self._windows = {key: window for key, window in self._windows.items()
+                         if now - window[0] < self.interval or (window[2] and now - window[0] < self.idleExpiry)}
+        self._nextPurge = now + self.interval
+
+    def __len__(self):
+        return len(self._windows)
+
+
+class StructuredFormatter(logging.Formatter):
+    """
+    Aggiunge al messaggio i campi strutturati del record (record.fields).
+    """
+
+    def format(self, record):
+        text = super().format(record)
+        fields = getattr(record, "fields", None)
+        if fields:
+            text += " | " + " ".join(f"{key}={value}" for key, value in fields.items())
+        return text
+
+
+class _DroppingQueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler che non blocca mai: a coda piena il record viene scartato e contato.
+    """
+
+    def __init__(self, logQueue):
+        super().__init__(logQueue)
+        self.dropped = 0
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class RealtimeLogger:
+    """
+    :param name: nome del logger Python sottostante.
+    :param maxQueue: dimensione massima della coda verso il thread di scrittura.
+    :param burst: messaggi per chiave per finestra.
+    :param interval: finestra del limitatore in secondi.
+    """
+
+    def __init__(self, name="openPyVision.realtime", maxQueue=10000, burst=5, interval=1.0):
+        self.logger = logging.getLogger(name)
+        self.logger.propagate = False
+        self.limiter = RateLimiter(burst, interval)
+        self._queue = queue.Queue(maxsize=maxQueue)
+        self._handler = _DroppingQueueHandler(self._queue)
+        self.logger.addHandler(self._handler)
+        self._listener = None
+        self.suppressed = 0
+        self.start()
+
+    def start(self, handlers=None):
+        """
+        Avvia (o riavvia con altri handler) il thread di scrittura.
+        Di default scrive su stderr come il logging di base dell'applicazione.
+        """
+        if self._listener is not None:
+            self._listener.stop()
+        if not handlers:
+            console = logging.StreamHandler()
+            handlers = [console]
+        for handler in handlers:
+            if handler.formatter is None or type(handler.formatter) is logging.Formatter:
+                handler.setFormatter(StructuredFormatter('%(asctime)s - %(levelname)s - %(message)s'))
+        self._listener = logging.handlers.QueueListener(self._queue, *handlers, respect_handler_level=True)
+        self._listener.start()
+
+    def stop(self):
+        """Svuota la coda e ferma il thread di scrittura."""
+        if self._listener is not None:
+            self._listener.stop()
+            self._listener = None
+
+    def setLevel(self, level):
+        self.logger.setLevel(level)
+
+    def isEnabledFor(self, level):
+        return self.logger.isEnabledFor(level)
+
+    def log(self, level, key, message, **fields):
+        """
+        :param level: livello logging.
+        :param key: chiave del limitatore, per esempio "camera.readFailed".
+        :param message: testo del messaggio (già formattato o costante).
+        :param fields: campi strutturati aggiunti in coda al messaggio.
+        """
+        if not self.logger.isEnabledFor(level):
+            return
+        allowed, suppressed = self.limiter.allow(key)
+        if not allowed:
+            self.suppressed += 1
+            return
+        fields['key'] = key
+        if suppressed:
+            fields['suppressed'] = suppressed
+        self.logger.log(level, message, extra={'fields': fields})
+
+    def debug(self, key, message, **fields):
+        self.log(logging.DEBUG, key, message, **fields)
+
+    def info(self, key, message, **fields):
+        self.log(logging.INFO, key, message, **fields)
+
+    def warning(self, key, message, **fields):
+        self.log(logging.WARNING, key, message, **fields)
+
+    def error(self, key, message, **fields):
+        self.log(logging.ERROR, key, message, **fields)
+
+    def getStats(self):
+        return {'queued': self._queue.qsize(), 'dropped': self._handler.dropped, 'suppressed': self.suppressed}
+
+
+# istanza condivisa per tutto il percorso real-time
+rtLogger = RealtimeLogger()
+atexit.register(rtLogger.stop)
+
+
+if __name__ == "__main__":
+    rtLogger.setLevel(logging.DEBUG)
+    start = time.perf_counter()
+    for i in range(100000):
+        rtLogger.warning("camera.readFailed", "Failed to read frame from camera", camera=0, frame=i)
+    elapsed = time.perf_counter() - start
+    print(f"{elapsed / 100000 * 1e6:.2f} us per call  {rtLogger.getStats()}")
+    time.sleep(1.1)
+    rtLogger.warning("camera.readFailed", "Failed to read frame from camera", camera=0)
+    rtLogger.stop()
@@ -13,10 +13,14 @@ class ErrorClass:
         def decorator(func):
             @wraps(func)
             def wrapper(*args, **kwargs):
-                logging.log(log_level, f"Executing {func.__name__} with args={args}, kwargs={kwargs}")
+                # niente formattazione di args (che possono essere frame interi) se il livello è spento
+                verbose = logging.getLogger().isEnabledFor(log_level)
+                if verbose:
+                    logging.log(log_level, f"Executing {func.__name__} with args={args}, kwargs={kwargs}")
                 try:
                     result = func(*args, **kwargs)
-                    logging.log(log_level, f"{func.__name__} completed successfully.")
+                    if verbose:
+                        logging.log(log_level, f"{func.__name__} completed successfully.")
                     return result
                 except Exception as e:
                     logging.error(f"Error in {func.__name__}: {e}")
@@ -0,0 +1,230 @@
+import logging
+import threading
+import time
+import traceback
+import weakref
+from functools import wraps
+
+import numpy as np
+
+"""
+Tracing leggero per i metodi che vengono chiamati a ogni frame.
+
+ErrorClass.log formatta args e kwargs a ogni chiamata, anche quando il livello di
+log è disabilitato, e tra gli argomenti ci sono frame numpy interi. TraceClass.trace
+invece:
+    - controlla logger.isEnabledFor prima di costruire qualsiasi stringa;
+    - quando logga, riassume gli array numpy (shape e dtype) invece di stamparli;
+    - conta chiamate e tempi in contatori per thread (threading.local), quindi
+      nessun lock sul percorso caldo; i contatori dei thread terminati vengono
+      sommati in un unico dizionario, così il registro non cresce con i thread;
+    - in modalità "sample" misura il tempo solo una chiamata ogni N.
+
+Le modalità sono globali e si cambiano a runtime con setMode:
+    "off"    -> solo la chiamata e la gestione delle eccezioni
+    "count"  -> conta le chiamate
+    "sample" -> conta tutte le chiamate e cronometra una chiamata ogni sampleEvery
+    "full"   -> conta e cronometra tutte le chiamate
+"""
+
+TRACE_MODES = ("off", "count", "sample", "full")
+
+
+class _ThreadToken:
+    """
+    Vive solo nel threading.local del thread: quando il thread termina viene liberato
+    e la weakref nel registro muore. Una weakref al threading.Thread non basta, perché
+    i QThread compaiono come _DummyThread, che restano "vivi" per sempre.
+    """
+    __slots__ = ("__weakref__",)
+
+
+def summarizeArg(value):
+    """
+    Rappresentazione breve di un argomento: gli array diventano shape/dtype.
+    """
+    if isinstance(value, np.ndarray):
+        return f"ndarray{value.shape}:{value.dtype}"
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return f"{type(value).__name__}[{len(value)}]"
+    text = repr(value)
+    return text if len(text) <= 80 else text[:77] + "..."
+
+
+class TraceClass:
+    """
+    :param mode: una di TRACE_MODES.
+    :param sampleEvery: in modalità "sample", ogni quante chiamate misurare il tempo.
+    """
+
+    def __init__(self, mode="sample", sampleEvery=64):
+        self.mode = mode
+        self.sampleEvery = sampleEvery
+        self._local = threading.local()
+        # (weakref al token del thread, nome del thread, contatori) per ogni thread vivo; il lock
+        # serve solo quando un thread nuovo registra il suo dizionario, non durante le chiamate
+        self._registry = []
+        # contatori sommati dei thread già terminati
+        self._retired = {}
+        self._registryLock = threading.Lock()
+
+    def setMode(self, mode, sampleEvery=None):
+        if mode not in TRACE_MODES:
+            raise ValueError(f"Unknown trace mode: {mode}")
+        self.mode = mode
+        if sampleEvery is not None:
+            self.sampleEvery = max(1, int(sampleEvery))
+
+    def getMode(self):
+        return self.mode
+
+    def _counters(self):
+        counters = getattr(self._local, "counters", None)
+        if counters is None:
+            counters = {}
+            token = _ThreadToken()
+            self._local.counters = counters
+            self._local.token = token
+            with self._registryLock:
+                self._pruneLocked()
+                self._registry.append((weakref.ref(token), threading.current_thread().name, counters))
+        return counters
+
+    def _pruneLocked(self):
+        """
+        Toglie dal registro i thread terminati sommando i loro contatori in _retired.
+        Va chiamato con _registryLock preso.
+        """
+        alive = []
+        for entry in self._registry:
+            if entry[0]() is not None:
+                alive.append(entry)
+                continue
+            # il thread è finito: nessuno scrive più in questi contatori
+            for name, stats in entry[2].items():
+                retired = self._retired.setdefault(name, [0, 0, 0, 0])
+                retired[0] += stats[0]
+                retired[1] += stats[1]
+                retired[2] += stats[2]
+                retired[3] = max(retired[3], stats[3])
+        self._registry = alive
+
+    def trace(self, log_level=logging.DEBUG, logger=None):
+        """
+        Decoratore da usare al posto di ErrorClass.log sui percorsi caldi.
+
+        :param log_level: livello dei messaggi di ingresso/uscita.
+        :param logger: logger da usare, di default il root logger.
+        """
+        log = logger or logging.getLogger()
+
+        def decorator(func):
+            name = func.__qualname__
+
+            @wraps(func)
+            def wrapper(*args, **kwargs):
+                mode = self.mode
+                verbose = log.isEnabledFor(log_level)
+                if verbose:
+                    log.log(log_level, "Executing %s with args=(%s), kwargs={%s}", name,
+                            ", ".join(summarizeArg(arg) for arg in args),
+                            ", ".join(f"{key}={summarizeArg(value)}" for key, value in kwargs.items()))
+                try:
+                    if mode == "off":
+                        result = func(*args, **kwargs)
+                    else:
+                        counters = self._counters()
+                        stats = counters.get(name)
+                        if stats is None:
+                            # [chiamate, chiamate cronometrate, ns totali, ns massimi]
+                            stats = [0, 0, 0, 0]
+                            counters[name] = stats
+                        stats[0] += 1
+                        if mode == "full" or (mode == "sample" and stats[0] % self.sampleEvery == 0):
+                            start = time.perf_counter_ns()
+                            result = func(*args, **kwargs)
+                            elapsed = time.perf_counter_ns() - start
+                            stats[1] += 1
+                            stats[2] += elapsed
+                            if elapsed > stats[3]:
+                                stats[3] = elapsed
+                        else:
+                            result = func(*args, **kwargs)
+                except Exception as e:
+                    log.error("Error in %s: %s", name, e)
+                    log.error(traceback.format_exc())
+                    raise
+                if verbose:
+                    log.log(log_level, "%s completed successfully.", name)
+                return result
+
+            return wrapper
+
+        return decorator
+
+    def getStats(self):
+        """
+        Somma i contatori di tutti i thread.
+
+        :return: {nome metodo: {'calls', 'timed', 'avgUs', 'maxUs', 'threads'}};
+                 i thread terminati compaiono come "exited".
+        """
+        with self._registryLock:
+            self._pruneLocked()
+            registry = [(threadName, counters) for _, threadName, counters in self._registry]
+            if self._retired:
+                registry.append(("exited", {name: list(stats) for name, stats in self._retired.items()}))
+        merged = {}
+        for threadName, counters in registry:
+            for name, stats in list(counters.items()):
+                calls, timed, total, peak = stats
+                entry = merged.setdefault(name, {'calls': 0, 'timed': 0, 'totalNs': 0, 'maxNs': 0, 'threads': []})
+                entry['calls'] += calls
+                entry['timed'] += timed
+                entry['totalNs'] += total
+                entry['maxNs'] = max(entry['maxNs'], peak)
+                entry['threads'].append(threadName)
+        result = {}
+        for name, entry in merged.items():
+            result[name] = {
+                'calls': entry['calls'],
+                'timed': entry['timed'],
+                'avgUs': round(entry['totalNs'] / entry['timed'] / 1000, 2) if entry['timed'] else 0.0,
+                'maxUs': round(entry['maxNs'] / 1000, 2),
+                'threads': entry['threads'],
+            }
+        return result
+
+    def reset(self):
+        """
+        Azzera i contatori. I dizionari restano registrati, così i thread
+        che li stanno usando continuano a scriverci senza ricrearli.
+        """
+        with self._registryLock:
+            self._pruneLocked()
+            self._retired.clear()
+            for _, _, counters in self._registry:
+                counters.clear()
+
+
+# Un'unica istanza condivisa, come error_logger in loggerClass.py
+tracer = TraceClass()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+
+    class Dummy:
+        @tracer.trace(log_level=logging.DEBUG)
+        def getFrame(self, frame):
+            return frame
+
+    dummy = Dummy()
+    frame = np.zeros((1080, 1920, 3), dtype=np.uint8)
+    for mode in TRACE_MODES:
+        tracer.setMode(mode)
+        tracer.reset()
+        start = time.perf_counter()
+        for _ in range(100000):
+            dummy.getFrame(frame)
+        print(f"{mode:7s} {(time.perf_counter() - start) * 10:.2f} us/call  {tracer.getStats()}")
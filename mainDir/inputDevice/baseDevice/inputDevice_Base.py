@@ -6,6 +6,8 @@ from PyQt6.QtGui import QFont
 from PyQt6.QtWidgets import *
 
 from mainDir.errorClass.loggerClass import ErrorClass
+from mainDir.errorClass.traceClass import tracer
+from mainDir.performance.stageTimer import stageTimer
 
 # Utilizziamo un'unica istanza di ErrorClass per i decoratori
 error_logger = ErrorClass()
@@ -27,6 +29,9 @@ class InputSignalThread(QThread):
         self.input_id = input_name
         self.input_object = input_object  # Oggetto input che acquisisce i frame
         self.running = False
+        # (numero di sequenza, frame): la coppia viene sostituita in blocco, quindi chi la legge
+        # da un altro thread vede sempre un numero e il suo frame
+        self._sequenced = (0, None)
 
 
     def run(self):
@@ -34,8 +39,14 @@ class InputSignalThread(QThread):
         Metodo principale del thread che cattura i frame dall'inputObject e dorme per ottenere ~60 FPS.
         """
         self.running = True
+        spanArgs = {'input': str(self.input_id)}
         while self.running:
-            self.input_object.captureFrame()  # Acquisisce un nuovo frame
+            with stageTimer.span("capture", args=spanArgs):
+                self.input_object.captureFrame()  # Acquisisce un nuovo frame
+            frame = self.input_object.getFrame()
+            if frame is not self._sequenced[1]:
+                # il numero cresce solo quando l'input produce davvero un frame nuovo
+                self._sequenced = (self._sequenced[0] + 1, frame)
             self.msleep(10)  # Circa 60 FPS (1000ms / 60fps = 16.67ms)
 
     @error_logger.log(log_level=logging.DEBUG)
@@ -54,6 +65,13 @@ class InputSignalThread(QThread):
         """
         return self.input_object.getFrame()
 
+    def getSequencedFrame(self):
+        """
+        Restituisce (numero di sequenza, frame): a parità di numero il frame è lo stesso,
+        così chi registra gli input può scartare i duplicati senza confrontare i pixel.
+        """
+        return self._sequenced
+
 
 class InputDevice_BaseClass(QObject):
     """
@@ -183,7 +201,7 @@ class InputDevice_BaseClass(QObject):
             logging.warning("Input object changed; thread stopped.")
         self.setThread(inputObject)
 
-    @error_logger.log(log_level=logging.DEBUG)
+    @tracer.trace(log_level=logging.DEBUG)
     def getInputObject(self):
         """
         Restituisce l'oggetto di input corrente.
@@ -201,7 +219,7 @@ class InputDevice_BaseClass(QObject):
         self._thread = InputSignalThread(self._name, inputObject)
         logging.info(f"Thread creato per {self._name} ({self._input_type_name}) alla posizione {self.input_position}.")
 
-    @error_logger.log(log_level=logging.DEBUG)
+    @tracer.trace(log_level=logging.DEBUG)
     def getThread(self):
         """
         Restituisce il thread attualmente associato all'input device.
@@ -279,7 +297,7 @@ class InputDevice_BaseClass(QObject):
             logging.info(f"Thread fermato per {self._name} ({self._input_type_name})")
 
 
-    @error_logger.log(log_level=logging.DEBUG)
+    @tracer.trace(log_level=logging.DEBUG)
     def captureFrame(self):
         """
         Cattura un frame dall'input object.
@@ -296,7 +314,7 @@ class InputDevice_BaseClass(QObject):
             logging.warning("Input object not set; cannot get frame.")
             return self.blackImage
 
-    @error_logger.log(log_level=logging.DEBUG)
+    @tracer.trace(log_level=logging.DEBUG)
     def getFrame(self):
         """
         Restituisce il frame corrente dall'input object.
@@ -313,7 +331,16 @@ class InputDevice_BaseClass(QObject):
             logging.warning("Input object not set; cannot get frame.")
             return self.blackImage
 
-    @error_logger.log(log_level=logging.DEBUG)
+    def getSequencedFrame(self):
+        """
+        Restituisce (numero di sequenza, frame) dell'ultimo frame nuovo dell'input object,
+        (None, None) se il thread non gira. Il numero riparte da 1 a ogni nuovo thread.
+        """
+        if self.getThread() and self.getThread().isRunning():
+            return self.getThread().getSequencedFrame()
+        return None, None
+
+    @tracer.trace(log_level=logging.DEBUG)
     def getFps(self):
         """
         Restituisce il frame rate attuale dell'input object.
@@ -6,6 +6,7 @@ from PyQt6.QtCore import *
 
 from mainDir.inputDevice.baseDevice.baseClass.baseClass_InputObject import InputObject_BaseClass
 from mainDir.errorClass.loggerClass import error_logger
+from mainDir.errorClass.traceClass import tracer
 
 
 class DesktopCapture(InputObject_BaseClass):
@@ -55,7 +56,7 @@ class DesktopCapture(InputObject_BaseClass):
         else:
             logging.debug("Camera was not initialized, nothing to release.")
 
-    @error_logger.log(log_level=logging.DEBUG)
+    @tracer.trace(log_level=logging.DEBUG)
     def captureFrame(self):
         """Captures a frame from the screen capture."""
         super().captureFrame()
@@ -70,7 +71,7 @@ class DesktopCapture(InputObject_BaseClass):
         else:
             logging.error("Camera is not initialized.")
 
-    @error_logger.log(log_level=logging.DEBUG)
+    @tracer.trace(log_level=logging.DEBUG)
     def resizeFrame(self, frame):
         """Resizes the frame to match the expected resolution."""
         logging.info(f"Resizing frame for screen {self.screenIndex}")
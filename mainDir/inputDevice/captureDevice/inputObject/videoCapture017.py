@@ -5,6 +5,7 @@ import cv2
 import numpy as np
 from PyQt6.QtCore import *
 
+from mainDir.errorClass.asyncLogger import rtLogger
 from mainDir.inputDevice.baseDevice.baseClass.baseClass_InputObject import InputObject_BaseClass
 from mainDir.inputDevice.baseDevice.baseClass.baseTest_videoApp import VideoApp
 from mainDir.inputDevice.captureDevice.inputObject.deviceFinder.deviceUpdater import DeviceUpdater
@@ -112,7 +113,8 @@ class VideoCapture017(InputObject_BaseClass):
         if self.camera and self.camera.isOpened():
             ret, frame = self.camera.read()
             if not ret:
-                print("Failed to read frame from camera")
+                rtLogger.warning(f"camera.{self.cameraIndex}.readFailed", "Failed to read frame from camera",
+                                 camera=self.cameraIndex)
                 self._frame = self.returnBlackFrame()
                 return
             # se il frame non è vuoto, ridimensiona il frame se necessario
@@ -121,14 +123,16 @@ class VideoCapture017(InputObject_BaseClass):
                 try:
                     self._frame = cv2.resize(frame, self.target_resolution, interpolation=cv2.INTER_AREA)
                 except Exception as e:
-                    print(f"Error resizing frame: {e}")
+                    rtLogger.error(f"camera.{self.cameraIndex}.resizeFailed", "Error resizing frame",
+                                   camera=self.cameraIndex, error=e)
                     self._frame = frame
             else:
                 # se non è necessario ridimensionare il frame, assegna il frame al frame attuale
                 self._frame = frame
         else:
             #se non riesce a aprire la camera, assegna un frame nero
-            print("Camera is not initialized.")
+            rtLogger.warning(f"camera.{self.cameraIndex}.notInitialized", "Camera is not initialized.",
+                             camera=self.cameraIndex)
             self._frame = self.returnBlackFrame()
 
     def getFrame(self):
@@ -0,0 +1,33 @@
+import logging
+
+from mainDir.inputDevice.baseDevice.inputDevice_Base import InputDevice_BaseClass, error_logger
+from mainDir.inputDevice.generatorDevice.inputObject.generator_LatencyPattern import LatencyPatternGenerator
+
+
+class InputDevice_LatencyGenerator(InputDevice_BaseClass):
+    """
+    An InputDevice is any input of the mixer.
+    It put together the thread, the input object and the graphic interface
+    and act as interface to the mixer.
+    This one has no graphic interface: it feeds the latency pattern
+    that performance/latencyDetector.py reads back along the chain.
+    """
+
+    @error_logger.log(log_level=logging.DEBUG)
+    def __init__(self, name, parent=None):
+        super().__init__(name, parent)
+        self.graphicInterface = None
+        self.setInputObject(LatencyPatternGenerator())
+
+    def getGenerator(self):
+        return self._input_object
+
+    @error_logger.log(log_level=logging.DEBUG)
+    def serialize(self):
+        data = super().serialize()
+        return data
+
+    @error_logger.log(log_level=logging.DEBUG)
+    def deserialize(self, data):
+        super().deserialize(data)
+        self._name = data["name"]
@@ -0,0 +1,30 @@
+import logging
+
+from mainDir.inputDevice.baseDevice.inputDevice_Base import InputDevice_BaseClass, error_logger
+from mainDir.inputDevice.generatorDevice.inputObject.generator_MovingPattern import MovingPatternGenerator
+
+
+class InputDevice_MovingPatternGenerator(InputDevice_BaseClass):
+    """
+    An InputDevice is any input of the mixer.
+    It put together the thread, the input object and the graphic interface
+    and act as interface to the mixer.
+    This one has no graphic interface: it is used by the load test harness
+    to fill the video hub with synthetic moving inputs.
+    """
+
+    @error_logger.log(log_level=logging.DEBUG)
+    def __init__(self, name, fps=60, parent=None):
+        super().__init__(name, parent)
+        self.graphicInterface = None
+        self.setInputObject(MovingPatternGenerator(label=f"IN {name}", fps=fps))
+
+    @error_logger.log(log_level=logging.DEBUG)
+    def serialize(self):
+        data = super().serialize()
+        return data
+
+    @error_logger.log(log_level=logging.DEBUG)
+    def deserialize(self, data):
+        super().deserialize(data)
+        self._name = data["name"]
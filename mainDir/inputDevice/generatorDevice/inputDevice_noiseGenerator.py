@@ -44,7 +44,11 @@ class InputDevice_NoiseGenerator(InputDevice_BaseClass):
             return
         if params:
             inputObject.setParams(params)
+        previous = self._input_object
         self.setInputObject(inputObject)
+        # il generatore sostituito non deve lasciare thread in background (es. il regeneratore della grana)
+        if previous is not None and hasattr(previous, "stop"):
+            previous.stop()
 
     def onTypeChanged(self, data):
         inputType = data.get('type', 'Random')
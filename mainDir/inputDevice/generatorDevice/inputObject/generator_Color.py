@@ -26,15 +26,20 @@ class ColorGenerator(InputObject_BaseClass):
             green = data.get('green', 0)
             blue = data.get('blue', 0)
             self.color = {'red': red, 'green': green, 'blue': blue}
-            self._frame[:, :] = [blue, green, red]
+            self._frame = self.colorFrame(blue, green, red)
         elif isinstance(data, tuple):
             red, green, blue = data
             self.color = {'red': red, 'green': green, 'blue': blue}
-            self._frame[:, :] = [blue, green, red]
+            self._frame = self.colorFrame(blue, green, red)
         else:
             print(f"Error setting color: {data}")
 
 
+    def colorFrame(self, blue, green, red):
+        # un array nuovo invece di riscrivere _frame: chi legge l'input (mixer, registrazione
+        # ISO) riconosce il cambio di colore dal numero di sequenza e non vede mai mezzo frame
+        return np.full((self.resolution.height(), self.resolution.width(), 3), (blue, green, red), dtype=np.uint8)
+
     @error_logger.log(log_level=logging.DEBUG)
     def generateRandomColor(self):
         # Genera un colore casuale come un dizionario con chiavi 'red', 'green', 'blue'
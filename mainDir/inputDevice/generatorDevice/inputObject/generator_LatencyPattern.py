@@ -0,0 +1,163 @@
+import time
+from functools import lru_cache
+
+import numpy as np
+from PyQt6.QtCore import *
+
+from mainDir.inputDevice.generatorDevice.inputObject.generator_SMPTE import SMPTEBarsGenerator
+
+"""
+Pattern per la misura della latenza glass-to-glass.
+
+Sopra le barre SMPTE viene disegnata una striscia di blocchi bianchi e neri
+(CODE_ROWS x CODE_COLUMNS) nell'angolo in alto a sinistra. Ogni blocco è un bit:
+
+    sync (4) | frame counter (32) | timestamp in microsecondi (32) | checksum (8) | padding (4)
+
+Il timestamp viene da time.perf_counter_ns, quindi è confrontabile solo all'interno
+dello stesso processo, che è esattamente il caso del detector (performance/latencyDetector.py).
+Le posizioni dei blocchi sono proporzionali alla dimensione del frame, così il codice
+si legge anche dopo un ridimensionamento (viewer, uscite scalate).
+"""
+
+CODE_ROWS = 2
+CODE_COLUMNS = 40
+CODE_BITS = CODE_ROWS * CODE_COLUMNS
+SYNC_BITS = np.array([1, 0, 1, 1], dtype=np.uint8)
+# frazione della larghezza del frame occupata da un blocco
+BLOCK_FRACTION = 1 / 80
+
+
+def clockMicros():
+    """
+    Orologio monotono in microsecondi, troncato a 32 bit come nel pattern.
+    """
+    return (time.perf_counter_ns() // 1000) & 0xFFFFFFFF
+
+
+def _uint32Bits(value):
+    return np.unpackbits(np.array([value & 0xFFFFFFFF], dtype='>u4').view(np.uint8))
+
+
+def _bitsToInt(bits):
+    return int.from_bytes(np.packbits(bits).tobytes(), 'big')
+
+
+def _checksum(counter, timestamp):
+    data = (counter & 0xFFFFFFFF).to_bytes(4, 'big') + (timestamp & 0xFFFFFFFF).to_bytes(4, 'big')
+    value = 0
+    for byte in data:
+        value ^= byte
+    return value
+
+
+def encodeBits(counter, timestamp):
+    """
+    Restituisce i CODE_BITS bit (0/1) che rappresentano counter e timestamp.
+    """
+    bits = np.zeros(CODE_BITS, dtype=np.uint8)
+    bits[0:4] = SYNC_BITS
+    bits[4:36] = _uint32Bits(counter)
+    bits[36:68] = _uint32Bits(timestamp)
+    bits[68:76] = np.unpackbits(np.array([_checksum(counter, timestamp)], dtype=np.uint8))
+    return bits
+
+
+def blockSize(width):
+    return max(4, int(round(width * BLOCK_FRACTION)))
+
+
+@lru_cache(maxsize=16)
+def _sampleGrid(height, width):
+    """
+    Coordinate dei punti campionati per ogni blocco: il centro e quattro punti
+    a un quarto di blocco dal centro. Calcolate una volta per risoluzione.
+    """
+    size = blockSize(width)
+    quarter = max(1, size // 4)
+    offsets = [(0, 0), (-quarter, 0), (quarter, 0), (0, -quarter), (0, quarter)]
+    ys = np.empty((CODE_BITS, len(offsets)), dtype=np.intp)
+    xs = np.empty((CODE_BITS, len(offsets)), dtype=np.intp)
+    for bit in range(CODE_BITS):
+        row, column = divmod(bit, CODE_COLUMNS)
+        cy = row * size + size // 2
+        cx = column * size + size // 2
+        for i, (dy, dx) in enumerate(offsets):
+            ys[bit, i] = min(height - 1, cy + dy)
+            xs[bit, i] = min(width - 1, cx + dx)
+    return ys, xs
+
+
+def drawLatencyCode(frame, counter, timestamp):
+    """
+    Disegna il codice nel frame (in place).
+    """
+    width = frame.shape[1]
+    size = blockSize(width)
+    bits = encodeBits(counter, timestamp).reshape(CODE_ROWS, CODE_COLUMNS) * np.uint8(255)
+    blocks = np.repeat(np.repeat(bits, size, axis=0), size, axis=1)
+    frame[:blocks.shape[0], :blocks.shape[1]] = blocks[:, :, None]
+    return frame
+
+
+def decodeLatencyCode(frame):
+    """
+    Legge counter e timestamp da un frame.
+    Restituisce None se il codice non c'è, se un blocco è ambiguo (per esempio
+    a metà di una dissolvenza) o se il checksum non torna.
+
+    :param frame: array numpy (h, w) o (h, w, canali).
+    :return: (counter, timestamp) oppure None
+    """
+    height, width = frame.shape[:2]
+    if width < CODE_COLUMNS * 4 or height < CODE_ROWS * blockSize(width):
+        return None
+    ys, xs = _sampleGrid(height, width)
+    levels = frame[ys, xs].reshape(CODE_BITS, -1).mean(axis=1)
+    if np.any((levels > 80) & (levels < 176)):
+        return None
+    bits = (levels >= 128).astype(np.uint8)
+    if not np.array_equal(bits[0:4], SYNC_BITS):
+        return None
+    counter = _bitsToInt(bits[4:36])
+    timestamp = _bitsToInt(bits[36:68])
+    if _bitsToInt(bits[68:76]) != _checksum(counter, timestamp):
+        return None
+    return counter, timestamp
+
+
+class LatencyPatternGenerator(SMPTEBarsGenerator):
+    """
+    Barre SMPTE con in sovrimpressione il codice di frame counter e timestamp.
+    Ogni captureFrame produce un nuovo frame con il counter incrementato e il
+    timestamp del momento della cattura.
+    """
+
+    def __init__(self, resolution=QSize(1920, 1080)):
+        super().__init__(resolution)
+        self._name = self.__class__.__name__
+        self._base = self._frame.copy()
+        self._buffers = [self._base.copy(), self._base.copy()]
+        self._buffer_index = 0
+        self.counter = 0
+        self.lastTimestamp = 0
+
+    def captureFrame(self):
+        super().captureFrame()
+        self.counter = (self.counter + 1) & 0xFFFFFFFF
+        self.lastTimestamp = clockMicros()
+        self._buffer_index ^= 1
+        frame = self._buffers[self._buffer_index]
+        np.copyto(frame, self._base)
+        drawLatencyCode(frame, self.counter, self.lastTimestamp)
+        self._frame = frame
+
+    def getCounter(self):
+        return self.counter
+
+    def serialize(self):
+        base_data = super().serialize()
+        return base_data
+
+    def deserialize(self, data):
+        super().deserialize(data)
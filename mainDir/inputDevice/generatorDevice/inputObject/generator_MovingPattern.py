@@ -0,0 +1,119 @@
+import time
+
+import cv2
+import numpy as np
+from PyQt6.QtCore import *
+
+from mainDir.inputDevice.baseDevice.baseClass.baseClass_InputObject import InputObject_BaseClass
+from mainDir.performance.memoryRegistry import memoryRegistry, framesBytes
+
+
+class MovingPatternGenerator(InputObject_BaseClass):
+    """
+    Generatore sintetico usato per i test di carico.
+    Produce un pattern di barre che scorre in orizzontale con un box che rimbalza,
+    in modo che ogni frame sia diverso dal precedente (come una camera vera) ma
+    senza il costo di generare rumore.
+
+    Il pattern viene calcolato una sola volta ed è largo il doppio del frame:
+    ogni nuovo frame è una finestra del pattern copiata in uno dei due buffer
+    preallocati, quindi non ci sono allocazioni per frame.
+
+    Args:
+        label (str): testo disegnato sul pattern per riconoscere l'input.
+        fps (float): frame rate a cui il generatore produce nuovi frame.
+        speed (int): pixel di scorrimento per frame.
+        resolution (QSize): risoluzione del frame.
+    """
+
+    def __init__(self, label="", fps=60, speed=8, resolution=QSize(1920, 1080)):
+        super().__init__(resolution)
+        self._name = self.__class__.__name__
+        self.resolution = resolution
+        self.label = str(label)
+        self.speed = speed
+        self.targetFps = fps
+        self.frame_index = 0
+        self._frame_period = 1.0 / fps if fps > 0 else 0
+        self._next_frame_time = time.perf_counter()
+        self._pattern = self.createPattern()
+        width, height = resolution.width(), resolution.height()
+        self._buffers = [np.zeros((height, width, 3), dtype=np.uint8) for _ in range(2)]
+        memoryRegistry.account("framePools", self, framesBytes(self._buffers), f"{self._name} {label}")
+        self._buffer_index = 0
+        self._box_size = height // 6
+        self.renderFrame()
+
+    def createPattern(self):
+        """
+        Crea il pattern di base: barre verticali colorate ripetute due volte
+        e l'etichetta dell'input.
+        """
+        width, height = self.resolution.width(), self.resolution.height()
+        pattern = np.zeros((height, width * 2, 3), dtype=np.uint8)
+        colors = [(191, 191, 191), (0, 191, 191), (191, 191, 0), (0, 191, 0),
+                  (191, 0, 191), (0, 0, 191), (191, 0, 0), (40, 40, 40)]
+        bar_width = max(1, width // len(colors))
+        for i in range(2 * len(colors)):
+            pattern[:, i * bar_width:(i + 1) * bar_width] = colors[i % len(colors)]
+        if self.label:
+            for offset in (0, width):
+                cv2.putText(pattern, self.label, (offset + 40, height - 60), cv2.FONT_HERSHEY_SIMPLEX,
+                            4, (255, 255, 255), 8, cv2.LINE_AA)
+        return pattern
+
+    def setFps(self, fps):
+        self.targetFps = fps
+        self._frame_period = 1.0 / fps if fps > 0 else 0
+
+    def captureFrame(self):
+        """
+        Produce un nuovo frame solo quando è passato un periodo del frame rate
+        impostato, così il generatore simula una sorgente a rate fisso
+        indipendentemente da quanto spesso gira il thread di acquisizione.
+        """
+        now = time.perf_counter()
+        if now < self._next_frame_time:
+            return
+        self._next_frame_time += self._frame_period
+        if now - self._next_frame_time > self._frame_period:
+            # siamo rimasti indietro di più di un frame: riallinea il clock
+            self._next_frame_time = now + self._frame_period
+        super().captureFrame()
+        self.frame_index += 1
+        self.renderFrame()
+
+    def renderFrame(self):
+        width, height = self.resolution.width(), self.resolution.height()
+        offset = (self.frame_index * self.speed) % width
+        self._buffer_index ^= 1
+        frame = self._buffers[self._buffer_index]
+        np.copyto(frame, self._pattern[:, offset:offset + width])
+        # box che rimbalza in verticale per avere movimento su due assi
+        span = max(1, height - self._box_size)
+        y = abs((self.frame_index * self.speed) % (2 * span) - span)
+        x = (self.frame_index * self.speed * 2) % max(1, width - self._box_size)
+        frame[y:y + self._box_size, x:x + self._box_size] = 255
+        self._frame = frame
+
+    def serialize(self):
+        base_data = super().serialize()
+        base_data.update({
+            'label': self.label,
+            'fps': self.targetFps,
+            'speed': self.speed
+        })
+        return base_data
+
+    def deserialize(self, data):
+        super().deserialize(data)
+        self.label = data.get('label', self.label)
+        self.speed = data.get('speed', self.speed)
+        self.setFps(data.get('fps', self.targetFps))
+        self._pattern = self.createPattern()
+
+    def setParams(self, params):
+        if 'fps' in params:
+            self.setFps(params['fps'])
+        if 'speed' in params:
+            self.speed = params['speed']
@@ -1,11 +1,12 @@
 import logging
-import random
-import cv2
+from functools import partial
+
 import numpy as np
 from PyQt6.QtCore import *
-import threading
 from mainDir.inputDevice.baseDevice.baseClass.baseClass_InputObject import InputObject_BaseClass
 from mainDir.errorClass.loggerClass import error_logger
+from mainDir.inputDevice.generatorDevice.inputObject.noiseEngine import NoiseEngine, TileRegenerator, grainTile
+from mainDir.performance.memoryRegistry import memoryRegistry
 
 
 class GrainGenerator(InputObject_BaseClass):
@@ -16,33 +17,66 @@ class GrainGenerator(InputObject_BaseClass):
         self._name = self.__class__.__name__  # Nome della classe per identificare l'oggetto
         self.resolution = resolution  # Risoluzione del frame
         self._grain_size = 3  # Dimensione del grano del rumore
-        self._r_speed = 2  # Velocità di scorrimento del canale rosso
-        self._g_speed = 1  # Velocità di scorrimento del canale verde
-        self._b_speed = 3  # Velocità di scorrimento del canale blu
-        self._r_offset = 2  # Offset iniziale del canale rosso
-        self._g_offset = 0  # Offset iniziale del canale verde
-        self._b_offset = 4  # Offset iniziale del canale blu
-        self._frame = np.zeros((resolution.height(), resolution.width(), 3), dtype=np.uint8)  # Frame iniziale vuoto
-        # Il generatore è un po' lento, quindi genera 120 frame in anticipo
-        self.num_frames = 60  # Numero di frame da pre-generare
-        self.frames = []  # Lista per i frame pre-generati
-        self.current_frame_index = 0  # Indice del frame corrente
+        self._r_speed = 2  # Velocità di scorrimento orizzontale della grana
+        self._g_speed = 1  # Velocità di scorrimento verticale della grana
+        self._r_offset = 2  # Offset iniziale orizzontale
+        self._g_offset = 0  # Offset iniziale verticale
         self.capture_counter = 0  # Contatore delle catture per determinare quando cambiare il frame
         self.update_interval = 5  # Cambia frame ogni 5 catture
+        # Il frame viene composto da un piccolo banco di tile di grana invece che da 60 frame pre-generati.
+        # Il regeneratore costruisce ogni volta un banco nuovo, che sostituisce quello in uso.
+        self._build_rng = np.random.default_rng()
+        self.engine = self.createEngine(self.getGrainParams())
+        self.accountMemory()
+        self._frame = self.engine.nextFrame()
+        self._regenerator = TileRegenerator(self.buildGrain, self.installGrain, "GrainRegenerator")
+
+    def getGrainParams(self):
+        return {
+            'grain_size': self._grain_size,
+            'r_speed': self._r_speed,
+            'g_speed': self._g_speed,
+            'r_offset': self._r_offset,
+            'g_offset': self._g_offset,
+        }
 
-        # Avvia un thread per generare i frame iniziali
-        self.generate_initial_frames_thread = threading.Thread(target=self.generate_initial_frames, daemon=True)
-        self.generate_initial_frames_thread.start()
+    def createEngine(self, params):
+        """
+        Crea un motore di rumore con i parametri della grana indicati.
+        """
+        engine = NoiseEngine(self.resolution, partial(grainTile, grainSize=params['grain_size']),
+                             align=params['grain_size'])
+        engine.setDrift(params['r_speed'], params['g_speed'], params['r_offset'], params['g_offset'])
+        return engine
+
+    def accountMemory(self):
+        memoryRegistry.account("noiseBanks", self, self.engine.nbytes, self._name)
+
+    def buildGrain(self, params):
+        """
+        Eseguito dal regeneratore in background. Se cambia solo la velocità o l'offset
+        basta rigenerare i tile; se cambia la dimensione della grana cambia anche la
+        griglia, quindi serve un motore nuovo.
+        I tile vanno in un banco appena allocato e mai in quello sostituito alla build
+        precedente: nextFrame potrebbe ancora comporre da quello.
+        """
+        if params['grain_size'] == self.engine.align:
+            tiles = self.engine.buildTiles(partial(grainTile, grainSize=params['grain_size']),
+                                           rng=self._build_rng)
+            return params, tiles, None
+        return params, None, self.createEngine(params)
 
-    def generate_initial_frames(self):
+    def installGrain(self, result):
         """
-        Genera i frame iniziali di rumore granulare in un thread separato.
+        Scambio atomico dei riferimenti: captureFrame usa sempre un banco completo.
         """
-        height, width = self.resolution.height(), self.resolution.width()
-        for _ in range(self.num_frames):
-            # Genera un frame di rumore granulare e aggiungilo alla lista dei frame
-            noise_frame = self.generateNoise()
-            self.frames.append(noise_frame)
+        params, tiles, engine = result
+        if engine is None:
+            self.engine.setTiles(tiles)
+            self.engine.setDrift(params['r_speed'], params['g_speed'], params['r_offset'], params['g_offset'])
+        else:
+            self.engine = engine
+            self.accountMemory()
 
     def captureFrame(self):
         """
@@ -50,38 +84,23 @@ class GrainGenerator(InputObject_BaseClass):
         """
         super().captureFrame()
         # Aggiorna il frame ogni 'update_interval' catture
-        if self.capture_counter % self.update_interval == 0 and self.frames:
-            # Seleziona un frame casuale dalla lista dei frame pre-generati
-            self.current_frame_index = random.randint(0, len(self.frames) - 1)
-            self._frame = self.frames[self.current_frame_index]
+        if self.capture_counter % self.update_interval == 0:
+            self._frame = self.engine.nextFrame()
         self.capture_counter += 1  # Incrementa il contatore delle catture
 
-    def generateNoise(self):
+    def stop(self):
         """
-        Genera un frame di rumore granulare.
+        Ferma il regeneratore quando il generatore viene tolto: le richieste successive vengono ignorate.
         """
-        height, width = self.resolution.height(), self.resolution.width()
-        grain_shape = (height // self._grain_size, width // self._grain_size)
-
-        # Genera rumore a una risoluzione più piccola
-        noise = np.random.randint(10, 200, (grain_shape[0], grain_shape[1], 3), dtype=np.uint8)
-        # Ridimensiona il rumore alla risoluzione desiderata
-        noise = cv2.resize(noise, (width, height), interpolation=cv2.INTER_NEAREST)
-
-        # Applica gli offset di scorrimento per i canali
-        noise = np.roll(noise, self._r_offset, axis=1)  # Scorrimento del canale rosso
-        noise = np.roll(noise, self._g_offset, axis=0)  # Scorrimento del canale verde
-        self._r_offset = (self._r_offset + self._r_speed) % width
-        self._g_offset = (self._g_offset + self._g_speed) % height
-
-        return noise
+        self._regenerator.stop()
 
     def update_frames_in_background(self):
         """
-        Aggiorna i frame pre-generati in un thread separato.
-        Questo metodo viene utilizzato quando vengono cambiati i parametri del generatore.
+        Chiede al regeneratore un nuovo banco con i parametri attuali.
+        Questo metodo viene utilizzato quando vengono cambiati i parametri del generatore:
+        le richieste ravvicinate si fondono e viene costruito solo l'ultimo set di parametri.
         """
-        threading.Thread(target=self.generate_initial_frames, daemon=True).start()
+        self._regenerator.request(self.getGrainParams())
 
     @error_logger.log(log_level=logging.DEBUG)
     def setGrainSize(self, grain_size):
@@ -101,12 +120,6 @@ class GrainGenerator(InputObject_BaseClass):
         # Aggiorna i frame dopo il cambiamento del parametro
         self.update_frames_in_background()
 
-    @error_logger.log(log_level=logging.DEBUG)
-    def setBSpeed(self, b_speed):
-        self._b_speed = b_speed
-        # Aggiorna i frame dopo il cambiamento del parametro
-        self.update_frames_in_background()
-
     @error_logger.log(log_level=logging.DEBUG)
     def setROffset(self, r_offset):
         self._r_offset = r_offset
@@ -119,12 +132,6 @@ class GrainGenerator(InputObject_BaseClass):
         # Aggiorna i frame dopo il cambiamento del parametro
         self.update_frames_in_background()
 
-    @error_logger.log(log_level=logging.DEBUG)
-    def setBOffset(self, b_offset):
-        self._b_offset = b_offset
-        # Aggiorna i frame dopo il cambiamento del parametro
-        self.update_frames_in_background()
-
     @error_logger.log(log_level=logging.DEBUG)
     def serialize(self):
         # Chiama il metodo serialize della classe base e aggiunge informazioni specifiche del GrainGenerator
@@ -133,10 +140,8 @@ class GrainGenerator(InputObject_BaseClass):
             'grain_size': self._grain_size,
             'r_speed': self._r_speed,
             'g_speed': self._g_speed,
-            'b_speed': self._b_speed,
             'r_offset': self._r_offset,
-            'g_offset': self._g_offset,
-            'b_offset': self._b_offset
+            'g_offset': self._g_offset
         })
         return base_data
 
@@ -151,9 +156,7 @@ class GrainGenerator(InputObject_BaseClass):
         self._grain_size = params.get('grain_size', 3)
         self._r_speed = params.get('r_speed', 2)
         self._g_speed = params.get('g_speed', 1)
-        self._b_speed = params.get('b_speed', 3)
         self._r_offset = params.get('r_offset', 2)
         self._g_offset = params.get('g_offset', 0)
-        self._b_offset = params.get('b_offset', 4)
         # Rigenera i frame iniziali in base ai dati deserializzati
         self.update_frames_in_background()
\ No newline at end of file
@@ -1,12 +1,10 @@
-import random
-import threading
-
-import cv2
 import numpy as np
 
 
 from PyQt6.QtCore import QSize
 from mainDir.inputDevice.baseDevice.baseClass.baseClass_InputObject import InputObject_BaseClass
+from mainDir.inputDevice.generatorDevice.inputObject.noiseEngine import NoiseEngine, uniformTile
+from mainDir.performance.memoryRegistry import memoryRegistry
 
 
 class RandomNoiseGenerator(InputObject_BaseClass):
@@ -15,28 +13,13 @@ class RandomNoiseGenerator(InputObject_BaseClass):
         self._name = self.__class__.__name__
         self.resolution = resolution
         self.running = True
-        self.num_frames = 120  # Numero di frame da pre-generare
-        self.frames = []  # Lista per i frame pre-generati
-        self.current_frame_index = 0  # Indice del frame corrente
         self.capture_counter = 0  # Contatore delle catture per determinare quando cambiare il frame
         self.update_interval = 5  # Cambia frame ogni 5 catture
 
-        # Avvia un thread per generare i frame iniziali
-        # Questo aiuta a evitare ritardi nell'inizializzazione principale
-        self.generate_initial_frames_thread = threading.Thread(target=self.generate_initial_frames, daemon=True)
-        self.generate_initial_frames_thread.start()
-
-
-    def generate_initial_frames(self):
-        """
-        Genera i frame iniziali di rumore gaussiano in un thread separato.
-        """
-        height, width = self.resolution.height(), self.resolution.width()
-        for _ in range(self.num_frames):
-            # Genera un frame di rumore gaussiano e aggiungilo alla lista dei frame
-            noise_frame = self.generateRandomNoise()
-            self.frames.append(noise_frame)
-
+        # Niente banco di 120 frame: il motore compone ogni frame da pochi tile in un buffer preallocato
+        self.engine = NoiseEngine(resolution, uniformTile)
+        memoryRegistry.account("noiseBanks", self, self.engine.nbytes, self._name)
+        self._frame = self.engine.nextFrame()
 
     def captureFrame(self):
         """
@@ -44,21 +27,10 @@ class RandomNoiseGenerator(InputObject_BaseClass):
         """
         self.updateFps()  # Aggiorna il contatore di FPS per monitorare le prestazioni
         # Aggiorna il frame ogni 'update_interval' catture
-        if self.capture_counter % self.update_interval == 0 and self.frames:
-            # Seleziona un frame casuale dalla lista dei frame pre-generati
-            self.current_frame_index = random.randint(0, len(self.frames) - 1)
-            self._frame = self.frames[self.current_frame_index]
+        if self.capture_counter % self.update_interval == 0:
+            self._frame = self.engine.nextFrame()
         self.capture_counter += 1  # Incrementa il contatore delle catture
 
-
-    def generateRandomNoise(self):
-        """
-        Genera un frame di rumore gaussiano.
-        """
-        height, width = self.resolution.height(), self.resolution.width()
-        _frame = np.random.randint(0, 255, (height, width, 3), dtype=np.uint8)
-        return _frame
-
     def serialize(self):
         # Chiama il metodo serialize della classe base
         base_data = super().serialize()
@@ -77,4 +49,3 @@ if __name__ == "__main__":
     generator.captureFrame()
     frame = generator.getFrame()
     print(f"Frame generated with mean value: {np.mean(frame)}")
-
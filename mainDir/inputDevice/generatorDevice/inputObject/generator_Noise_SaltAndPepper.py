@@ -1,13 +1,30 @@
-import random
-import threading
-import logging
-
-import cv2
 import numpy as np
 from PyQt6.QtCore import *
 
 from mainDir.inputDevice.baseDevice.baseClass.baseClass_InputObject import InputObject_BaseClass
-from mainDir.errorClass.loggerClass import error_logger
+from mainDir.performance.memoryRegistry import memoryRegistry
+
+"""
+Il vecchio generatore pre-generava 60 frame (373 MB in full HD) partendo ogni volta da
+np.ones(...) * 127, un temporaneo int64 di 50 MB, e a ogni cambio di parametri rifondeva
+tutto il banco con addWeighted.
+
+Ora non c'è nessun banco:
+    - un frame grigio di base preallocato viene copiato (copyto, ~0.3 ms) in uno dei
+      pochi buffer di uscita a rotazione;
+    - le posizioni vengono da un flusso di indici piatti precalcolato una volta sola
+      (Generator PCG64 di numpy, int32): ogni frame ne prende una finestra a caso e la
+      trasla di un offset a caso, quindi due frame non si somigliano;
+    - la scrittura avviene con indici piatti su una vista a pixel da 3 byte (void) del
+      buffer, più del doppio più veloce dell'indicizzazione (pixel, 3);
+    - il cambio di parametri non riscrive niente: le densità di sale e pepe scivolano
+      verso i nuovi valori nei successivi crossfade_frames frame mostrati.
+"""
+
+GRAY = 127
+PIXEL = np.dtype((np.void, 3))
+SALT = np.full(3, 255, dtype=np.uint8).view(PIXEL)[0]
+PEPPER = np.zeros(3, dtype=np.uint8).view(PIXEL)[0]
 
 
 class SaltAndPepperGenerator(InputObject_BaseClass):
@@ -18,93 +35,98 @@ class SaltAndPepperGenerator(InputObject_BaseClass):
         self.resolution = resolution
         self.salt_prob = 0.02
         self.pepper_prob = 0.03
-        self._frame = np.zeros((resolution.height(), resolution.width(), 3), dtype=np.uint8)
 
-        self.num_frames = 60
-        self.frames = []  # Frame buffer attuale
-        self.new_frames = []  # Frame buffer per la transizione
-        self.current_frame_index = 0
         self.capture_counter = 0
         self.update_interval = 5
+        self.crossfade_frames = 12  # frame mostrati per passare ai nuovi parametri (~1 s)
+        self.num_buffers = 3  # il frame restituito resta valido per num_buffers - 1 aggiornamenti
+
+        height, width = resolution.height(), resolution.width()
+        self._pixels = height * width
+        self._rng = np.random.default_rng()
+        # flusso di coordinate: un indice piatto per pixel basta anche per le densità più alte
+        self._stream = self._rng.integers(0, self._pixels, self._pixels, dtype=np.int32)
+        self._scratch = np.empty(self._pixels, dtype=np.int32)
+        self._base = np.full((height, width, 3), GRAY, dtype=np.uint8)
+        self._buffers = [np.empty_like(self._base) for _ in range(self.num_buffers)]
+        self._buffer_index = 0
+        # (sale di partenza, pepe di partenza, sale di arrivo, pepe di arrivo, frame del crossfade)
+        self._fade = (self.salt_prob, self.pepper_prob, self.salt_prob, self.pepper_prob, 0)
+        self._fade_step = 0
+        memoryRegistry.account("noiseBanks", self, self.nbytes, self._name)
+        self._frame = self.generateNoise()
+
+    @property
+    def nbytes(self):
+        buffers = sum(buffer.nbytes for buffer in self._buffers)
+        return self._stream.nbytes + self._scratch.nbytes + self._base.nbytes + buffers
 
-        # Avvia il thread per generare i frame iniziali
-        self.generate_initial_frames_thread = threading.Thread(target=self.generate_initial_frames, daemon=True)
-        self.generate_initial_frames_thread.start()
-
-    def generate_initial_frames(self):
+    def captureFrame(self):
         """
-        Genera i frame iniziali di rumore granulare in un thread separato.
+        Sovrascrive la funzione captureFrame della classe base, mantenendo la funzionalità originale.
         """
-        height, width = self.resolution.height(), self.resolution.width()
-        for _ in range(self.num_frames):
-            noise_frame = self.generateNoise()
-            self.frames.append(noise_frame)
+        super().captureFrame()
+        if self.capture_counter % self.update_interval == 0:
+            self._frame = self.generateNoise()
+        self.capture_counter += 1
 
-    def update_frames_in_background(self):
+    def currentProbabilities(self):
         """
-        Aggiorna i frame pre-generati in un thread separato con nuovi parametri.
+        Densità da usare per il prossimo frame, interpolate durante un crossfade.
         """
-        threading.Thread(target=self.generate_new_frames, daemon=True).start()
+        fromSalt, fromPepper, toSalt, toPepper, frames = self._fade
+        if self._fade_step >= frames:
+            return toSalt, toPepper
+        alpha = self._fade_step / frames
+        return fromSalt + (toSalt - fromSalt) * alpha, fromPepper + (toPepper - fromPepper) * alpha
 
-    def generate_new_frames(self):
+    def _coordinates(self, start, count, shift):
         """
-        Genera nuovi frame con i parametri aggiornati e li mette nel buffer 'new_frames'.
+        Indici piatti della finestra [start, start + count) del flusso, traslati di shift.
         """
-        height, width = self.resolution.height(), self.resolution.width()
-        new_frames = []
-        for _ in range(self.num_frames):
-            noise_frame = self.generateNoise()
-            new_frames.append(noise_frame)
-
-        # Quando il nuovo buffer è pronto, sostituiscilo gradualmente
-        self.new_frames = new_frames
-        self.transition_frames()
+        indices = self._scratch[:count]
+        np.add(self._stream[start:start + count], shift, out=indices)
+        indices[indices >= self._pixels] -= self._pixels
+        return indices
 
-    def transition_frames(self):
+    def generateNoise(self):
         """
-        Sostituisce gradualmente i frame attuali con i nuovi frame usando l'interpolazione.
+        Compone il frame successivo nel prossimo buffer e lo restituisce.
         """
-        for i in range(len(self.frames)):
-            if i < len(self.new_frames):
-                # Interpolazione lineare tra i vecchi e i nuovi frame
-                alpha = i / len(self.frames)
-                self.frames[i] = cv2.addWeighted(self.frames[i], 1 - alpha, self.new_frames[i], alpha, 0)
-        self.new_frames.clear()  # Svuota il buffer dei nuovi frame dopo la transizione
-
-    def captureFrame(self):
+        salt_prob, pepper_prob = self.currentProbabilities()
+        self._fade_step += 1
+
+        self._buffer_index = (self._buffer_index + 1) % self.num_buffers
+        image = self._buffers[self._buffer_index]
+        np.copyto(image, self._base)
+        pixels = image.view(PIXEL).reshape(-1)
+
+        num_salt = min(self._pixels, int(np.ceil(salt_prob * self._pixels)))
+        num_pepper = min(self._pixels - num_salt, int(np.ceil(pepper_prob * self._pixels)))
+        count = num_salt + num_pepper
+        start = int(self._rng.integers(0, self._pixels - count + 1))
+        shift = int(self._rng.integers(0, self._pixels))
+        indices = self._coordinates(start, count, shift)
+        pixels[indices[:num_salt]] = SALT
+        pixels[indices[num_salt:]] = PEPPER
+        return image
+
+    def startCrossfade(self, salt_prob, pepper_prob):
         """
-        Sovrascrive la funzione captureFrame della classe base, mantenendo la funzionalità originale.
+        Fa partire il passaggio dalle densità attuali a quelle nuove. Viene chiamato dal
+        thread della UI: la tupla del crossfade viene sostituita in un colpo solo.
         """
-        super().captureFrame()
-        if self.capture_counter % self.update_interval == 0 and self.frames:
-            self.current_frame_index = random.randint(0, len(self.frames) - 1)
-            self._frame = self.frames[self.current_frame_index]
-        self.capture_counter += 1
-
-    def generateNoise(self):
-        height, width = self.resolution.height(), self.resolution.width()
-        # Create a blank image with all pixels set to middle gray
-        image = np.ones((height, width, 3), dtype=np.uint8) * 127
-
-        # Add salt noise (white pixels)
-        num_salt = np.ceil(self.salt_prob * height * width)
-        coords = [np.random.randint(0, i - 1, int(num_salt)) for i in image.shape[:2]]
-        image[coords[0], coords[1], :] = 255
-
-        # Add pepper noise (black pixels)
-        num_pepper = np.ceil(self.pepper_prob * height * width)
-        coords = [np.random.randint(0, i - 1, int(num_pepper)) for i in image.shape[:2]]
-        image[coords[0], coords[1], :] = 0
-
-        return np.ascontiguousarray(image)
+        fromSalt, fromPepper = self.currentProbabilities()
+        self.salt_prob = salt_prob
+        self.pepper_prob = pepper_prob
+        self._fade = (fromSalt, fromPepper, salt_prob, pepper_prob, self.crossfade_frames)
+        self._fade_step = 0
 
     def setSaltProbability(self, salt_prob):
-        self.salt_prob = salt_prob
-        self.update_frames_in_background()
+        self.startCrossfade(salt_prob, self.pepper_prob)
 
     def setPepperProbability(self, pepper_prob):
-        self.pepper_prob = pepper_prob
-        self.update_frames_in_background()
+        self.startCrossfade(self.salt_prob, pepper_prob)
 
     def serialize(self):
         # Chiama il metodo serialize della classe base
@@ -119,12 +141,24 @@ class SaltAndPepperGenerator(InputObject_BaseClass):
         # Chiama il metodo deserialize della classe base
         super().deserialize(data)
         if "params" in data:
-            self.salt_prob = data["params"].get('salt_probability', 0.05)
-            self.pepper_prob = data["params"].get('pepper_probability', 0.03)
+            self.startCrossfade(data["params"].get('salt_probability', 0.05),
+                                data["params"].get('pepper_probability', 0.03))
 
     def setParams(self, params):
         # Estrai e imposta i dati specifici di SaltAndPepperGenerator
         print(f"SaltAndPepperGenerator.setParams: {params}")
-        self.salt_prob = params.get('salt_probability', 0.05)
-        self.pepper_prob = params.get('pepper_probability', 0.03)
-        self.update_frames_in_background()
\ No newline at end of file
+        self.startCrossfade(params.get('salt_probability', 0.05), params.get('pepper_probability', 0.03))
+
+
+if __name__ == "__main__":
+    import time
+
+    generator = SaltAndPepperGenerator()
+    start = time.perf_counter()
+    for _ in range(200):
+        frame = generator.generateNoise()
+    print(f"{(time.perf_counter() - start) * 5:.2f} ms per frame, {generator.nbytes / 2 ** 20:.1f} MB")
+    generator.setParams({'salt_probability': 0.2, 'pepper_probability': 0.1})
+    for _ in range(generator.crossfade_frames + 1):
+        frame = generator.generateNoise()
+    print(f"salt {np.mean(frame[..., 0] == 255):.3f} pepper {np.mean(frame[..., 0] == 0):.3f}")
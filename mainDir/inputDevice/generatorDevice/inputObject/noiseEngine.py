@@ -0,0 +1,274 @@
+import threading
+import weakref
+
+import numpy as np
+from PyQt6.QtCore import QSize
+
+"""
+Motore di rumore a memoria limitata.
+
+I generatori di rumore pre-generavano 60-120 frame a piena risoluzione (centinaia di MB
+per input). Il NoiseEngine tiene invece un piccolo banco di tile di rumore, poco più
+grandi di una cella di una griglia (per default 4x4) e compone ogni frame in un buffer
+preallocato: per ogni cella sceglie un tile a caso, un'origine a caso dentro il tile e
+un flip verticale a caso. Con 8 tile e 16 celle le combinazioni sono praticamente
+infinite, la memoria è di pochi frame e comporre un frame costa 16 copie di blocchi
+(circa 1 ms in full HD).
+Il flip orizzontale di un blocco BGR a runtime costa decine di volte una copia
+contigua, quindi metà del banco è fatta delle copie specchiate dell'altra metà.
+
+I tile vengono prodotti da una tileFactory(height, width, rng) -> array uint8 (h, w, 3),
+così lo stesso motore serve per rumore uniforme, gaussiano e granulare.
+"""
+
+
+def uniformTile(height, width, rng):
+    return rng.integers(0, 255, (height, width, 3), dtype=np.uint8)
+
+
+def gaussianTile(height, width, rng, sigma=25.0):
+    """
+    Equivalente del vecchio rumore gaussiano normalizzato min-max: media 127, deviazione ~sigma.
+    """
+    tile = rng.normal(127.5, sigma, (height, width, 3)).astype(np.float32)
+    np.clip(tile, 0, 255, out=tile)
+    return tile.astype(np.uint8)
+
+
+def grainTile(height, width, rng, grainSize=3, low=10, high=200):
+    """
+    Rumore a blocchi di grainSize pixel (grana), allineato all'origine del tile.
+    """
+    grainSize = max(1, int(grainSize))
+    small = rng.integers(low, high, (height // grainSize + 1, width // grainSize + 1, 3), dtype=np.uint8)
+    return np.ascontiguousarray(small.repeat(grainSize, axis=0).repeat(grainSize, axis=1)[:height, :width])
+
+
+class NoiseEngine:
+    """
+    :param resolution: risoluzione dei frame prodotti.
+    :param tileFactory: funzione (height, width, rng) che produce un tile.
+    :param numTiles: numero di tile nel banco.
+    :param grid: (righe, colonne) della griglia di composizione.
+    :param align: le origini e i bordi delle celle sono multipli di align (per la grana).
+    :param numBuffers: buffer di uscita a rotazione; il frame restituito resta valido
+                       per numBuffers - 1 chiamate successive.
+    """
+
+    def __init__(self, resolution=QSize(1920, 1080), tileFactory=uniformTile, numTiles=8, grid=(4, 4),
+                 align=1, numBuffers=3, seed=None):
+        self.height, self.width = resolution.height(), resolution.width()
+        self.rng = np.random.default_rng(seed)
+        self.numTiles = numTiles
+        self.align = max(1, int(align))
+        self._rows = self._cellEdges(self.height, grid[0])
+        self._cols = self._cellEdges(self.width, grid[1])
+        cellHeight = max(b - a for a, b in zip(self._rows, self._rows[1:]))
+        cellWidth = max(b - a for a, b in zip(self._cols, self._cols[1:]))
+        # il tile è mezza cella più grande della cella: lo spazio per l'origine casuale
+        self.tileHeight = cellHeight + self._aligned(cellHeight // 2)
+        self.tileWidth = cellWidth + self._aligned(cellWidth // 2)
+        self._buffers = [np.zeros((self.height, self.width, 3), dtype=np.uint8) for _ in range(numBuffers)]
+        self._bufferIndex = 0
+        self.driftX = 0
+        self.driftY = 0
+        self._drift = (0, 0)
+        self.tiles = self.buildTiles(tileFactory)
+
+    def _aligned(self, value):
+        return max(self.align, value - value % self.align)
+
+    def _cellEdges(self, size, cells):
+        edges = [min(size, round(size * i / cells / self.align) * self.align) for i in range(cells)]
+        return edges + [size]
+
+    def buildTiles(self, tileFactory, rng=None, out=None):
+        """
+        Produce un nuovo banco di tile (non lo installa: vedi setTiles).
+
+        :param rng: generatore da usare; serve un generatore diverso da self.rng
+                    se il banco viene costruito in un altro thread.
+        :param out: array (numTiles, tileHeight, tileWidth, 3) da riempire invece di allocarne uno nuovo.
+        """
+        rng = rng or self.rng
+        tiles = out if out is not None else np.empty((self.numTiles, self.tileHeight, self.tileWidth, 3),
+                                                     dtype=np.uint8)
+        originals = (self.numTiles + 1) // 2
+        for i in range(originals):
+            tiles[i] = tileFactory(self.tileHeight, self.tileWidth, rng)
+        for i in range(originals, self.numTiles):
+            tiles[i] = tiles[i - originals, :, ::-1]
+        return tiles
+
+    def setTiles(self, tiles):
+        """
+        Sostituisce il banco di tile. L'assegnazione è atomica: il frame in
+        composizione usa il banco letto all'inizio di nextFrame.
+        """
+        self.tiles = tiles
+
+    def setDrift(self, dx, dy, offsetX=None, offsetY=None):
+        """
+        Spostamento delle origini dei tile a ogni frame, per far scorrere la grana.
+        offsetX/offsetY impostano la posizione di partenza dello scorrimento.
+        """
+        self.driftX = int(dx)
+        self.driftY = int(dy)
+        if offsetX is not None or offsetY is not None:
+            self._drift = (int(offsetY or 0), int(offsetX or 0))
+
+    def nextFrame(self):
+        """
+        Compone un nuovo frame nel prossimo buffer di uscita e lo restituisce.
+        """
+        tiles = self.tiles
+        self._bufferIndex = (self._bufferIndex + 1) % len(self._buffers)
+        out = self._buffers[self._bufferIndex]
+        rows, cols = self._rows, self._cols
+        cells = (len(rows) - 1) * (len(cols) - 1)
+        # per ogni cella: tile, origine y, origine x, flip verticale
+        choice = self.rng.integers(0, 1 << 30, (cells, 4))
+        spareY = self.tileHeight - max(b - a for a, b in zip(rows, rows[1:]))
+        spareX = self.tileWidth - max(b - a for a, b in zip(cols, cols[1:]))
+        stepsY = spareY // self.align + 1
+        stepsX = spareX // self.align + 1
+        driftY = (self._drift[0] + self.driftY) % stepsY
+        driftX = (self._drift[1] + self.driftX) % stepsX
+        self._drift = (driftY, driftX)
+        n = 0
+        for r in range(len(rows) - 1):
+            y0, y1 = rows[r], rows[r + 1]
+            for c in range(len(cols) - 1):
+                x0, x1 = cols[c], cols[c + 1]
+                tile, oy, ox, flips = choice[n, 0] % len(tiles), choice[n, 1], choice[n, 2], choice[n, 3]
+                n += 1
+                oy = ((oy + driftY) % stepsY) * self.align
+                ox = ((ox + driftX) % stepsX) * self.align
+                block = tiles[tile, oy:oy + y1 - y0, ox:ox + x1 - x0]
+                if flips & 1:
+                    block = block[::-1]
+                out[y0:y1, x0:x1] = block
+        return out
+
+    @property
+    def nbytes(self):
+        return self.tiles.nbytes + sum(buffer.nbytes for buffer in self._buffers)
+
+
+class TileRegenerator:
+    """
+    Un solo thread in background che ricostruisce il banco quando cambiano i parametri.
+
+    Le richieste si sovrascrivono: se durante una costruzione arrivano dieci nuove
+    richieste (uno slider trascinato), al termine viene costruita solo l'ultima.
+    Il thread parte alla prima richiesta e resta in attesa tra una richiesta e l'altra.
+
+    Se build e install sono metodi, il thread li tiene con una weakref: il regeneratore
+    non tiene in vita il generatore, e quando il generatore viene liberato il thread
+    si ferma da solo.
+
+    :param build: funzione (params) -> risultato, eseguita nel thread in background.
+    :param install: funzione (risultato) chiamata nel thread in background appena il
+                    risultato è pronto; deve limitarsi a uno scambio di riferimenti.
+    """
+
+    def __init__(self, build, install, name="TileRegenerator"):
+        self._build = self._weakCallable(build)
+        self._install = self._weakCallable(install)
+        self._name = name
+        self._condition = threading.Condition()
+        self._pending = None
+        self._hasPending = False
+        self._running = True
+        self._thread = None
+        self._building = False
+        self.requests = 0
+        self.builds = 0
+        owner = getattr(build, "__self__", None)
+        if owner is not None:
+            weakref.finalize(owner, self.stop)
+
+    @staticmethod
+    def _weakCallable(func):
+        """
+        :return: una funzione senza argomenti che restituisce func, o None se il suo oggetto è stato liberato.
+        """
+        if getattr(func, "__self__", None) is not None:
+            return weakref.WeakMethod(func)
+        return lambda: func
+
+    def request(self, params):
+        with self._condition:
+            self._pending = params
+            self._hasPending = True
+            self.requests += 1
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name=self._name, daemon=True)
+                self._thread.start()
+            self._condition.notify_all()
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while self._running and not self._hasPending:
+                    self._condition.wait()
+                if not self._running:
+                    return
+                params = self._pending
+                self._pending = None
+                self._hasPending = False
+                self._building = True
+            try:
+                build, install = self._build(), self._install()
+                if build is None or install is None:
+                    return
+                install(build(params))
+                # nessun riferimento forte al generatore mentre il thread aspetta la prossima richiesta
+                del build, install
+            finally:
+                with self._condition:
+                    self._building = False
+                    self.builds += 1
+                    self._condition.notify_all()
+
+    def isIdle(self):
+        with self._condition:
+            return not self._hasPending and not self._building
+
+    def waitIdle(self, timeout=None):
+        """
+        Attende che non ci siano costruzioni in corso o in attesa.
+
+        :return: True se il regeneratore è fermo, False se è scaduto il timeout.
+        """
+        with self._condition:
+            return self._condition.wait_for(lambda: not self._hasPending and not self._building, timeout)
+
+    def getStats(self):
+        """
+        :return: richieste ricevute, banchi costruiti e richieste assorbite da una più recente.
+        """
+        with self._condition:
+            inFlight = int(self._hasPending) + int(self._building)
+            return {'requests': self.requests, 'builds': self.builds,
+                    'coalesced': self.requests - self.builds - inFlight}
+
+    def stop(self):
+        with self._condition:
+            self._running = False
+            self._condition.notify_all()
+
+
+if __name__ == "__main__":
+    import time
+
+    for name, factory in (("uniform", uniformTile), ("gaussian", gaussianTile), ("grain", grainTile)):
+        start = time.perf_counter()
+        engine = NoiseEngine(tileFactory=factory, align=3 if name == "grain" else 1)
+        build = time.perf_counter() - start
+        start = time.perf_counter()
+        for _ in range(100):
+            frame = engine.nextFrame()
+        print(f"{name}: tiles built in {build * 1000:.1f} ms, "
+              f"{(time.perf_counter() - start) * 10:.2f} ms per frame, {engine.nbytes / 2 ** 20:.1f} MB, "
+              f"mean {frame.mean():.1f} std {frame.std():.1f}")
@@ -0,0 +1,49 @@
+import logging
+
+from mainDir.inputDevice.baseDevice.inputDevice_Base import InputDevice_BaseClass, error_logger
+from mainDir.inputDevice.playerDevice.inputObject.player_Replay import ReplayPlayer
+
+
+class InputDevice_ReplayPlayer(InputDevice_BaseClass):
+    """
+    An InputDevice for the instant replay.
+    It plays back the program ReplayBuffer (outputDevice/worker/replayBuffer.py) as a mixer input.
+    This one has no graphic interface: cue, play and pause come from the menu,
+    the remote control or setParams.
+    """
+
+    @error_logger.log(log_level=logging.DEBUG)
+    def __init__(self, name, replayBuffer=None, parent=None):
+        super().__init__(name, parent)
+        self.graphicInterface = None
+        self.setInputObject(ReplayPlayer(replayBuffer))
+
+    def getPlayer(self):
+        return self._input_object
+
+    def cue(self, secondsBack):
+        return self._input_object.cue(secondsBack)
+
+    def play(self, speed=None):
+        self._input_object.play(speed)
+
+    def pause(self):
+        self._input_object.pause()
+
+    @error_logger.log(log_level=logging.DEBUG)
+    def stop(self):
+        """
+        Ferma il thread di cattura e poi il pool di decodifica del player.
+        """
+        super().stop()
+        self._input_object.stop()
+
+    @error_logger.log(log_level=logging.DEBUG)
+    def serialize(self):
+        data = super().serialize()
+        return data
+
+    @error_logger.log(log_level=logging.DEBUG)
+    def deserialize(self, data):
+        super().deserialize(data)
+        self._name = data["name"]
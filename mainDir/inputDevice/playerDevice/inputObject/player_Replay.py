@@ -0,0 +1,188 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+from PyQt6.QtCore import *
+
+from mainDir.inputDevice.baseDevice.baseClass.baseClass_InputObject import InputObject_BaseClass
+from mainDir.outputDevice.worker.replayBuffer import ReplayBuffer
+
+"""
+Player di instant replay: riproduce il ReplayBuffer del program come un input del mixer.
+
+cue(secondi) posiziona la testina indietro rispetto al live e mostra il frame fermo,
+play(velocità) riproduce a 1x, 0.5x o 0.25x. La testina avanza sull'orologio di sistema
+(captureFrame viene chiamato più spesso del frame rate), quindi a 0.5x ogni frame
+resta in onda per due frame di program. I JPEG dei prossimi frame vengono decodificati
+in anticipo su un pool di thread: captureFrame prende solo frame già pronti e, se un
+frame non lo è ancora, tiene in onda il precedente invece di aspettare. stop() chiude il
+pool quando l'input viene tolto dal videoHub; se l'input riparte il pool viene ricreato.
+"""
+
+REPLAY_SPEEDS = (1.0, 0.5, 0.25)
+
+
+class ReplayPlayer(InputObject_BaseClass):
+
+    def __init__(self, replayBuffer=None, resolution=QSize(1920, 1080), decodeAhead=8, workers=2):
+        """
+        :param replayBuffer: il ReplayBuffer da riprodurre; None usa ReplayBuffer.active().
+        :param decodeAhead: frame decodificati in anticipo oltre la testina.
+        """
+        super().__init__(resolution)
+        self._name = self.__class__.__name__
+        self.replayBuffer = replayBuffer
+        self.decodeAhead = decodeAhead
+        self.speed = 1.0
+        self.playing = False
+        self.playhead = None
+        self._lastTick = None
+        self._shownSeq = None
+        self._decoded = {}
+        self._workers = workers
+        self._pool = None
+        self.shown = 0
+        self.late = 0
+
+    def getBuffer(self):
+        return self.replayBuffer or ReplayBuffer.active()
+
+    def cue(self, secondsBack):
+        """
+        Ferma la riproduzione e posiziona la testina secondsBack secondi prima del live.
+        """
+        buffer = self.getBuffer()
+        if buffer is None:
+            return False
+        first, last = buffer.getRange()
+        if first is None:
+            return False
+        self.playing = False
+        # la decodifica anticipata la fa captureFrame, l'unico che tocca _decoded
+        self.playhead = float(max(first, last - int(secondsBack * buffer.fps)))
+        self._shownSeq = None
+        return True
+
+    def play(self, speed=None):
+        if speed is not None:
+            self.setSpeed(speed)
+        if self.playhead is None and not self.cue(0):
+            return
+        self._lastTick = time.perf_counter()
+        self.playing = True
+
+    def pause(self):
+        self.playing = False
+
+    def setSpeed(self, speed):
+        if speed not in REPLAY_SPEEDS:
+            raise ValueError(f"Replay speed must be one of {REPLAY_SPEEDS}: {speed}")
+        self.speed = speed
+
+    def captureFrame(self):
+        super().captureFrame()
+        buffer = self.getBuffer()
+        if buffer is None or self.playhead is None:
+            return
+        first, last = buffer.getRange()
+        if first is None:
+            return
+        now = time.perf_counter()
+        if self.playing:
+            self.playhead += (now - self._lastTick) * buffer.fps * self.speed
+            if self.playhead >= last:
+                # raggiunto il live: resta fermo sull'ultimo frame
+                self.playhead = float(last)
+                self.playing = False
+        self._lastTick = now
+        # frame usciti dal fondo del ring mentre si riproduceva: si riparte dal più vecchio
+        self.playhead = max(self.playhead, float(first))
+        seq = int(self.playhead)
+        if seq != self._shownSeq:
+            self._show(seq)
+        self._prefetch(seq, last)
+
+    def _show(self, seq):
+        """
+        Mette in onda il frame seq se è già decodificato; altrimenti il più recente pronto
+        tra l'ultimo mostrato e seq (se la decodifica è più lenta della riproduzione si
+        perdono frame, ma la testina non rallenta), altrimenti resta il frame attuale.
+        """
+        ready = [key for key, future in self._decoded.items()
+                 if key <= seq and (self._shownSeq is None or key > self._shownSeq) and future.done()]
+        if seq not in ready:
+            self.late += 1
+            if seq not in self._decoded:
+                self._decoded[seq] = self._submit(seq)
+        for key in sorted(ready, reverse=True):
+            frame = self._decoded[key].result()
+            if frame is not None:
+                self._frame = frame
+                self._shownSeq = key
+                self.shown += 1
+                return
+
+    def _prefetch(self, seq, last):
+        """
+        Decodifica in anticipo i frame da seq in avanti, senza superare l'ultimo già compresso.
+        """
+        for old in [key for key in self._decoded if key < seq or key >= seq + self.decodeAhead]:
+            # se il pool è indietro le decodifiche superate non devono nemmeno partire
+            self._decoded.pop(old).cancel()
+        for ahead in range(seq, min(seq + self.decodeAhead, last + 1)):
+            if ahead not in self._decoded:
+                self._decoded[ahead] = self._submit(ahead)
+
+    def _submit(self, seq):
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(self._workers, thread_name_prefix="replayDecode")
+        return self._pool.submit(self._decode, seq)
+
+    def stop(self):
+        """
+        Ferma la riproduzione e chiude il pool di decodifica: va chiamato a thread di cattura fermo.
+        """
+        self.playing = False
+        self._decoded.clear()
+        self._shownSeq = None
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    def _decode(self, seq):
+        buffer = self.getBuffer()
+        frame = buffer.decode(seq) if buffer is not None else None
+        if frame is not None and frame.shape[:2] != (self.resolution.height(), self.resolution.width()):
+            frame = cv2.resize(frame, (self.resolution.width(), self.resolution.height()))
+        return frame
+
+    def setParams(self, params):
+        """
+        {'cmd': "cue", 'seconds': 5} | {'cmd': "play", 'speed': 0.5} | {'cmd': "pause"} | {'speed': 0.25}
+        """
+        cmd = params.get('cmd')
+        if cmd == "cue":
+            self.cue(params.get('seconds', 5))
+        elif cmd == "play":
+            self.play(params.get('speed'))
+        elif cmd == "pause":
+            self.pause()
+        elif 'speed' in params:
+            self.setSpeed(params['speed'])
+
+    def getStats(self):
+        return {'playing': self.playing, 'speed': self.speed, 'playhead': self.playhead,
+                'shown': self.shown, 'late': self.late, 'decodeAhead': len(self._decoded)}
+
+    def serialize(self):
+        base_data = super().serialize()
+        base_data.update({
+            'speed': self.speed,
+            'decodeAhead': self.decodeAhead
+        })
+        return base_data
+
+    def deserialize(self, data):
+        super().deserialize(data)
+        self.setSpeed(data.get('speed', 1.0))
+        self.decodeAhead = data.get('decodeAhead', self.decodeAhead)
@@ -3,6 +3,7 @@ import numpy as np
 from PyQt6.QtCore import *
 
 from mainDir.inputDevice.baseDevice.baseClass.baseClass_InputObject import InputObject_BaseClass
+from mainDir.performance.memoryRegistry import memoryRegistry
 
 
 class StillImagePlayer(InputObject_BaseClass):
@@ -25,6 +26,9 @@ class StillImagePlayer(InputObject_BaseClass):
             # specificate, ridimensiona l'immagine
             if image.shape[:2] != (self.resolution.height(), self.resolution.width()):
                 image = cv2.resize(image, (self.resolution.width(), self.resolution.height()))
+            if not memoryRegistry.account("stills", self, image.nbytes, f"still {imagePath}"):
+                print(f"Error loading image: memory budget exceeded for {imagePath}")
+                return
             self._frame = image
         except Exception as e:
             print(f"Error loading image: {e}")
@@ -7,6 +7,7 @@ from PyQt6.QtGui import *
 
 from mainDir.errorClass.loggerClass import ErrorClass
 from mainDir.inputDevice.baseDevice.baseClass.baseClass_InputObject import InputObject_BaseClass
+from mainDir.performance.memoryRegistry import memoryRegistry, framesBytes
 
 
 class InputObject_StingerPlayerForMixBus(InputObject_BaseClass):
@@ -70,6 +71,8 @@ class InputObject_StingerPlayerForMixBus(InputObject_BaseClass):
         Args:
             images (list): Lista delle immagini pre-moltiplicate.
         """
+        if not self.accountImages(images, self.stingerInvAlphaImages):
+            return
         self.stingerPreMultipliedImages = images
 
     @ErrorClass().log(log_level=logging.INFO)
@@ -80,8 +83,24 @@ class InputObject_StingerPlayerForMixBus(InputObject_BaseClass):
         Args:
             images (list): Lista delle immagini alpha inverse.
         """
+        if not self.accountImages(self.stingerPreMultipliedImages, images):
+            return
         self.stingerInvAlphaImages = images
 
+    def accountImages(self, preMultipliedImages, invAlphaImages):
+        """
+        Dichiara al memoryRegistry la memoria dello stinger. Se il budget "stingers"
+        la rifiuta, lo stinger non viene caricato.
+
+        Returns:
+            bool: True se le immagini possono essere tenute in memoria.
+        """
+        if memoryRegistry.account("stingers", self, framesBytes(preMultipliedImages, invAlphaImages),
+                                  f"stinger{self.stingerPosition}"):
+            return True
+        logging.error(f"Stinger {self.stingerPosition}: memory budget exceeded, images not loaded.")
+        return False
+
     @ErrorClass().log(log_level=logging.DEBUG)
     def captureFrame(self):
         """
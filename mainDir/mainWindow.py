@@ -11,14 +11,21 @@ logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(
 
 from PyQt6.QtCore import pyqtSignal, QTimer
 from PyQt6.QtWidgets import *
+import time
 import tracemalloc
 import matplotlib.pyplot as plt
 
 
 from mainDir.outputDevice.recording.RecordingWidget014 import RecordingWidget014
+from mainDir.outputDevice.recording.isoSelectionDialog import IsoSelectionDialog
 from mainDir.outputDevice.streaming.streamingWidget016 import StreamingWidget016
+from mainDir.inputDevice.playerDevice.inputDevice_replayPlayer import InputDevice_ReplayPlayer
+from mainDir.outputDevice.worker.isoRecorder import IsoRecorder
+from mainDir.outputDevice.worker.replayBuffer import ReplayBuffer
 from mainDir.outputs.openGLViewerThread016 import OpenGLViewerThread016
 from mainDir.mixEffect.mixEffects017 import MixEffect017
+from mainDir.performance.memoryRegistry import memoryRegistry
+from mainDir.performance.stageTimer import stageTimer
 
 
 class MainWindow(QMainWindow):
@@ -39,6 +46,11 @@ class MainWindow(QMainWindow):
         self.externalViewer = OpenGLViewerThread016()
         self.menu_widget = MenuWidget(self.mixEffect_1, self)
         self.signal_Clock = QTimer()
+        self.isoRecorder = None
+        self.isoPositions = None  # ultima selezione degli input ISO, in ordine di priorità
+        # input del videoHub occupato dal replay e device che c'era prima, rimesso allo spegnimento
+        self.replayPosition = None
+        self.replacedInput = None
         self.initUI()
         self.initGeometry()
         self.initMenu()
@@ -61,6 +73,8 @@ class MainWindow(QMainWindow):
         # to do: check properly Closing of streamWidget and recordingWidget
         self.recordingWidget.close()
         self.streamWidget.close()
+        self.setReplayEnabled(False)
+        self.setIsoRecordingEnabled(False)
         # Mostra metriche di performance
         self.display_performance_metrics()
         event.accept()
@@ -87,14 +101,15 @@ class MainWindow(QMainWindow):
         pass
 
     def initConnections(self):
-        pass
+        self.mixEffect_1.tallyManager.replay_SIGNAL.connect(self.replayCommand)
 
 
     def updateOutput(self):
-        prw_frame, prg_frame, fps = self.mixEffect_1.getMixed()
-        self.previewViewer.setFrame(prw_frame)
-        self.cleanFeedViewer.setFrame(prg_frame)
-        self.externalViewer.setQImage(self.cleanFeedViewer.getQImage())
+        with stageTimer.span("output"):
+            prw_frame, prg_frame, fps = self.mixEffect_1.getMixed()
+            self.previewViewer.setFrame(prw_frame)
+            self.cleanFeedViewer.setFrame(prg_frame)
+            self.externalViewer.setQImage(self.cleanFeedViewer.getQImage())
         self.fpsLabel.setText(f"FPS: {fps:.2f}")
         # Collect performance data
         self.fps_values.append(fps)
@@ -105,6 +120,8 @@ class MainWindow(QMainWindow):
         average_fps = sum(self.fps_values) / len(self.fps_values)
         print(f"Average FPS: {average_fps:.2f}")
         print(f"Memory usage peak: {max(self.memory_usage):.2f} MB")
+        print(memoryRegistry.formatBreakdown())
+        print(f"Tally events: {self.mixEffect_1.tallyManager.getStats()}")
 
         plt.figure(figsize=(10, 5))
         plt.subplot(1, 2, 1)
@@ -123,6 +140,166 @@ class MainWindow(QMainWindow):
         plt.tight_layout()
         plt.show()
 
+    def exportPerformanceTrace(self, path=None):
+        """
+        Salva gli span di stageTimer in formato Chrome trace (chrome://tracing, Perfetto).
+        La regia continua a girare: la scrittura avviene in background.
+        """
+        path = path or f"openPyVision_trace_{time.strftime('%Y%m%d_%H%M%S')}.json"
+        stageTimer.exportChromeTrace(path)
+        overruns = {stage: stats['overruns'] for stage, stats in stageTimer.getStageStats().items()
+                    if stats['overruns']}
+        self.statusBar().showMessage(f"Performance trace saved to {path}  overruns: {overruns or 'none'}")
+        return path
+
+    def showMemoryBreakdown(self):
+        """
+        Mostra quanta memoria occupano stinger, still, banchi di rumore e pool di frame.
+        """
+        QMessageBox.information(self, "Memory Breakdown", memoryRegistry.formatBreakdown())
+
+    def setControlServerEnabled(self, enabled, port=9910):
+        """
+        Avvia o ferma il server di controllo remoto (TCP/WebSocket su localhost).
+        """
+        if enabled:
+            server = self.mixEffect_1.startControlServer(port=port)
+            if server.waitReady(2):
+                self.statusBar().showMessage(f"Remote control listening on {server.host}:{server.port}")
+        else:
+            self.mixEffect_1.stopControlServer()
+            self.statusBar().showMessage("Remote control stopped")
+
+    def setTallyOutputEnabled(self, enabled):
+        """
+        Avvia o ferma l'uscita tally TSL UMD v3.1; la destinazione (host:porta, anche broadcast) viene chiesta all'avvio.
+        """
+        if not enabled:
+            self.mixEffect_1.stopTallyOutput()
+            self.statusBar().showMessage("Tally output stopped")
+            return
+        text, ok = QInputDialog.getText(self, "TSL Tally Output", "Destination host:port", text="127.0.0.1:8900")
+        host, _, port = text.strip().rpartition(":")
+        if not ok or not host or not port.isdigit():
+            self.statusBar().showMessage("Tally output not started")
+            return False
+        self.mixEffect_1.startTallyOutput(host, int(port))
+        self.statusBar().showMessage(f"TSL tally output to {host}:{port}")
+        return True
+
+    def setSharedEncoderEnabled(self, enabled):
+        """
+        In modalità tee recording e streaming avviati insieme usano un solo FFmpeg (un solo encode).
+        Vale per le uscite avviate dopo il cambio.
+        """
+        mode = "tee" if enabled else "separate"
+        self.recordingWidget.recordingManager.setOutputMode(mode)
+        self.streamWidget.streamerManager.setOutputMode(mode)
+        self.statusBar().showMessage(f"Output mode: {mode}")
+
+    def setReplayEnabled(self, enabled, position=8):
+        """
+        Avvia il buffer di instant replay sul clean feed e mette il ReplayPlayer all'input position.
+        Se l'input non è nero chiede conferma prima di sostituirlo; spegnendo il replay l'input
+        originale torna al suo posto e la memoria dei frame compressi viene liberata.
+
+        :return: False se l'utente ha rifiutato di sostituire l'input
+        """
+        replayBuffer = ReplayBuffer.forSource(self.cleanFeedViewer)
+        videoHub = self.mixEffect_1.videoHubData
+        if enabled:
+            if self.replayPosition is not None:
+                return True
+            current = videoHub.getInputDevice(position)
+            if current is not None and current.getType() not in ("BlackGenerator", "ReplayPlayer"):
+                answer = QMessageBox.question(
+                    self, "Instant Replay",
+                    f"Input {position} ({current.getName()}) will be replaced by the replay player "
+                    f"until the replay is turned off. Continue?")
+                if answer != QMessageBox.StandardButton.Yes:
+                    return False
+            replayBuffer.start()
+            self.replayPosition = position
+            self.replacedInput = current
+            videoHub.addInputDevice(position, InputDevice_ReplayPlayer(f"Replay_{position}", replayBuffer))
+            videoHub.startInputDevice(position)
+            self.statusBar().showMessage(f"Instant replay on input {position}")
+        elif self.replayPosition is not None:
+            position = self.replayPosition
+            if videoHub.getInputDevice(position).getType() == "ReplayPlayer":
+                if self.replacedInput is not None:
+                    # addInputDevice ferma il ReplayPlayer e il suo pool di decodifica
+                    videoHub.addInputDevice(position, self.replacedInput)
+                    videoHub.startInputDevice(position)
+                else:
+                    videoHub.removeInputDevice(position)
+            self.replayPosition = None
+            self.replacedInput = None
+            replayBuffer.stop()
+            replayBuffer.clear()
+            self.statusBar().showMessage("Instant replay stopped")
+        return True
+
+    def replayCommand(self, params):
+        """
+        Comandi del replay dal menu o dal remote control:
+        {'replay': "cue", 'seconds': 5} | {'replay': "play", 'speed': 0.5} | {'replay': "pause"} | {'replay': "speed", 'speed': 0.25}
+        """
+        device = None
+        if self.replayPosition is not None:
+            device = self.mixEffect_1.videoHubData.getInputDevice(self.replayPosition)
+        if device is None or device.getType() != "ReplayPlayer":
+            self.statusBar().showMessage("Instant replay is off")
+            return
+        player = device.getPlayer()
+        action = params.get('replay')
+        if action == "cue":
+            if not player.cue(params.get('seconds', 5)):
+                self.statusBar().showMessage("Replay buffer is still empty")
+                return
+        elif action == "play":
+            player.play(params.get('speed'))
+        elif action == "pause":
+            player.pause()
+        elif action == "speed":
+            player.setSpeed(params['speed'])
+        self.statusBar().showMessage(f"Replay {action}: speed {player.speed}x")
+
+    def programWorkers(self):
+        """
+        Worker di recording e streaming del program attivi: la registrazione ISO si sospende prima di rallentarli.
+        """
+        recordingManager = self.recordingWidget.recordingManager
+        streamerManager = self.streamWidget.streamerManager
+        workers = [recordingManager.recordingWorker, getattr(streamerManager, 'streamWorker', None)]
+        for manager in (recordingManager, streamerManager):
+            if manager.teeOutput is not None:
+                workers.append(manager.teeOutput.worker)
+        return [worker for worker in workers if worker is not None and worker.isRunning()]
+
+    def setIsoRecordingEnabled(self, enabled, directory="isoRecordings"):
+        """
+        Registra in file separati gli input del videoHub scelti nel dialogo (registrazione ISO).
+        L'ordine del dialogo è la priorità: gli ultimi input vengono sospesi per primi.
+
+        :return: False se il dialogo è stato annullato o non è stato scelto nessun input
+        """
+        if enabled:
+            if self.isoRecorder is None or not self.isoRecorder.isRunning():
+                dialog = IsoSelectionDialog(self.mixEffect_1.videoHubData, self.isoPositions, parent=self)
+                if not dialog.exec() or not dialog.selectedPositions():
+                    return False
+                self.isoPositions = dialog.selectedPositions()
+                self.isoRecorder = IsoRecorder(self.mixEffect_1.videoHubData, directory,
+                                               positions=self.isoPositions, programWorkers=self.programWorkers)
+                self.isoRecorder.tally_SIGNAL.connect(lambda tally: self.statusBar().showMessage(tally['message']))
+                if not self.isoRecorder.start():
+                    return False
+        elif self.isoRecorder is not None and self.isoRecorder.isRunning():
+            self.isoRecorder.stop()
+            self.statusBar().showMessage("ISO recording stopped: closing files in background")
+        return True
+
     def initMenu(self):
         self.setMenuBar(self.menu_widget)
 
@@ -0,0 +1,225 @@
+import json
+import logging
+
+import numpy as np
+
+"""
+Macro della regia registrate e riprodotte al frame.
+
+Una macro è la sequenza di comandi di tally arrivati a MixBus018.parseTallySignal,
+ciascuno con il numero di frame del render clock (relativo al primo comando):
+
+    {'name': "Opening", 'events': [{'frame': 0, 'tally': {'cmd': 'effectChange', ...}},
+                                   {'frame': 0, 'tally': {'cmd': 'auto', 'frames': 30}},
+                                   {'frame': 45, 'tally': {'cmd': 'programChange', 'program': 2}}]}
+
+In riproduzione il MixBus chiede al MacroPlayer, all'inizio di ogni frame e prima di
+applicare la coda dei comandi, quali comandi cadono su quel frame: un comando registrato
+al frame 45 viene applicato esattamente 45 frame dopo l'inizio della macro.
+
+La preflight prepara prima della riproduzione tutti gli asset citati dalla macro
+(stinger e still): li carica nel MixBus se mancano e legge una volta tutta la loro
+memoria, così la riproduzione non si ferma mai su un caricamento o un page fault.
+"""
+
+# comandi non registrati: caricamenti e notifiche dell'hub, non operazioni della regia
+NOT_RECORDED = frozenset({'inputChanged', 'inputRemoved', 'stingerReady', 'stillImageReady', 'stingerChanged'})
+
+
+class Macro:
+    def __init__(self, name="Macro", events=None):
+        """
+        :param name: nome della macro.
+        :param events: lista di (frame, tally_data) ordinata per frame.
+        """
+        self.name = name
+        self.events = list(events or [])
+
+    def getLength(self):
+        """
+        :return: durata in frame (frame dell'ultimo comando + 1)
+        """
+        return self.events[-1][0] + 1 if self.events else 0
+
+    def referencedAssets(self):
+        """
+        Stinger e still usati dalla macro, dedotti dagli effetti selezionati.
+
+        :return: {'stingers': set di posizioni, 'stills': set di posizioni}
+        """
+        assets = {'stingers': set(), 'stills': set()}
+        for _, tally in self.events:
+            if tally.get('cmd') != 'effectChange':
+                continue
+            effect = str(tally.get('effect', '')).replace(" ", "_").upper()
+            if effect.startswith("WIPE_STINGER") and effect[-1].isdigit():
+                assets['stingers'].add(int(effect[-1]))
+            elif effect.startswith("FADE_STILL") and effect[-1].isdigit():
+                assets['stills'].add(int(effect[-1]))
+        return assets
+
+    def serialize(self):
+        return {'name': self.name, 'events': [{'frame': frame, 'tally': tally} for frame, tally in self.events]}
+
+    @classmethod
+    def deserialize(cls, data):
+        events = sorted(((int(event['frame']), dict(event['tally'])) for event in data.get('events', [])),
+                        key=lambda event: event[0])
+        return cls(data.get('name', "Macro"), events)
+
+    def save(self, path):
+        with open(path, "w") as f:
+            json.dump(self.serialize(), f, indent=2)
+
+    @classmethod
+    def load(cls, path):
+        with open(path) as f:
+            return cls.deserialize(json.load(f))
+
+
+class MacroRecorder:
+    """
+    Registra i comandi che arrivano a un MixBus018 finché non viene chiamato stop().
+    """
+
+    def __init__(self, name="Macro"):
+        self.name = name
+        self._events = []
+        self._origin = None
+        self._mixBus = None
+
+    def start(self, mixBus):
+        self._events = []
+        self._origin = None
+        self._mixBus = mixBus
+        mixBus.macroRecorder = self
+
+    def record(self, frame, tally_data):
+        """
+        Chiamato da MixBus018.parseTallySignal con il frame del render clock.
+        """
+        cmd = tally_data.get('cmd')
+        if cmd in NOT_RECORDED:
+            return
+        if self._origin is None:
+            self._origin = frame
+        tally = {key: value for key, value in tally_data.items() if key != 'sender'}
+        self._events.append((frame - self._origin, tally))
+
+    def isRecording(self):
+        return self._mixBus is not None
+
+    def stop(self):
+        """
+        :return: la Macro registrata
+        """
+        if self._mixBus is not None and self._mixBus.macroRecorder is self:
+            self._mixBus.macroRecorder = None
+        self._mixBus = None
+        return Macro(self.name, self._events)
+
+
+class MacroPlayer:
+    """
+    Riproduce una Macro su un MixBus018 seguendo il suo render clock.
+    """
+
+    def __init__(self, mixBus):
+        self.mixBus = mixBus
+        self.macro = None
+        self._index = 0
+        self._startFrame = None
+        self.lastPreflight = None
+
+    def preflight(self, macro):
+        """
+        Carica e scalda tutti gli asset citati dalla macro.
+
+        :return: {'stingers': [...], 'stills': [...], 'missing': [...], 'bytes': byte letti}
+        """
+        assets = macro.referencedAssets()
+        report = {'stingers': [], 'stills': [], 'missing': [], 'bytes': 0}
+        videoHub = self.mixBus.videoHub
+        for position in sorted(assets['stingers']):
+            stinger = self.mixBus.state.stingers.get(position)
+            if stinger is None:
+                player = videoHub.getStingerPlayer(position)
+                if player is None:
+                    report['missing'].append(f"stinger{position}")
+                    continue
+                frames, inv_masks = player.getFrames()
+                self.mixBus.setStinger(position, frames, inv_masks)
+                stinger = (frames, inv_masks)
+            report['bytes'] += warmFrames(*stinger)
+            report['stingers'].append(position)
+        for position in sorted(assets['stills']):
+            still = self.mixBus.state.stills.get(position)
+            if still is None:
+                still = videoHub.getStillImage(position)
+                if still is None:
+                    report['missing'].append(f"still{position}")
+                    continue
+                self.mixBus.setStill(position, still)
+            if isinstance(still, np.ndarray):
+                report['bytes'] += warmFrames([still])
+            report['stills'].append(position)
+        if report['missing']:
+            logging.warning(f"Macro {macro.name}: missing assets {report['missing']}")
+        self.lastPreflight = report
+        return report
+
+    def play(self, macro, preflight=True):
+        """
+        Avvia la macro: il primo comando viene applicato al prossimo frame renderizzato.
+        """
+        if preflight:
+            self.preflight(macro)
+        self.macro = macro
+        self._index = 0
+        self._startFrame = None
+        self.mixBus.macroPlayer = self
+
+    def stop(self):
+        if self.mixBus.macroPlayer is self:
+            self.mixBus.macroPlayer = None
+        self.macro = None
+
+    def isPlaying(self):
+        return self.macro is not None
+
+    def dueCommands(self, frame):
+        """
+        Chiamato dal MixBus all'inizio di ogni frame.
+
+        :return: i comandi della macro che cadono su questo frame
+        """
+        if self.macro is None:
+            return []
+        if self._startFrame is None:
+            self._startFrame = frame
+        offset = frame - self._startFrame
+        events = self.macro.events
+        due = []
+        while self._index < len(events) and events[self._index][0] <= offset:
+            due.append(dict(events[self._index][1]))
+            self._index += 1
+        if self._index >= len(events):
+            self.stop()
+        return due
+
+
+def warmFrames(*frameLists):
+    """
+    Legge un byte per pagina di ogni frame, così la memoria è residente prima della riproduzione.
+
+    :return: byte coperti
+    """
+    total = 0
+    for frames in frameLists:
+        for frame in frames:
+            if frame is None:
+                continue
+            flat = frame.reshape(-1) if frame.flags['C_CONTIGUOUS'] else np.ascontiguousarray(frame).reshape(-1)
+            int(flat[::4096].sum())
+            total += frame.nbytes
+    return total
@@ -8,6 +8,7 @@ import numpy as np
 from PyQt6.QtCore import *
 
 from mainDir.inputDevice.systemWidget.inputDevice_stingerPlayer import InputDevice_StingerPlayer_mb
+from mainDir.performance.stageTimer import stageTimer
 
 
 class MIX_TYPE(Enum):
@@ -87,6 +88,10 @@ class MixBus017_NoThread(QObject):
         """
         This function returns the mixed frame based on the effect type.
         """
+        with stageTimer.span("mix"):
+            return self._getMixed()
+
+    def _getMixed(self):
         self.previewInput.captureFrame()
         self.programInput.captureFrame()
         prw_frame = self.previewInput.getFrame()
@@ -1,11 +1,15 @@
+import collections
+import threading
 import time
 import logging
 from enum import Enum
 
 import cv2
 import numpy as np
-from PyQt6.QtCore import QObject, pyqtSignal, QRunnable, QTimer, QThreadPool, QMutex, QMutexLocker, QMetaObject, Qt, \
-    Q_ARG, pyqtSlot
+from PyQt6.QtCore import QObject, pyqtSignal, QRunnable, QThreadPool, QMetaObject, Qt, Q_ARG, pyqtSlot
+
+from mainDir.errorClass.asyncLogger import rtLogger
+from mainDir.performance.stageTimer import stageTimer
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -28,71 +32,138 @@ class MIX_TYPE(Enum):
     FADE_STILL4 = 10
 
 
+class MixState:
+    """
+    Immutable snapshot of every parameter the mix engine renders from.
+
+    Control code never modifies a MixState: it builds a new one with replace() and
+    swaps the MixBus reference in a single assignment. The render loop reads the
+    reference once per frame, so each frame comes from one coherent state and no
+    lock is taken on the hot path.
+    """
+    __slots__ = ("previewInput", "programInput", "previewIndex", "programIndex", "fade", "wipe", "effectType",
+                 "stills", "stingers", "autoFrame", "autoFrames", "version")
+
+    def __init__(self, previewInput=None, programInput=None, previewIndex=1, programIndex=2, fade=0.0, wipe=0,
+                 effectType=MIX_TYPE.FADE, stills=None, stingers=None, autoFrame=0, autoFrames=0, version=0):
+        """
+        :param previewInput: The input device on preview.
+        :param programInput: The input device on program.
+        :param previewIndex: VideoHub position of the preview input.
+        :param programIndex: VideoHub position of the program input.
+        :param fade: The fade value (float between 0 and 1).
+        :param wipe: The wipe position index (int).
+        :param effectType: The type of mixing effect (MIX_TYPE enum).
+        :param stills: Dictionary of still images (never modified in place).
+        :param stingers: Dictionary of stinger animations (never modified in place).
+        :param autoFrame: Frames of the running auto transition already rendered.
+        :param autoFrames: Length in frames of the running auto transition, 0 when none is running.
+        :param version: Incremented by every replace(), useful to spot state changes.
+        """
+        set_ = object.__setattr__
+        set_(self, "previewInput", previewInput)
+        set_(self, "programInput", programInput)
+        set_(self, "previewIndex", previewIndex)
+        set_(self, "programIndex", programIndex)
+        set_(self, "fade", fade)
+        set_(self, "wipe", wipe)
+        set_(self, "effectType", effectType)
+        set_(self, "stills", stills if stills is not None else {})
+        set_(self, "stingers", stingers if stingers is not None else {})
+        set_(self, "autoFrame", autoFrame)
+        set_(self, "autoFrames", autoFrames)
+        set_(self, "version", version)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("MixState is immutable, use replace()")
+
+    def replace(self, **changes):
+        """
+        Return a new MixState with the given fields changed.
+        """
+        values = {name: getattr(self, name) for name in self.__slots__}
+        values.update(changes)
+        values['version'] = self.version + 1
+        return MixState(**values)
+
+    def __repr__(self):
+        return (f"MixState(v{self.version}, preview={self.previewIndex}, program={self.programIndex}, "
+                f"fade={self.fade:.2f}, wipe={self.wipe}, effect={self.effectType.name}, "
+                f"auto={self.autoFrame}/{self.autoFrames})")
+
+
 class MixBusWorker(QRunnable):
     """
     Worker class for mixing two video frames using a specified effect.
     This class runs in a separate thread.
     """
 
-    def __init__(self, prw_frame, prg_frame, fade, wipe, effect_type, stills, stingers, wipe_positions, callback):
+    def __init__(self, prw_frame, prg_frame, state, wipe_positions, callback, commands=()):
         """
         Initialize the MixBusWorker.
 
         :param prw_frame: The preview frame (numpy array).
         :param prg_frame: The program frame (numpy array).
-        :param fade: The fade value (float between 0 and 1).
-        :param wipe: The wipe position index (int).
-        :param effect_type: The type of mixing effect (MIX_TYPE enum).
-        :param stills: Dictionary of still images.
-        :param stingers: Dictionary of stinger animations.
+        :param state: The MixState snapshot the frame is rendered from.
         :param wipe_positions: Dictionary with wipe positions arrays.
-        :param callback: Callback function to return the mixed frame.
+        :param callback: Callback function receiving the mixed frame, the preview frame and the commands.
+        :param commands: Commands applied at the start of this frame, handed back to the callback
+                         so the command-to-air latency can be measured when the frame is out.
         """
         super().__init__()
         self.prw_frame = prw_frame
         self.prg_frame = prg_frame
-        self.fade = fade
-        self.wipe = wipe
-        self.effect_type = effect_type
-        self.stills = stills
-        self.stingers = stingers
+        self.state = state
+        self.fade = state.fade
+        self.wipe = state.wipe
+        self.effect_type = state.effectType
+        self.stills = state.stills
+        self.stingers = state.stingers
         self.wipe_positions = wipe_positions
         self.callback = callback  # Callback to return the mixed frame
+        self.commands = commands
 
     def run(self):
         """
         Mixing logic executed in a separate thread.
         """
         try:
-            if self.prw_frame is None or self.prg_frame is None:
-                logging.warning("One of the frames is None.")
-                return
-
-            if self.prw_frame.shape != self.prg_frame.shape:
-                logging.warning("Frames have different dimensions.")
-                return
-
-            mixed_frame = self.prg_frame.copy()
-
-            if self.effect_type == MIX_TYPE.FADE:
-                mixed_frame = cv2.addWeighted(self.prw_frame, self.fade, self.prg_frame, 1 - self.fade, 0)
-            elif self.effect_type == MIX_TYPE.WIPE_LEFT_TO_RIGHT:
-                mixed_frame = self.wipeLeftToRight(self.prw_frame, self.prg_frame)
-            elif self.effect_type == MIX_TYPE.WIPE_RIGHT_TO_LEFT:
-                mixed_frame = self.wipeRightToLeft(self.prw_frame, self.prg_frame)
-            elif self.effect_type == MIX_TYPE.WIPE_TOP_TO_BOTTOM:
-                mixed_frame = self.wipeTopToBottom(self.prw_frame, self.prg_frame)
-            elif self.effect_type == MIX_TYPE.WIPE_BOTTOM_TO_TOP:
-                mixed_frame = self.wipeBottomToTop(self.prw_frame, self.prg_frame)
-            elif self.effect_type in [MIX_TYPE.WIPE_STINGER1, MIX_TYPE.WIPE_STINGER2]:
-                mixed_frame = self.stinger(self.prw_frame, self.prg_frame)
-            else:
-                logging.warning(f"Effect type {self.effect_type} not implemented.")
-
-            self.callback(mixed_frame)  # Return the mixed frame via callback
+            with stageTimer.span("mix", args={'effect': self.effect_type.name}):
+                self.mix()
         except Exception as e:
             logging.exception(f"Exception in MixBusWorker: {e}")
 
+    def mix(self):
+        """
+        Apply the selected effect and hand the result to the callback.
+        """
+        if self.prw_frame is None or self.prg_frame is None:
+            logging.warning("One of the frames is None.")
+            return
+
+        if self.prw_frame.shape != self.prg_frame.shape:
+            logging.warning("Frames have different dimensions.")
+            return
+
+        mixed_frame = self.prg_frame.copy()
+
+        if self.effect_type == MIX_TYPE.FADE:
+            mixed_frame = cv2.addWeighted(self.prw_frame, self.fade, self.prg_frame, 1 - self.fade, 0)
+        elif self.effect_type == MIX_TYPE.WIPE_LEFT_TO_RIGHT:
+            mixed_frame = self.wipeLeftToRight(self.prw_frame, self.prg_frame)
+        elif self.effect_type == MIX_TYPE.WIPE_RIGHT_TO_LEFT:
+            mixed_frame = self.wipeRightToLeft(self.prw_frame, self.prg_frame)
+        elif self.effect_type == MIX_TYPE.WIPE_TOP_TO_BOTTOM:
+            mixed_frame = self.wipeTopToBottom(self.prw_frame, self.prg_frame)
+        elif self.effect_type == MIX_TYPE.WIPE_BOTTOM_TO_TOP:
+            mixed_frame = self.wipeBottomToTop(self.prw_frame, self.prg_frame)
+        elif self.effect_type in [MIX_TYPE.WIPE_STINGER1, MIX_TYPE.WIPE_STINGER2]:
+            mixed_frame = self.stinger(self.prw_frame, self.prg_frame)
+        else:
+            logging.warning(f"Effect type {self.effect_type} not implemented.")
+
+        self.callback(mixed_frame, self.prw_frame, self.commands)  # Return the mixed frame via callback
+
     def wipeLeftToRight(self, preview_frame, program_frame):
         """
         Perform a left-to-right wipe transition between preview and program frames.
@@ -155,11 +226,12 @@ class MixBusWorker(QRunnable):
         """
         stingerIndex = 1 if self.effect_type == MIX_TYPE.WIPE_STINGER1 else 2
 
-        # Recupera la posizione del wipe corrente per lo stinger
-        if self.wipe < len(self.wipe_positions["stinger"][stingerIndex]):
-            wipe_position = int(self.wipe_positions["stinger"][stingerIndex][self.wipe])
-        else:
-            wipe_position = int(self.wipe_positions["stinger"][stingerIndex][-1])
+        if stingerIndex not in self.stingers:
+            rtLogger.warning("mixBus.stingerMissing", "Stinger not loaded", stinger=stingerIndex)
+            return program_frame.copy()
+
+        # Per gli stinger il wipe è già l'indice del frame dell'animazione (vedi MixBus018._wipeIndex)
+        wipe_position = min(int(self.wipe), len(self.stingers[stingerIndex][0]) - 1)
 
         # Prendi i frame dello stinger e la maschera inversa
         stinger_frame = self.stingers[stingerIndex][0][wipe_position]
@@ -190,58 +262,135 @@ class MixBusWorker(QRunnable):
 class MixBus018(QObject):
     """
     MixBus class responsible for mixing two video inputs based on tally commands.
+
+    All the mix parameters live in an immutable MixState (see self.state). Control commands
+    (cut, auto, fader, effect, preview/program change) are not applied by the thread that
+    sends them: they are queued and applied, in order, at the start of the next rendered
+    frame, which then reads the resulting state once without locking. Auto transitions
+    are counted in rendered frames, so a 30 frame mix is exactly 30 output frames.
     """
     frame_ready = pyqtSignal(np.ndarray, np.ndarray, float)  # Signal to emit frames and FPS
+    latencyDetector = None  # Optional LatencyDetector tapped on the program output
+    tallyOutput = None  # Optional tally output (e.g. TslTallyOutput) updated on state changes
+    macroRecorder = None  # Optional MacroRecorder receiving every command with its frame number
+    macroPlayer = None  # Optional MacroPlayer injecting commands at their frames
 
-    def __init__(self, videoHub):
+    def __init__(self, videoHub, autoFrames=90):
         """
         Initialize the MixBus.
 
         :param videoHub: The VideoHubData instance containing input devices.
+        :param autoFrames: Default length of an auto transition in rendered frames.
         """
         super().__init__()
         self.videoHub = videoHub
-        self.previewInput = self.videoHub.getInputDevice(1)
-        self.programInput = self.videoHub.getInputDevice(2)
-        self._fade = 0
-        self._wipe = 0
-        self._wipeTime = 90  # Duration of the wipe effect
-        self.effect_type = MIX_TYPE.FADE
-        self.stills = {}
-        self.stingers = {}
+        self._wipeTime = 90  # Number of wipe positions
+        self.autoFrames = autoFrames
+        self._state = MixState(previewInput=self.videoHub.getInputDevice(1),
+                               programInput=self.videoHub.getInputDevice(2))
+        self._tallyState = None  # last state sent to the tally output
+        # serializes writers only (read-modify-write of the state); readers never take it
+        self._stateLock = threading.Lock()
+        # (cmd, args, enqueue time ns, frame number at enqueue); deque append/popleft are thread safe
+        self._commands = collections.deque()
+        self._autoPending = 0
+        self._commandLatency = collections.defaultdict(lambda: collections.deque(maxlen=1000))
+        self._applyTable = {
+            'cut': self._applyCut,
+            'auto': self._applyAuto,
+            'faderChange': self._applyFade,
+            'effectChange': self._applyEffect,
+            'previewChange': self._applyPreview,
+            'programChange': self._applyProgram,
+        }
         self.isStingerLoaded = {1: False, 2: False}
         self.isStillLoaded = {1: False, 2: False, 3: False, 4: False}
         self.still = None
-        self.actualPreviewIndex = 1
-        self.actualProgramIndex = 2
         self._wipe_position_leftToRight_list = np.linspace(0, 1920, self._wipeTime)
         self._wipe_position_rightToLeft_list = np.linspace(1920, 0, self._wipeTime)
         self._wipe_position_topToBottom_list = np.linspace(0, 1080, self._wipeTime)
         self._wipe_position_bottomToTop_list = np.linspace(1080, 0, self._wipeTime)
         self._wipe_position_stinger_list = np.linspace(0, 1920, self._wipeTime)
+        self._wipePositions = {
+            "leftToRight": self._wipe_position_leftToRight_list,
+            "rightToLeft": self._wipe_position_rightToLeft_list,
+            "topToBottom": self._wipe_position_topToBottom_list,
+            "bottomToTop": self._wipe_position_bottomToTop_list,
+            "stinger": self._wipe_position_stinger_list
+        }
 
         self.thread_pool = QThreadPool.globalInstance()  # Use global thread pool
         self.total_frames = 0
         self.total_time = 0
         self.start_time = time.time()
         self.last_fps = 60
-        self.input_mutex = QMutex()  # Mutex for thread-safe access to inputs
 
-        # Timer for automix
-        self.autoMix_timer = QTimer(self)
-        self.autoMix_timer.timeout.connect(self._fader)
+    @property
+    def state(self):
+        """
+        The current MixState snapshot.
+        """
+        return self._state
 
-    def getMixed(self):
+    def updateState(self, **changes):
         """
-        Initiate the mixing process.
+        Replace the current state with a copy carrying the given changes.
+
+        :return: The new MixState.
         """
-        start_time = time.perf_counter()
-        with QMutexLocker(self.input_mutex):
-            prw_input = self.previewInput
-            prg_input = self.programInput
+        with self._stateLock:
+            self._state = self._state.replace(**changes)
+            return self._state
+
+    # Read-only views on the state, kept for code that still reads the old attributes
+    @property
+    def previewInput(self):
+        return self._state.previewInput
 
-        prw_frame = prw_input.getFrame() if prw_input else None
-        prg_frame = prg_input.getFrame() if prg_input else None
+    @property
+    def programInput(self):
+        return self._state.programInput
+
+    @property
+    def actualPreviewIndex(self):
+        return self._state.previewIndex
+
+    @property
+    def actualProgramIndex(self):
+        return self._state.programIndex
+
+    @property
+    def effect_type(self):
+        return self._state.effectType
+
+    @property
+    def stills(self):
+        return self._state.stills
+
+    @property
+    def stingers(self):
+        return self._state.stingers
+
+    def getMixed(self):
+        """
+        Initiate the mixing process: apply the queued commands, advance the running
+        auto transition by one frame and render from the resulting snapshot.
+        """
+        start_ns = time.perf_counter_ns()
+        if self.macroPlayer is not None:
+            for tally_data in self.macroPlayer.dueCommands(self.total_frames):
+                tally_data['sender'] = 'macro'
+                self.parseTallySignal(tally_data)
+        commands = self._applyCommands()
+        self._advanceTransition()
+        state = self._state  # one read per frame: the whole frame is rendered from this snapshot
+        if self.tallyOutput is not None and state is not self._tallyState:
+            # non-blocking UDP send, and only the slots whose tally changed
+            self._tallyState = state
+            self.tallyOutput.updateFromState(state)
+
+        prw_frame = state.previewInput.getFrame() if state.previewInput else None
+        prg_frame = state.programInput.getFrame() if state.programInput else None
 
         # Calculate FPS
         current_time = time.time()
@@ -252,27 +401,31 @@ class MixBus018(QObject):
             self.last_fps = self.total_frames / self.total_time
 
         # Create a worker to process the frames
-        worker = MixBusWorker(
-            prw_frame, prg_frame, self._fade, self._wipe, self.effect_type,
-            self.stills, self.stingers, self.getWipePositions(), self.handle_frame_processed
-        )
+        worker = MixBusWorker(prw_frame, prg_frame, state, self._wipePositions, self.handle_frame_processed,
+                              commands)
 
         # Execute the worker in the thread pool
         self.thread_pool.start(worker)
-        end_time = time.perf_counter()
-        processing_time = (end_time - start_time) * 1000  # Tempo in millisecondi
-        # logging.debug(f"MixBus.getMixed() took {processing_time:.2f} ms")
+        stageTimer.record("mix.dispatch", start_ns, time.perf_counter_ns())
 
-    def handle_frame_processed(self, mixed_frame):
+    def handle_frame_processed(self, mixed_frame, prw_frame=None, commands=()):
         """
         Handle the mixed frame processed by the worker.
 
         :param mixed_frame: The mixed frame result from the worker.
-        """
+        :param prw_frame: The preview frame the worker mixed from.
+        :param commands: The commands applied at the start of this frame.
+        """
+        if commands:
+            self._recordCommandLatency(commands)
+        if self.latencyDetector is not None:
+            self.latencyDetector.tap("program", mixed_frame)
+        if prw_frame is None:
+            prw_frame = self._state.previewInput.getFrame()
         # Emit the frame_ready signal in the main thread
         QMetaObject.invokeMethod(
             self, "emit_frame_ready", Qt.ConnectionType.QueuedConnection,
-            Q_ARG(np.ndarray, self.previewInput.getFrame()),
+            Q_ARG(np.ndarray, prw_frame),
             Q_ARG(np.ndarray, mixed_frame),
             Q_ARG(float, self.last_fps)
         )
@@ -288,31 +441,137 @@ class MixBus018(QObject):
         """
         self.frame_ready.emit(prw_frame, prg_frame, fps)
 
+    # --- command queue -------------------------------------------------------------
+
+    def enqueueCommand(self, cmd, *args):
+        """
+        Queue a control command; it is applied at the start of the next rendered frame.
+
+        :param cmd: One of 'cut', 'auto', 'faderChange', 'effectChange', 'previewChange', 'programChange'.
+        :param args: Arguments of the matching _apply method.
+        """
+        if cmd not in self._applyTable:
+            raise ValueError(f"Unknown mix command: {cmd}")
+        if cmd == 'auto':
+            # enqueueCommand runs on the UI and ControlServer threads, _applyCommands on the render thread
+            with self._stateLock:
+                self._autoPending += 1
+        self._commands.append((cmd, args, time.perf_counter_ns(), self.total_frames))
+
+    def _applyCommands(self):
+        """
+        Apply every queued command in arrival order (render thread only).
+
+        :return: List of (cmd, enqueue time ns, frames waited) for the latency statistics.
+        """
+        applied = []
+        while True:
+            try:
+                cmd, args, enqueued_ns, enqueued_frame = self._commands.popleft()
+            except IndexError:
+                break
+            try:
+                self._applyTable[cmd](*args)
+            except Exception as e:
+                logging.exception(f"MixBus command {cmd} failed: {e}")
+            finally:
+                if cmd == 'auto':
+                    with self._stateLock:
+                        self._autoPending -= 1
+            applied.append((cmd, enqueued_ns, self.total_frames - enqueued_frame))
+        return applied
+
+    def _recordCommandLatency(self, commands):
+        """
+        Store the command-to-air latency of the commands applied to a frame that is now out.
+        """
+        now = time.perf_counter_ns()
+        for cmd, enqueued_ns, frames in commands:
+            self._commandLatency[cmd].append(((now - enqueued_ns) / 1e6, frames))
+            stageTimer.record("command", enqueued_ns, now, cat="control", args={'cmd': cmd})
+
+    def getCommandStats(self):
+        """
+        Command-to-air latency per command: from enqueueCommand to the mixed frame
+        carrying the command leaving the worker.
+
+        :return: {cmd: {'count', 'avgMs', 'p50Ms', 'p99Ms', 'maxMs', 'maxFrames'}}
+        """
+        stats = {}
+        for cmd, samples in list(self._commandLatency.items()):
+            samples = list(samples)
+            if not samples:
+                continue
+            latencies = np.array([latency for latency, _ in samples])
+            stats[cmd] = {
+                'count': len(samples),
+                'avgMs': round(float(latencies.mean()), 3),
+                'p50Ms': round(float(np.percentile(latencies, 50)), 3),
+                'p99Ms': round(float(np.percentile(latencies, 99)), 3),
+                'maxMs': round(float(latencies.max()), 3),
+                'maxFrames': max(frames for _, frames in samples),
+            }
+        return stats
+
+    def resetCommandStats(self):
+        self._commandLatency.clear()
+
+    # --- control API (any thread) ----------------------------------------------------
+
     def setFade(self, value: int):
         """
-        Set the fade value and update wipe positions accordingly.
+        Set the fade value (applied at the next frame); a manual fade stops a running auto.
 
         :param value: Fade value between 0 and 100.
         """
-        with QMutexLocker(self.input_mutex):
-            if value == 0:
-                self._fade = 0
-            else:
-                self._fade = value / 100
-
-                if self.effect_type == MIX_TYPE.WIPE_LEFT_TO_RIGHT:
-                    self._wipe = self.map_value(value, 0, 100, 0, len(self._wipe_position_leftToRight_list) - 1)
-                elif self.effect_type == MIX_TYPE.WIPE_RIGHT_TO_LEFT:
-                    self._wipe = self.map_value(value, 0, 100, 0, len(self._wipe_position_rightToLeft_list) - 1)
+        self.enqueueCommand('faderChange', value)
 
     def setEffectType(self, effect_type):
         """
-        Set the mixing effect type.
+        Set the mixing effect type (applied at the next frame).
 
         :param effect_type: The effect type from MIX_TYPE enum.
         """
-        with QMutexLocker(self.input_mutex):
-            self.effect_type = effect_type
+        self.enqueueCommand('effectChange', effect_type)
+
+    def cut(self):
+        """
+        Swap preview and program at the start of the next frame.
+        """
+        self.enqueueCommand('cut')
+
+    def autoMix(self, frames=None):
+        """
+        Start an auto transition at the next frame.
+
+        :param frames: Length of the transition in rendered frames (default self.autoFrames).
+        """
+        frames = int(frames or self.autoFrames)
+        logging.info(f"Starting AutoMix for {frames} frames")
+        self.enqueueCommand('auto', frames)
+
+    def isTransitionRunning(self):
+        """
+        Return True while an auto transition is queued or in progress.
+        """
+        return self._autoPending > 0 or self._state.autoFrames > 0
+
+    def setLatencyDetector(self, detector):
+        """
+        Attach a LatencyDetector to the program output (None to detach).
+
+        :param detector: The LatencyDetector instance.
+        """
+        self.latencyDetector = detector
+
+    def setTallyOutput(self, tallyOutput):
+        """
+        Attach a tally output updated from the rendered state (None to detach).
+
+        :param tallyOutput: Object with an updateFromState(MixState) method, e.g. TslTallyOutput.
+        """
+        self._tallyState = None
+        self.tallyOutput = tallyOutput
 
     def setStill(self, position, still_frame):
         """
@@ -321,7 +580,8 @@ class MixBus018(QObject):
         :param position: Position index for the still image.
         :param still_frame: The still image frame.
         """
-        self.stills[position] = still_frame
+        with self._stateLock:
+            self._state = self._state.replace(stills={**self._state.stills, position: still_frame})
 
     def setStinger(self, position, stinger_frame, inv_mask):
         """
@@ -331,7 +591,8 @@ class MixBus018(QObject):
         :param stinger_frame: The stinger frame.
         :param inv_mask: The inverse mask for the stinger.
         """
-        self.stingers[position] = (stinger_frame, inv_mask)
+        with self._stateLock:
+            self._state = self._state.replace(stingers={**self._state.stingers, position: (stinger_frame, inv_mask)})
 
     def getWipePositions(self):
         """
@@ -339,45 +600,73 @@ class MixBus018(QObject):
 
         :return: Dictionary containing wipe positions for all wipe directions.
         """
-        return {
-            "leftToRight": self._wipe_position_leftToRight_list,
-            "rightToLeft": self._wipe_position_rightToLeft_list,
-            "topToBottom": self._wipe_position_topToBottom_list,
-            "bottomToTop": self._wipe_position_bottomToTop_list,
-            "stinger": self._wipe_position_stinger_list
-        }
-
-    def cut(self):
-        """
-        Perform an immediate cut between preview and program inputs.
-        """
-        with QMutexLocker(self.input_mutex):
-            self._fade = 0
-            self._wipe = 0
-            self.previewInput, self.programInput = self.programInput, self.previewInput
+        return self._wipePositions
 
-    def autoMix(self):
-        """
-        Start the automix transition.
-        """
-        logging.info(f"Starting AutoMix for duration {self._wipeTime}")
-        self.autoMix_timer.start(1000 // 60)  # Adjust timer interval as needed
+    # --- command application (render thread, start of frame) --------------------------
 
-    def _fader(self):
+    def _wipeIndex(self, effect_type, progress):
         """
-        Internal method to handle fade and wipe transitions over time.
+        Wipe position index for a transition progress between 0 and 1.
         """
-        if self.effect_type == MIX_TYPE.FADE:
-            self._fade += 0.01
-            if self._fade >= 1:
-                self.autoMix_timer.stop()
-                self.cut()
-        elif self.effect_type in [MIX_TYPE.WIPE_LEFT_TO_RIGHT, MIX_TYPE.WIPE_RIGHT_TO_LEFT]:
-            self._wipe += 1
-            self._fade += 0.01
-            if self._wipe >= len(self._wipe_position_leftToRight_list) - 1:
-                self.autoMix_timer.stop()
-                self.cut()
+        if effect_type in [MIX_TYPE.WIPE_STINGER1, MIX_TYPE.WIPE_STINGER2]:
+            index = 1 if effect_type == MIX_TYPE.WIPE_STINGER1 else 2
+            stinger = self._state.stingers.get(index)
+            length = len(stinger[0]) if stinger else self._wipeTime
+        else:
+            length = self._wipeTime
+        return min(length - 1, int(round(progress * (length - 1))))
+
+    def _applyCut(self):
+        with self._stateLock:
+            state = self._state
+            self._state = state.replace(fade=0, wipe=0, autoFrame=0, autoFrames=0,
+                                        previewInput=state.programInput, programInput=state.previewInput,
+                                        previewIndex=state.programIndex, programIndex=state.previewIndex)
+
+    def _applyAuto(self, frames):
+        frames = max(1, frames)
+        with self._stateLock:
+            state = self._state
+            # continue from where the fader is: restarting from 0 would jump the picture back on air
+            self._state = state.replace(autoFrame=min(frames, int(round(state.fade * frames))), autoFrames=frames)
+
+    def _applyFade(self, value):
+        with self._stateLock:
+            state = self._state
+            if value == 0:
+                self._state = state.replace(fade=0, autoFrame=0, autoFrames=0)
+                return
+            wipe = state.wipe
+            if state.effectType == MIX_TYPE.WIPE_LEFT_TO_RIGHT:
+                wipe = self.map_value(value, 0, 100, 0, len(self._wipe_position_leftToRight_list) - 1)
+            elif state.effectType == MIX_TYPE.WIPE_RIGHT_TO_LEFT:
+                wipe = self.map_value(value, 0, 100, 0, len(self._wipe_position_rightToLeft_list) - 1)
+            self._state = state.replace(fade=value / 100, wipe=wipe, autoFrame=0, autoFrames=0)
+
+    def _applyEffect(self, effect_type):
+        self.updateState(effectType=effect_type)
+
+    def _applyPreview(self, position):
+        self.updateState(previewIndex=position, previewInput=self.videoHub.getInputDevice(position))
+
+    def _applyProgram(self, position):
+        self.updateState(programIndex=position, programInput=self.videoHub.getInputDevice(position))
+
+    def _advanceTransition(self):
+        """
+        Advance the running auto transition by one rendered frame. Frame k of an
+        N frame transition (k = 1..N) is rendered at progress k / N; the cut happens
+        at the start of the following frame, so the transition lasts exactly N frames.
+        """
+        state = self._state
+        if not state.autoFrames:
+            return
+        if state.autoFrame >= state.autoFrames:
+            self._applyCut()
+            return
+        frame = state.autoFrame + 1
+        progress = frame / state.autoFrames
+        self.updateState(autoFrame=frame, fade=progress, wipe=self._wipeIndex(state.effectType, progress))
 
     def parseTallySignal(self, tally_data):
         """
@@ -386,13 +675,16 @@ class MixBus018(QObject):
         :param tally_data: Dictionary containing tally commands and data.
         """
         logging.debug(f"MixBus received tally data: {tally_data}")
+        if self.macroRecorder is not None and tally_data.get('sender') != 'macro':
+            # queued commands are applied at the start of frame total_frames, the render clock
+            self.macroRecorder.record(self.total_frames, tally_data)
         tally_data['sender'] = 'mixBus'
         cmd = tally_data.get('cmd')
         if cmd == 'cut':
             self.cut()
         elif cmd == 'auto':
             logging.info(f"AutoMix command received.")
-            self.autoMix()
+            self.autoMix(tally_data.get('frames'))
         elif cmd == 'faderChange':
             fade_value = int(float(tally_data.get('fade', 0)) * 100)
             self.setFade(fade_value)
@@ -403,24 +695,17 @@ class MixBus018(QObject):
             logging.info(f"Effect changed to {effect_enum}")
         elif cmd == 'previewChange':
             logging.info(f"Preview input change to {tally_data['preview']}")
-            self.actualPreviewIndex = int(tally_data['preview'])
-            new_preview_input = self.videoHub.getInputDevice(self.actualPreviewIndex)
-            with QMutexLocker(self.input_mutex):
-                self.previewInput = new_preview_input
+            self.enqueueCommand('previewChange', int(tally_data['preview']))
         elif cmd == 'programChange':
             logging.info(f"Program input change to {tally_data['program']}")
-            self.actualProgramIndex = int(tally_data['program'])
-            new_program_input = self.videoHub.getInputDevice(self.actualProgramIndex)
-            with QMutexLocker(self.input_mutex):
-                self.programInput = new_program_input
+            self.enqueueCommand('programChange', int(tally_data['program']))
         elif cmd == 'inputChanged':
             position = tally_data.get('position')
-            if position == self.actualPreviewIndex:
-                with QMutexLocker(self.input_mutex):
-                    self.previewInput = self.videoHub.getInputDevice(position)
-            elif position == self.actualProgramIndex:
-                with QMutexLocker(self.input_mutex):
-                    self.programInput = self.videoHub.getInputDevice(position)
+            state = self._state
+            if position == state.previewIndex:
+                self.updateState(previewInput=self.videoHub.getInputDevice(position))
+            elif position == state.programIndex:
+                self.updateState(programInput=self.videoHub.getInputDevice(position))
         elif cmd == 'stingerReady':
             logging.info(f"Stinger ready at position {tally_data['position']}")
             position = tally_data.get('position')
@@ -453,9 +738,9 @@ class MixBus018(QObject):
 
     def stop(self):
         """
-        Stop the MixBus processing and timers.
+        Stop the MixBus processing.
         """
-        self.autoMix_timer.stop()
+        self._commands.clear()
         # Wait for all threads in the thread pool to finish
         self.thread_pool.waitForDone()
         logging.info("MixBus stopped.")
@@ -8,7 +8,9 @@ from mainDir.MrKeyboard.mixingKeyboard import MixerKeyboard
 from mainDir.errorClass.loggerClass import ErrorClass
 from mainDir.mixBus.mixBus017 import MixBus017_NoThread
 from mainDir.outputs.openGLViewerThread016 import OpenGLViewerThread016
+from mainDir.remoteControl.controlServer import ControlServer
 from mainDir.tallyManager.tallyManager import TallyManager
+from mainDir.tallyManager.tslTallyOutput import TslTallyOutput
 from mainDir.videoHub.videoHubWidget.videoHubWidget019 import VideoHubWidget019
 from mainDir.videoHub.videoHubData018 import VideoHubData018
 
@@ -28,6 +30,8 @@ class MixEffect017(QWidget):
         self.videoHubData = VideoHubData018(self)
         self.videoHubWidget = VideoHubWidget019(self.videoHubData)
         self.mixEffectTimer = QTimer(self)
+        self.controlServer = None
+        self.tallyOutput = None
         # Initialize MixBus
         self.mixBus = MixBus017_NoThread(self.videoHubData)
         # with test Modality you have
@@ -39,8 +43,64 @@ class MixEffect017(QWidget):
 
     @ErrorClass().log(log_level=logging.DEBUG)
     def closeEvent(self, event, *args, **kwargs):
+        self.stopControlServer()
+        self.stopTallyOutput()
         event.accept()
 
+    def startControlServer(self, host="127.0.0.1", port=9910):
+        """
+        Avvia il server di controllo remoto: i comandi arrivano al TallyManager
+        come quelli della tastiera.
+        """
+        if self.controlServer is not None:
+            return self.controlServer
+        self.controlServer = ControlServer(host, port, self)
+        self.controlServer.tally_SIGNAL.connect(self.tallyManager.parseTallySignal)
+        self.controlServer.start()
+        return self.controlServer
+
+    def stopControlServer(self):
+        if self.controlServer is not None:
+            self.controlServer.stop()
+            self.controlServer = None
+
+    def startTallyOutput(self, host="127.0.0.1", port=8900):
+        """
+        Manda i tally di program/preview in UDP (TSL UMD v3.1) ai display delle camere.
+        I tally seguono lo stato applicato dal mixBus a ogni frame (getMixed), quindi valgono
+        per tastiera, remote control e auto allo stesso modo.
+        """
+        if self.tallyOutput is None:
+            self.tallyOutput = TslTallyOutput(host, port, parent=self)
+            self.updateTally()
+        return self.tallyOutput
+
+    def stopTallyOutput(self):
+        if self.tallyOutput is not None:
+            # display spenti prima di chiudere il socket
+            self.tallyOutput.update(set(), set())
+            self.tallyOutput.close()
+            self.tallyOutput = None
+
+    def slotOf(self, inputDevice):
+        """
+        Posizione dell'hub (0..8) in cui si trova inputDevice, None se non c'è.
+        """
+        for position, device in self.videoHubData.videoHubMatrix.items():
+            if device is inputDevice and position.isdigit():
+                return int(position)
+        return None
+
+    def updateTally(self):
+        """
+        Aggiorna l'uscita tally dagli input che il mixBus sta usando: con il fader aperto
+        (mix o auto in corso) anche la preview è in onda. Partono pacchetti solo per gli slot cambiati.
+        """
+        program = self.slotOf(self.mixBus.programInput)
+        preview = self.slotOf(self.mixBus.previewInput)
+        onAir = {program, preview} if self.mixBus._fade > 0 else {program}
+        self.tallyOutput.update(onAir - {None}, {preview} - {None})
+
     @ErrorClass().log(log_level=logging.DEBUG)
     def initUI(self):
         mainLayout = QVBoxLayout()
@@ -76,6 +136,8 @@ class MixEffect017(QWidget):
     def getMixed(self):
         prw_frame, prg_frame = self.mixBus.getMixed()
         fps = self.mixBus.getFps()
+        if self.tallyOutput is not None:
+            self.updateTally()
         if self.isTestModality:
             self.prwViewer.setFrame(prw_frame)
             self.prgViewer.setFrame(prg_frame)
@@ -24,6 +24,8 @@ class CodecWidget(QWidget):
     lblPreset: QLabel
     lblRateControl: QLabel
     lblTune: QLabel
+    lblRenditions: QLabel
+    txtRenditions: QLineEdit
 
     presetDictionary = {}
 
@@ -72,6 +74,11 @@ class CodecWidget(QWidget):
         self.cmbTune = QComboBox(self)
         self.cmbTune.addItems(["None", "film", "animation", "grain", "stillimage", "fastdecode", "zerolatency"])
 
+        # Scala ABR per lo streaming: vuota = una sola rendition con i parametri sopra
+        self.lblRenditions = QLabel("Renditions (ABR ladder, e.g. 1080p:6000, 720p:3000, 480p30:1200):")
+        self.txtRenditions = QLineEdit(self)
+        self.txtRenditions.setPlaceholderText("single rendition")
+
     @staticmethod
     def return2ColumnLayout(label1, widget1, label2, widget2):
         layout = QHBoxLayout()
@@ -116,6 +123,10 @@ class CodecWidget(QWidget):
         # Add Keyframe Interval Slider
         main_layout.addWidget(self.sliderKeyframeInterval)
 
+        # Add ABR Ladder
+        main_layout.addWidget(self.lblRenditions)
+        main_layout.addWidget(self.txtRenditions)
+
         self.setLayout(main_layout)
 
     def initConnections(self):
@@ -203,7 +214,8 @@ class CodecWidget(QWidget):
             "bitrate": self.sliderBitrate.getValue(),
             "bufferSize": self.sliderBufferSize.getValue(),
             "tune": self.cmbTune.currentText(),
-            "keyframeInterval": self.sliderKeyframeInterval.getValue()
+            "keyframeInterval": self.sliderKeyframeInterval.getValue(),
+            "renditions": self.txtRenditions.text().strip()
         }
 
     def deserialize(self, data):
@@ -216,6 +228,7 @@ class CodecWidget(QWidget):
         self.sliderBufferSize.setValue(data.get("bufferSize", 10000))
         self.cmbTune.setCurrentText(data.get("tune", "None"))
         self.sliderKeyframeInterval.setValue(data.get("keyframeInterval", 2))
+        self.txtRenditions.setText(data.get("renditions", ""))
 
 
 if __name__ == "__main__":
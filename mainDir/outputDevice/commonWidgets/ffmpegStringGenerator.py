@@ -1,5 +1,47 @@
 from PyQt6.QtCore import QObject
 
+# formato del muxer per schema di URL o estensione del file
+TEE_NETWORK_FORMATS = {'rtmp': "flv", 'rtmps': "flv", 'srt': "mpegts", 'udp': "mpegts", 'rtp': "rtp_mpegts"}
+TEE_FILE_FORMATS = {'mp4': "mp4", 'mov': "mov", 'mkv': "matroska", 'ts': "mpegts", 'flv': "flv"}
+
+# ogni uscita di rete passa da una fifo: se la destinazione rallenta o cade i pacchetti
+# vengono scartati e la connessione ritentata, senza fermare le altre uscite
+TEE_FIFO_OPTIONS = "drop_pkts_on_overflow=1:attempt_recovery=1:recover_any_error=1:recovery_wait_time=2"
+
+# scala ABR predefinita, nel formato del campo Renditions del CodecWidget
+DEFAULT_RENDITIONS = "1080p:6000, 720p:3000, 480p:1200"
+
+
+def parseRenditions(text):
+    """
+    Legge una scala di rendition nel formato "1080p:6000, 720p30:3000, 480p:1200"
+    (altezza, frame rate opzionale dopo la p, bitrate video in kbit/s).
+
+    :return: lista di {'name', 'width', 'height', 'fps', 'bitrate'} (fps None = quello del program)
+    """
+    renditions = []
+    for item in text.replace(";", ",").split(","):
+        item = item.strip().lower()
+        if not item:
+            continue
+        size, _, bitrate = item.partition(":")
+        height, _, fps = size.partition("p")
+        try:
+            height = int(height)
+            bitrate = int(bitrate) if bitrate else 0
+            fps = float(fps) if fps else None
+        except ValueError:
+            raise ValueError(f"Invalid rendition: {item!r}")
+        if height <= 0 or height % 2:
+            raise ValueError(f"Invalid rendition height: {item!r}")
+        width = int(round(height * 16 / 9 / 2)) * 2
+        renditions.append({'name': size, 'width': width, 'height': height, 'fps': fps, 'bitrate': bitrate})
+    return renditions
+
+
+def formatRenditions(renditions):
+    return ", ".join(f"{rendition['name']}:{rendition['bitrate']}" for rendition in renditions)
+
 
 class FFMpegStringGenerator(QObject):
     def __init__(self, parent=None):
@@ -32,6 +74,132 @@ class FFMpegStringGenerator(QObject):
 
         return self._command
 
+    def generateTeeCommand(self, request, destinations):
+        """
+        Un solo encode per più destinazioni (file e RTMP/SRT/UDP) con il muxer tee di FFmpeg.
+
+        :param request: come per generateFFMpegCommand (sorgente, 'codec', ...).
+        :param destinations: lista di URL o percorsi di file.
+        :return: il comando, oppure [] se non ci sono destinazioni
+        """
+        slaves = [self.teeSlave(destination) for destination in destinations if destination]
+        if not slaves:
+            return []
+        self._command = []
+        self._command += self.initVideoSource(request)
+        self._command += self.initAudioSource(request)
+        self._command += ["-map", "0:v", "-map", "1:a"]
+        self._command += self.initVideoCodec(request)
+        self._command += self.initAudioCodec(request)
+        self._command += self.addTuning(request)
+        # mp4 e flv vogliono gli header globali, che con il tee vanno chiesti all'encoder
+        self._command += ["-flags", "+global_header", "-shortest"]
+        self._command += ["-f", "tee", "-fifo_options", TEE_FIFO_OPTIONS, "|".join(slaves)]
+        return self._command
+
+    def generateLadderCommand(self, request, renditions, destination):
+        """
+        Scala ABR da una sola pipe raw: il program entra una volta, un filtro split/scale
+        produce le rendition e ognuna ha il suo encoder.
+
+        :param request: come per generateFFMpegCommand; request['codec'] vale per tutte le rendition.
+        :param renditions: lista di parseRenditions.
+        :param destination: "....m3u8" per un HLS con master playlist, "null" per scartare l'output
+                            (benchmark), altrimenti un URL a cui viene aggiunto "_<rendition>"
+                            per ogni rendition (RTMP, SRT, ...).
+        """
+        if not renditions:
+            return []
+        self._command = []
+        self._command += self.initVideoSource(request)
+        self._command += self.initAudioSource(request)
+        self._command += ["-filter_complex", self.ladderFilterGraph(request, renditions)]
+        codec = self.initVideoCodec(request)
+        keyframe_interval = self._codec.get('keyframeInterval', 2)
+        hls = destination.lower().endswith(".m3u8")
+        if hls:
+            for index in range(len(renditions)):
+                self._command += ["-map", f"[v{index}]", "-map", "1:a"]
+            self._command += codec + self.initAudioCodec(request)
+            for index, rendition in enumerate(renditions):
+                self._command += self.renditionRateControl(rendition, keyframe_interval, f":{index}")
+            base, _, name = destination.replace("\\", "/").rpartition("/")
+            stream_map = " ".join(f"v:{index},a:{index},name:{rendition['name']}"
+                                  for index, rendition in enumerate(renditions))
+            self._command += [
+                "-shortest",
+                "-var_stream_map", stream_map,
+                "-master_pl_name", name,
+                "-f", "hls", "-hls_time", "2", "-hls_list_size", "6", "-hls_flags", "delete_segments",
+                f"{base}/%v.m3u8" if base else "%v.m3u8",
+            ]
+        else:
+            stem, _, query = destination.partition("?")
+            for index, rendition in enumerate(renditions):
+                target = f"{stem}_{rendition['name']}" + (f"?{query}" if query else "")
+                self._command += ["-map", f"[v{index}]", "-map", "1:a"]
+                self._command += codec + self.initAudioCodec(request)
+                self._command += self.renditionRateControl(rendition, keyframe_interval) + ["-shortest"]
+                if destination == "null":
+                    self._command += ["-f", "null", "-"]
+                else:
+                    self._command += ["-f", self.muxerFor(target)[0], target]
+        return self._command
+
+    def ladderFilterGraph(self, request, renditions):
+        """
+        "[0:v]split=3[s0][s1][s2];[s0]null[v0];[s1]scale=1280:720:flags=area[v1];..."
+        """
+        source_height = int(str(request.get('videoSize', '1920x1080')).split("x")[1])
+        graph = [f"[0:v]split={len(renditions)}" + "".join(f"[s{index}]" for index in range(len(renditions)))]
+        for index, rendition in enumerate(renditions):
+            filters = []
+            if rendition['height'] != source_height:
+                filters.append(f"scale={rendition['width']}:{rendition['height']}:flags=area")
+            if rendition['fps'] and rendition['fps'] != float(request.get('frameRate', 60)):
+                filters.append(f"fps={rendition['fps']:g}")
+            graph.append(f"[s{index}]{','.join(filters) or 'null'}[v{index}]")
+        return ";".join(graph)
+
+    def renditionRateControl(self, rendition, keyframe_interval, specifier=""):
+        """
+        Bitrate, buffer e GOP di una rendition; specifier è ":n" quando più rendition
+        condividono la stessa uscita (HLS).
+        """
+        bitrate = rendition['bitrate'] or self._codec.get('bitrate', 2500)
+        fps = rendition['fps'] or float(self._frameRate)
+        options = [f"-b:v{specifier}", f"{bitrate}k", f"-maxrate:v{specifier}", f"{bitrate}k",
+                   f"-bufsize:v{specifier}", f"{bitrate * 2}k"]
+        if keyframe_interval > 0:
+            # GOP uguale in secondi su tutte le rendition, così i segmenti restano allineati
+            options += [f"-g:v{specifier}", str(int(keyframe_interval * fps))]
+        return options
+
+    @staticmethod
+    def muxerFor(destination):
+        """
+        :return: (formato del muxer, True se la destinazione è di rete)
+        """
+        if "://" in destination:
+            return TEE_NETWORK_FORMATS.get(destination.split("://", 1)[0].lower(), "mpegts"), True
+        extension = destination.rsplit(".", 1)[-1].lower() if "." in destination else ""
+        return TEE_FILE_FORMATS.get(extension, "matroska"), False
+
+    @classmethod
+    def teeSlave(cls, destination):
+        """
+        Specifica tee di una destinazione, per esempio "[f=flv:onfail=ignore:use_fifo=1]rtmp://...".
+        Con onfail=ignore una destinazione che fallisce viene chiusa e le altre continuano.
+        """
+        muxer, network = cls.muxerFor(destination)
+        options = f"f={muxer}:onfail=ignore"
+        if network:
+            options += ":use_fifo=1"
+        elif muxer in ("mp4", "mov"):
+            options += ":movflags=+faststart"
+        target = destination.replace("\\", "\\\\").replace("|", "\\|").replace("[", "\\[").replace("]", "\\]")
+        return f"[{options}]{target}"
+
     def initVideoSource(self, request):
         """
         Inizializza la sorgente video.
@@ -102,7 +270,8 @@ class FFMpegStringGenerator(QObject):
         if tune and tune != 'None':
             options += ["-tune", tune]
         if keyframe_interval > 0:
-            options += ["-g", str(keyframe_interval)]
+            # keyframeInterval è in secondi, -g in frame
+            options += ["-g", str(int(keyframe_interval * float(self._frameRate)))]
 
         return options
 
@@ -135,13 +304,14 @@ class FFMpegStringGenerator(QObject):
         """
         profile = self._codec.get('profile', 'main')
         bitrate = self._codec.get('bitrate', 1500)
+        preset = self._codec.get('preset', 'slow')
 
         return [
             "-c:v", "libx265",
             "-profile:v", profile,
             "-b:v", f"{bitrate}k",
             "-x265-params", "log-level=error",
-            "-preset", "slow"
+            "-preset", preset
         ]
 
     def generateHevcNvencCodec(self):
@@ -0,0 +1,111 @@
+from PyQt6.QtWidgets import *
+from PyQt6.QtCore import *
+
+"""
+Dialogo di scelta degli input per la registrazione ISO.
+
+Ogni input del videoHub è una riga con una casella di spunta: si registrano solo quelli
+spuntati, nell'ordine della lista. L'ordine è anche la priorità: quando i worker del
+program rallentano l'IsoRecorder sospende prima gli ultimi della lista.
+Le righe si spostano trascinandole oppure con i pulsanti Up/Down.
+"""
+
+
+class IsoSelectionDialog(QDialog):
+    lstInputs: QListWidget
+    btnUp: QPushButton
+    btnDown: QPushButton
+    buttonBox: QDialogButtonBox
+
+    def __init__(self, videoHub, positions=None, inputCount=9, parent=None):
+        """
+        :param videoHub: il VideoHubData da cui leggere i nomi degli input.
+        :param positions: la selezione precedente, in ordine di priorità; None = gli input non neri.
+        """
+        super(IsoSelectionDialog, self).__init__(parent)
+        self.videoHub = videoHub
+        self.positions = [str(position) for position in positions] if positions is not None else None
+        self.inputCount = inputCount
+        self.initWidgets()
+        self.initUI()
+        self.initConnections()
+
+    def initWidgets(self):
+        """Inizializza i widget: prima le posizioni selezionate nel loro ordine, poi le altre."""
+        self.lstInputs = QListWidget()
+        self.lstInputs.setDragDropMode(QAbstractItemView.DragDropMode.InternalMove)
+        allPositions = [str(position) for position in range(self.inputCount)]
+        selected = self.positions
+        if selected is None:
+            selected = [position for position in allPositions if self.isActive(position)]
+        for position in selected + [position for position in allPositions if position not in selected]:
+            item = QListWidgetItem(self.describe(position))
+            item.setData(Qt.ItemDataRole.UserRole, position)
+            item.setFlags(item.flags() | Qt.ItemFlag.ItemIsUserCheckable)
+            item.setCheckState(Qt.CheckState.Checked if position in selected else Qt.CheckState.Unchecked)
+            self.lstInputs.addItem(item)
+        self.btnUp = QPushButton("Up")
+        self.btnDown = QPushButton("Down")
+        self.buttonBox = QDialogButtonBox(QDialogButtonBox.StandardButton.Ok | QDialogButtonBox.StandardButton.Cancel)
+
+    def initUI(self):
+        self.setWindowTitle("ISO Recording Inputs")
+        mainLayout = QVBoxLayout()
+        mainLayout.addWidget(QLabel("Checked inputs are recorded. Top of the list = highest priority,\n"
+                                    "the last ones are paused first when the program output is busy."))
+        listLayout = QHBoxLayout()
+        listLayout.addWidget(self.lstInputs)
+        buttonLayout = QVBoxLayout()
+        buttonLayout.addWidget(self.btnUp)
+        buttonLayout.addWidget(self.btnDown)
+        buttonLayout.addStretch()
+        listLayout.addLayout(buttonLayout)
+        mainLayout.addLayout(listLayout)
+        mainLayout.addWidget(self.buttonBox)
+        self.setLayout(mainLayout)
+
+    def initConnections(self):
+        self.btnUp.clicked.connect(lambda: self.moveCurrent(-1))
+        self.btnDown.clicked.connect(lambda: self.moveCurrent(1))
+        self.buttonBox.accepted.connect(self.accept)
+        self.buttonBox.rejected.connect(self.reject)
+
+    def isActive(self, position):
+        device = self.videoHub.getInputDevice(position)
+        return device is not None and device.getType() != "BlackGenerator"
+
+    def describe(self, position):
+        device = self.videoHub.getInputDevice(position)
+        if device is None:
+            return f"Input {position}"
+        return f"Input {position} - {device.getNickname()} ({device.getType()})"
+
+    def moveCurrent(self, step):
+        row = self.lstInputs.currentRow()
+        if row < 0 or not 0 <= row + step < self.lstInputs.count():
+            return
+        item = self.lstInputs.takeItem(row)
+        self.lstInputs.insertItem(row + step, item)
+        self.lstInputs.setCurrentRow(row + step)
+
+    def selectedPositions(self):
+        """
+        :return: le posizioni spuntate, in ordine di priorità
+        """
+        positions = []
+        for row in range(self.lstInputs.count()):
+            item = self.lstInputs.item(row)
+            if item.checkState() == Qt.CheckState.Checked:
+                positions.append(item.data(Qt.ItemDataRole.UserRole))
+        return positions
+
+
+if __name__ == "__main__":
+    import sys
+
+    from mainDir.videoHub.videoHubData018 import VideoHubData018
+
+    app = QApplication(sys.argv)
+    dialog = IsoSelectionDialog(VideoHubData018())
+    if dialog.exec():
+        print(dialog.selectedPositions())
@@ -11,6 +11,9 @@ from mainDir.MrKeyboard.styles.btnStyle import btnRedStyle
 class RecordingInfoWidget(QWidget):
     fileName: QLineEdit
     btnSelectFile: QPushButton
+    spnSegmentSeconds: QSpinBox
+    cmbSegmentFormat: QComboBox
+    spnMaxSegments: QSpinBox
     btnStartRecording: BlinkingButton
     txtStatus: QTextEdit
     isRecording: bool = False
@@ -28,6 +31,17 @@ class RecordingInfoWidget(QWidget):
         """Inizializza i widget dell'interfaccia utente."""
         self.fileName = QLineEdit("output.mp4")
         self.btnSelectFile = QPushButton("Save As...")
+        # registrazione a segmenti: 0 secondi = un unico file
+        self.spnSegmentSeconds = QSpinBox()
+        self.spnSegmentSeconds.setRange(0, 3600)
+        self.spnSegmentSeconds.setSuffix(" s")
+        self.spnSegmentSeconds.setSpecialValueText("Single file")
+        self.cmbSegmentFormat = QComboBox()
+        self.cmbSegmentFormat.addItem("MPEG-TS", "mpegts")
+        self.cmbSegmentFormat.addItem("Fragmented MP4", "mp4")
+        self.spnMaxSegments = QSpinBox()
+        self.spnMaxSegments.setRange(0, 100000)
+        self.spnMaxSegments.setSpecialValueText("Keep all")
         self.btnStartRecording = BlinkingButton("Start Recording")
         self.txtStatus = QTextEdit()
 
@@ -45,6 +59,15 @@ class RecordingInfoWidget(QWidget):
         file_layout.addWidget(self.btnSelectFile)
         mainLayout.addLayout(file_layout)
 
+        # Layout per la registrazione a segmenti
+        segment_layout = QHBoxLayout()
+        segment_layout.addWidget(QLabel("Segments:"))
+        segment_layout.addWidget(self.spnSegmentSeconds)
+        segment_layout.addWidget(self.cmbSegmentFormat)
+        segment_layout.addWidget(QLabel("Keep:"))
+        segment_layout.addWidget(self.spnMaxSegments)
+        mainLayout.addLayout(segment_layout)
+
         # Pulsante per l'avvio della registrazione
         mainLayout.addWidget(self.btnStartRecording)
 
@@ -133,12 +156,18 @@ class RecordingInfoWidget(QWidget):
     def serialize(self):
         """Serializza i dati dell'interfaccia in un dizionario."""
         return {
-            "fileName": self.fileName.text()
+            "fileName": self.fileName.text(),
+            "segmentSeconds": self.spnSegmentSeconds.value(),
+            "segmentFormat": self.cmbSegmentFormat.currentData(),
+            "maxSegments": self.spnMaxSegments.value()
         }
 
     def deserialize(self, data):
         """Carica i dati serializzati nell'interfaccia utente."""
         self.fileName.setText(data["fileName"])
+        self.spnSegmentSeconds.setValue(data.get("segmentSeconds", 0))
+        self.cmbSegmentFormat.setCurrentIndex(max(0, self.cmbSegmentFormat.findData(data.get("segmentFormat", "mpegts"))))
+        self.spnMaxSegments.setValue(data.get("maxSegments", 0))
 
 
 if __name__ == "__main__":
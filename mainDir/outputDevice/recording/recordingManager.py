@@ -1,6 +1,8 @@
 from PyQt6.QtCore import QObject, pyqtSignal
 
+from mainDir.outputDevice.worker.programFanOut import ProgramFanOut
 from mainDir.outputDevice.worker.recWorker014 import RecWorker014
+from mainDir.outputDevice.worker.teeOutputManager import TeeOutputManager
 
 
 class RecordingManager(QObject):
@@ -10,6 +12,13 @@ class RecordingManager(QObject):
     def __init__(self, openGLViewer, parent=None):
         super().__init__(parent)
         self.openGLViewer = openGLViewer
+        self.recordingWorker = None
+        # "separate": un FFmpeg per il recording; "tee": encoder condiviso con lo streaming
+        self.outputMode = "separate"
+        self.teeOutput = None
+
+    def setOutputMode(self, mode):
+        self.outputMode = mode
 
     def startRecording(self, request):
         """
@@ -17,9 +26,23 @@ class RecordingManager(QObject):
 
         :param request: Dizionario che contiene le informazioni di demuxer, codec e stream.
         """
+        if self.outputMode == "tee":
+            self.teeOutput = TeeOutputManager.forSource(self.openGLViewer)
+            self.teeOutput.tally_SIGNAL.connect(self.getTally)
+            self.teeOutput.attach("Rec", request.get('recInfo', {}).get('fileName') or "output.mp4", request)
+            return
         #ffmpeg_command = self.generateFFMpegCommand(request)
         # to do: passare ffmpeg_command a RecWorker014
-        self.recordingWorker = RecWorker014(get_frame_func=self.openGLViewer.getFrame)
+        # il program arriva dal ProgramFanOut già in yuv420p, convertito una volta sola anche per lo streaming
+        self.programTap = ProgramFanOut.forSource(self.openGLViewer).addSink("Rec")
+        recInfo = request.get('recInfo', {})
+        # segmentSeconds > 0: segmenti a rotazione chiusi in background, stop immediato
+        self.recordingWorker = RecWorker014(get_frame_func=self.programTap.getFrame,
+                                            output_file=recInfo.get('fileName') or "output.mp4",
+                                            pixel_format=self.programTap.pixelFormat,
+                                            segment_seconds=recInfo.get('segmentSeconds', 0),
+                                            segment_format=recInfo.get('segmentFormat', "mpegts"),
+                                            max_segments=recInfo.get('maxSegments', 0))
         self.recordingWorker.tally_SIGNAL.connect(self.getTally)
         self.recordingWorker.start()
 
@@ -27,10 +50,19 @@ class RecordingManager(QObject):
         """
         Ferma il processo di streaming.
         """
+        if self.teeOutput is not None:
+            self.teeOutput.tally_SIGNAL.disconnect(self.getTally)
+            self.teeOutput.detach("Rec")
+            self.teeOutput = None
+            self.emitTallySignal("stopRecording", "Recording stopped.")
+            return
         if self.recordingWorker:
             self.recordingWorker.stop()
             self.recordingWorker.wait()
             self.emitTallySignal("stopRecording", "Recording stopped.")
+        if getattr(self, 'programTap', None) is not None:
+            self.programTap.close()
+            self.programTap = None
 
     def getTally(self, tally_data):
         """
@@ -1,8 +1,11 @@
 import logging
 
 from PyQt6.QtCore import QObject, pyqtSignal
+from mainDir.outputDevice.commonWidgets.ffmpegStringGenerator import FFMpegStringGenerator, parseRenditions
 from mainDir.outputDevice.worker.baseWorker015 import BaseWorker015
 from mainDir.outputDevice.worker.baseWorker016 import BaseWorker016
+from mainDir.outputDevice.worker.programFanOut import ProgramFanOut
+from mainDir.outputDevice.worker.teeOutputManager import TeeOutputManager
 
 logging.basicConfig(level=logging.INFO)
 
@@ -14,19 +17,44 @@ class StreamerManager016(QObject):
     def __init__(self, openGLViewer, parent=None):
         super().__init__(parent)
         self.openGLViewer = openGLViewer
+        # "separate": un FFmpeg per lo streaming; "tee": encoder condiviso con il recording
+        self.outputMode = "separate"
+        self.teeOutput = None
+
+    def setOutputMode(self, mode):
+        self.outputMode = mode
 
     def startStreaming(self, request):
         """
         Avvia il processo di streaming con i parametri forniti nel dizionario 'request'.
+        Il program arriva dal ProgramFanOut già convertito in yuv420p, condiviso con il recording.
         """
-        ffmpeg_command = self.generateFFMpegCommand(request)
+        if self.outputMode == "tee":
+            stream_info = request.get('streamInfo', {})
+            self.teeOutput = TeeOutputManager.forSource(self.openGLViewer)
+            self.teeOutput.tally_SIGNAL.connect(self.getTally)
+            self.teeOutput.attach("Stream", f"{stream_info.get('url', '')}/{stream_info.get('key', '')}", request)
+            return
+        try:
+            renditions = parseRenditions(request.get('codec', {}).get('renditions', ""))
+        except ValueError as e:
+            self.emitTallySignal("error", str(e))
+            return
+        self.programTap = ProgramFanOut.forSource(self.openGLViewer).addSink("Stream")
+        resolution, fps = self.outputProfile(request, renditions)
+        if renditions:
+            # scala ABR: il program entra una volta sola e FFmpeg produce tutte le rendition
+            ffmpeg_command = self.generateLadderCommand(request, renditions, resolution, fps)
+        else:
+            ffmpeg_command = self.generateFFMpegCommand(dict(request, inputPixelFormat=self.programTap.pixelFormat))
         print(f"FFmpeg command: {ffmpeg_command}")
+        # il worker ridimensiona e decima già prima della pipe: FFmpeg riceve solo quello che codifica
         self.streamWorker = BaseWorker016(
-            self.openGLViewer,
+            self.programTap,
             ffmpeg_command,
             "Stream",
-            fps=request.get('codec', {}).get('fps', 60),  # Assicurati di passare il frame rate corretto
-            resolution=(1920, 1080)
+            fps=fps,
+            resolution=resolution
         )
         self.streamWorker.tally_SIGNAL.connect(self.getTally)
         self.streamWorker.start()
@@ -35,10 +63,51 @@ class StreamerManager016(QObject):
         """
         Ferma il processo di streaming.
         """
+        if self.teeOutput is not None:
+            self.teeOutput.tally_SIGNAL.disconnect(self.getTally)
+            self.teeOutput.detach("Stream")
+            self.teeOutput = None
+            return
         if hasattr(self, 'streamWorker') and self.streamWorker.isRunning():
             self.streamWorker.stop()
             self.streamWorker.wait()
             logging.info("Streaming worker stopped and thread joined.")
+        if getattr(self, 'programTap', None) is not None:
+            self.programTap.close()
+            self.programTap = None
+
+    @staticmethod
+    def outputProfile(request, renditions):
+        """
+        Risoluzione e frame rate che servono davvero all'uscita: quelli del program, oppure
+        la rendition più grande e il frame rate più alto della scala.
+
+        :return: ((larghezza, altezza), fps)
+        """
+        fps = request.get('codec', {}).get('fps', 60)
+        if not renditions:
+            return (1920, 1080), fps
+        largest = max(renditions, key=lambda rendition: rendition['height'])
+        if all(rendition['fps'] for rendition in renditions):
+            fps = min(fps, max(rendition['fps'] for rendition in renditions))
+        return (min(largest['width'], 1920), min(largest['height'], 1080)), fps
+
+    def generateLadderCommand(self, request, renditions, resolution=(1920, 1080), fps=None):
+        """
+        Comando FFmpeg per la scala ABR: split/scale da una sola pipe raw e un encoder per rendition.
+        La pipe porta frame già alla risoluzione e al frame rate di outputProfile.
+        """
+        codec = request.get('codec', {})
+        stream_info = request.get('streamInfo', {})
+        url, key = stream_info.get('url', ''), stream_info.get('key', '')
+        destination = f"{url}/{key}" if key else url
+        source = {
+            'pixelFormat': self.programTap.pixelFormat,
+            'videoSize': f"{resolution[0]}x{resolution[1]}",
+            'frameRate': fps or codec.get('fps', 60),
+            'codec': codec,
+        }
+        return FFMpegStringGenerator().generateLadderCommand(source, renditions, destination)
 
     def generateFFMpegCommandOld(self, request):
         """
@@ -206,9 +275,9 @@ class StreamerManager016(QObject):
             '-hwaccel_output_format', 'cuda',  # Imposta il formato di output per CUDA
             '-f', 'rawvideo',  # Formato in input
             '-vcodec', 'rawvideo',
-            '-pix_fmt', 'bgr24',  # Formato pixel BGR
+            '-pix_fmt', request.get('inputPixelFormat', 'bgr24'),  # bgr24 dal viewer, yuv420p dal fan-out
             '-s', '1920x1080',  # Risoluzione
-            '-r', '50',  # Framerate
+            '-r', str(fps),  # Framerate, lo stesso del clock del worker
             '-vsync', '2',  # Sincronizzazione frame
             '-i', '-',  # Input da stdin
             # Aggiungi l'audio fittizio
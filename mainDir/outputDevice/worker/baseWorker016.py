@@ -1,9 +1,18 @@
+import os
+
 import numpy as np
 from PyQt6.QtCore import QThread, pyqtSignal, pyqtSlot
 import subprocess
 import logging
 import queue
 import threading
+import time
+
+from mainDir.errorClass.asyncLogger import rtLogger, RateLimiter
+from mainDir.outputDevice.worker.encoderMetrics import EncoderMetrics, openProgressPipe, progressArguments
+from mainDir.outputDevice.worker.frameClock import FrameClock, FrameWriter
+from mainDir.outputDevice.worker.frameScaler import FrameScaler
+from mainDir.performance.stageTimer import stageTimer
 
 logging.basicConfig(
     level=logging.DEBUG,  # Imposta il livello di logging
@@ -14,6 +23,7 @@ logging.basicConfig(
 class BaseWorker016(QThread):
     # Segnale per emettere lo stato del tally
     tally_SIGNAL = pyqtSignal(dict)
+    latencyDetector = None  # LatencyDetector opzionale sull'ingresso dell'encoder
 
     def __init__(self, inputObject, ffmpegString, name, fps=60, resolution=(1920, 1080), parent=None):
         super().__init__(parent)
@@ -22,10 +32,27 @@ class BaseWorker016(QThread):
         self.name = name
         self.fps = fps
         self.resolution = resolution
+        # formato dei frame di inputObject: bgr24 dai viewer, yuv420p da un tap del ProgramFanOut
+        self.pixelFormat = getattr(inputObject, "pixelFormat", "bgr24")
         self.is_working = False
         self.ffmpeg_process = None
         self.frame_queue = queue.Queue(maxsize=60)  # Ridotto maxsize a 60
         self.quit_flag = False  # Flag per terminare il thread
+        # clock a frame rate costante: ogni slot riceve esattamente un frame
+        self.clock = FrameClock(fps)
+        self.frame_writer = None
+        # ridimensionamento prima della pipe, creato al primo frame più grande dell'uscita
+        self.scaler = None
+        self.ffmpeg_closed = False
+        self.write_failed = False
+        self.repeated_frames = 0
+        self.dropped_frames = 0
+        self.started_at = None
+        # lo stderr di FFmpeg arriva a ogni frame: al tally passano al massimo 5 righe al secondo
+        self.stderr_limiter = RateLimiter(burst=5, interval=1.0)
+        # telemetria dall'output -progress di FFmpeg, aggiornata circa una volta al secondo
+        self.encoder_metrics = EncoderMetrics(fps, self.frame_queue.maxsize)
+        self.progress_fd = None
 
     def __del__(self):
         self.stop()
@@ -40,47 +67,133 @@ class BaseWorker016(QThread):
         # Avvia un thread per leggere lo stderr di FFmpeg
         self.stderr_thread = threading.Thread(target=self.read_ffmpeg_stderr, daemon=True)
         self.stderr_thread.start()
+        self.progress_thread = threading.Thread(target=self.read_ffmpeg_progress, daemon=True)
+        self.progress_thread.start()
+        # le write sulla pipe possono bloccare: stanno in un thread a parte, così il clock resta puntuale
+        self.writer_thread = threading.Thread(target=self.write_frames_loop, daemon=True)
+        self.writer_thread.start()
 
+        last_source = last_frame = None
+        self.clock.start()
+        self.started_at = time.perf_counter()
         while self.is_working and not self.quit_flag:
-            frame = self.inputObject.getFrame()
-            if frame is not None:
+            # il clock gira al frame rate dell'uscita: con un program più veloce ogni slot
+            # prende un solo frame e gli altri non arrivano mai alla pipe
+            slots = self.clock.waitNext()
+            source = self.inputObject.getFrame()
+            if source is not None and source is last_source:
+                # stesso frame di program dello slot precedente: niente controlli né ridimensionamento
+                frame = last_frame
+            elif source is not None:
+                frame = self.check_frame(source)
+                if frame is not None:
+                    frame = self.scale_frame(frame)
+                    last_source = source
+            else:
+                frame = None
+                self.emit_tally_signal("warning", "Frame is None")
+                rtLogger.warning(f"{self.name}.frameNone", "Captured frame is None.")
+            if frame is None:
+                # CFR: lo slot va comunque riempito, con l'ultimo frame buono
+                if last_frame is None:
+                    continue
+                frame = last_frame
+            if frame is last_frame:
+                self.repeated_frames += 1
+            # slot persi per ritardo: si ripete lo stesso frame (solo il riferimento, nessuna copia)
+            self.repeated_frames += slots - 1
+            last_frame = frame
+            queued_at = time.perf_counter_ns()
+            for slot in range(slots):
                 try:
-                    if frame.dtype != np.uint8 or frame.shape[2] != 3:
-                        logging.warning("Frame non in formato BGR24. Convertendo...")
-                        self.emit_tally_signal("warning", "Frame not in BGR24 format. Converting...")
-                        frame = frame.astype(np.uint8)
-                        if frame.shape[2] != 3:
-                            logging.error("Frame non ha 3 canali (BGR). Scartando frame.")
-                            self.emit_tally_signal("error", "Frame does not have 3 channels (BGR). Dropping frame.")
-                            continue
-                    self.frame_queue.put_nowait(frame)
+                    # in coda insieme all'istante di ingresso, per misurare l'attesa
+                    self.frame_queue.put_nowait((queued_at, frame))
                 except queue.Full:
+                    self.dropped_frames += slots - slot
                     self.emit_tally_signal("warning", "Frame queue is full. Dropping frame.")
-                    logging.warning("Frame queue is full. Dropping frame.")
-            else:
-                self.emit_tally_signal("warning", "Frame is None")
-                logging.warning("Captured frame is None.")
+                    rtLogger.warning(f"{self.name}.queueFull", "Frame queue is full. Dropping frame.",
+                                     worker=self.name)
+                    break
 
-            # Tentativo di scrivere un buffer di frame
-            self.write_available_frames()
+        # il writer svuota la coda prima di chiudere FFmpeg
+        self.writer_thread.join()
+        self.finish()
+        self.stderr_thread.join()
+        self.progress_thread.join(1)
 
-            self.msleep(int(1000 / 70))  # Mantieni il frame rate
+    def check_frame(self, frame):
+        """
+        Controlla che il frame sia nel formato atteso da FFmpeg (self.pixelFormat).
 
-        # Scrivi eventuali frame rimanenti
-        self.write_remaining_frames()
+        :return: il frame, convertito a uint8 se serve, o None se va scartato
+        """
+        if self.pixelFormat == "yuv420p":
+            # I420 dal ProgramFanOut: un solo piano di altezza 3/2 con Y, U e V in fila
+            if frame.dtype == np.uint8 and frame.ndim == 2:
+                return frame
+            rtLogger.error(f"{self.name}.notI420", "Frame non in formato I420. Scartando frame.")
+            self.emit_tally_signal("error", "Frame is not I420 (yuv420p). Dropping frame.")
+            return None
+        if frame.dtype != np.uint8 or frame.ndim != 3 or frame.shape[2] != 3:
+            rtLogger.warning(f"{self.name}.notBgr24", "Frame non in formato BGR24. Convertendo...")
+            self.emit_tally_signal("warning", "Frame not in BGR24 format. Converting...")
+            if frame.ndim != 3 or frame.shape[2] != 3:
+                rtLogger.error(f"{self.name}.notThreeChannels", "Frame non ha 3 canali (BGR). Scartando frame.")
+                self.emit_tally_signal("error", "Frame does not have 3 channels (BGR). Dropping frame.")
+                return None
+            frame = frame.astype(np.uint8)
+        return frame
 
-        self.stop()
-        self.stderr_thread.join()
+    def scale_frame(self, frame):
+        """
+        Porta il frame alla risoluzione dell'uscita (self.resolution) prima della pipe.
+        """
+        if self.scaler is None:
+            height, width = frame.shape[:2]
+            if self.pixelFormat == "yuv420p":
+                height = height * 2 // 3
+            if (width, height) == tuple(self.resolution):
+                return frame
+            self.scaler = FrameScaler(self.resolution, self.pixelFormat)
+        return self.scaler.scale(frame)
+
+    def setLatencyDetector(self, detector):
+        """Aggancia un LatencyDetector ai frame che entrano in FFmpeg (None per sganciarlo)."""
+        self.latencyDetector = detector
+
+    def progress_command(self):
+        """
+        Comando di FFmpeg con il progress leggibile a macchina su un fd dedicato
+        (sulla stdout dove non si possono passare fd al processo).
+
+        :return: (comando, fd di scrittura da passare al processo o None)
+        """
+        command = list(self.ffmpegString)
+        if not os.path.basename(command[0]).lower().startswith("ffmpeg") or "-progress" in command:
+            return command, None
+        read_fd, write_fd = openProgressPipe()
+        self.progress_fd = read_fd
+        command[1:1] = progressArguments(write_fd)
+        return command, write_fd
 
     def start_ffmpeg(self):
         """Avvia il processo FFmpeg."""
         try:
-            self.ffmpeg_process = subprocess.Popen(
-                self.ffmpegString,
-                stdin=subprocess.PIPE,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE
-            )
+            command, write_fd = self.progress_command()
+            try:
+                self.ffmpeg_process = subprocess.Popen(
+                    command,
+                    stdin=subprocess.PIPE,
+                    stdout=subprocess.PIPE,
+                    stderr=subprocess.PIPE,
+                    bufsize=0,  # stdin senza buffer Python: le memoryview vanno dritte nella pipe
+                    pass_fds=(write_fd,) if write_fd is not None else ()
+                )
+            finally:
+                # il lato di scrittura resta solo al processo figlio: alla sua uscita il lettore vede EOF
+                if write_fd is not None:
+                    os.close(write_fd)
+            self.frame_writer = FrameWriter(self.ffmpeg_process.stdin)
             self.is_working = True
             self.emit_tally_signal("info", "Streaming started")
             logging.info("FFmpeg process started successfully.")
@@ -98,60 +211,127 @@ class BaseWorker016(QThread):
                     line = self.ffmpeg_process.stderr.readline()
                     if not line:
                         break
-                    logging.debug(f"FFmpeg STDERR: {line.decode().strip()}")
-                    self.emit_tally_signal("info", f"FFmpeg STDERR: {line.decode().strip()}")
+                    text = line.decode(errors="replace").strip()
+                    rtLogger.debug(f"{self.name}.ffmpegStderr", "FFmpeg STDERR", worker=self.name, line=text)
+                    allowed, suppressed = self.stderr_limiter.allow("stderr")
+                    if allowed:
+                        message = f"FFmpeg STDERR: {text}"
+                        if suppressed:
+                            message += f" ({suppressed} lines suppressed)"
+                        self.tally_SIGNAL.emit({'sender': f"{self.name}Worker", 'cmd': "info", 'message': message})
         except Exception as e:
             logging.error(f"Errore nella lettura dello stderr di FFmpeg: {e}")
 
-    def write_available_frames(self):
-        """Scrive un buffer di frame nella stdin di FFmpeg."""
+    def read_ffmpeg_progress(self):
+        """
+        Legge i blocchi -progress di FFmpeg e aggiorna encoder_metrics con la profondità della coda.
+        Avvisa una volta quando l'encoder non tiene il passo e una volta quando recupera.
+        """
+        try:
+            if self.progress_fd is not None:
+                stream = os.fdopen(self.progress_fd, "rb", buffering=0)
+            else:
+                stream = self.ffmpeg_process.stdout
+            with stream:
+                for line in iter(stream.readline, b""):
+                    behind = self.encoder_metrics.behind
+                    if not self.encoder_metrics.feedLine(line.decode(errors="replace"), self.frame_queue.qsize()):
+                        continue
+                    snapshot = self.encoder_metrics.getSnapshot()
+                    rtLogger.debug(f"{self.name}.encoderProgress", "FFmpeg progress", worker=self.name,
+                                   speed=snapshot['speed'], fps=snapshot['fps'], queue=snapshot['queueDepth'])
+                    if snapshot['behind'] and not behind:
+                        self.emit_tally_signal(
+                            "warning", f"Encoder not keeping up: speed {snapshot['speed']}x, "
+                                       f"queue {snapshot['queueDepth']}/{self.frame_queue.maxsize}")
+                    elif behind and not snapshot['behind']:
+                        self.emit_tally_signal("info", "Encoder back to real time")
+        except Exception as e:
+            logging.error(f"Errore nella lettura del progress di FFmpeg: {e}")
+
+    def write_frames_loop(self):
+        """Thread di scrittura: scrive nella stdin di FFmpeg i frame in coda finché il worker lavora."""
+        while self.is_working and not self.quit_flag:
+            self.write_available_frames(timeout=0.1)
+        self.write_remaining_frames()
+
+    def write_available_frames(self, timeout=None):
+        """Scrive nella stdin di FFmpeg fino a 5 frame in coda, aspettando il primo al massimo timeout secondi."""
         buffer = []
-        while len(buffer) < 5:
-            try:
-                frame = self.frame_queue.get_nowait()
+        try:
+            if timeout:
+                queued_at, frame = self.frame_queue.get(timeout=timeout)
+                stageTimer.record("queue", queued_at, time.perf_counter_ns(), args={'worker': self.name})
                 buffer.append(frame)
-            except queue.Empty:
-                break
+            while len(buffer) < 5:
+                buffer.append(self.dequeue_frame())
+        except queue.Empty:
+            pass
 
         if buffer:
             self.write_buffer(buffer)
 
+    def dequeue_frame(self):
+        """Estrae un frame dalla coda e registra quanto tempo ci è rimasto (stadio "queue")."""
+        queued_at, frame = self.frame_queue.get_nowait()
+        stageTimer.record("queue", queued_at, time.perf_counter_ns(), args={'worker': self.name})
+        return frame
+
     def write_buffer(self, buffer):
-        """Scrive un buffer di frame nella stdin di FFmpeg."""
-        if self.ffmpeg_process and self.ffmpeg_process.poll() is None:
+        """Scrive un buffer di frame nella stdin di FFmpeg, una memoryview per frame e nessuna copia."""
+        if self.latencyDetector is not None:
+            for frame in buffer:
+                if self.pixelFormat == "yuv420p":
+                    frame = frame[:frame.shape[0] * 2 // 3]  # il codice si legge sul piano Y
+                self.latencyDetector.tap(f"encoder{self.name}", frame)
+        if self.frame_writer is not None and not self.write_failed and self.ffmpeg_process.poll() is None:
             try:
-                # Assicurati che i frame siano contigui in memoria
-                raw_data = b''.join([frame.tobytes() for frame in buffer])
-                self.ffmpeg_process.stdin.write(raw_data)
-                self.ffmpeg_process.stdin.flush()
+                with stageTimer.span("encode", args={'worker': self.name, 'frames': len(buffer)}):
+                    self.frame_writer.write(buffer)
             except Exception as e:
                 self.emit_tally_signal("error", f"Error writing to FFmpeg: {e}")
                 logging.error(f"Error writing to FFmpeg: {e}")
+                self.write_failed = True
                 self.stop()
 
     def write_remaining_frames(self):
         """Scrive tutti i frame rimanenti nella coda."""
-        buffer = []
-        while not self.frame_queue.empty():
-            try:
-                frame = self.frame_queue.get_nowait()
-                buffer.append(frame)
-            except queue.Empty:
-                break
-
-            if len(buffer) >= 5:
-                self.write_buffer(buffer)
+        while not self.frame_queue.empty() and not self.write_failed:
+            self.write_available_frames()
 
-        if buffer:
-            self.write_buffer(buffer)
+    def getStats(self):
+        """
+        Contatori dell'uscita: slot del clock, frame ripetuti e persi, tempo bloccato sulla pipe.
+        """
+        elapsed = time.perf_counter() - self.started_at if self.started_at else None
+        stats = self.clock.getStats()
+        stats['repeated'] = self.repeated_frames
+        stats['dropped'] = self.dropped_frames + stats['skippedSlots']
+        if self.frame_writer is not None:
+            stats.update(self.frame_writer.getStats(elapsed))
+        if self.scaler is not None:
+            stats['scaler'] = self.scaler.getStats()
+        if self.encoder_metrics.updates:
+            stats['encoder'] = self.encoder_metrics.getSnapshot()
+        return stats
 
     def stop(self):
-        """Ferma il processo di streaming e chiude FFmpeg."""
-        if self.is_working:
-            self.is_working = False
-            self.quit_flag = True
-            if self.ffmpeg_process:
-                self.close_ffmpeg()
+        """
+        Ferma lo streaming. Se il thread gira è run() a chiudere FFmpeg, dopo che il writer
+        ha svuotato la coda: chiudere la stdin mentre l'altro thread ci scrive la romperebbe.
+        """
+        self.is_working = False
+        self.quit_flag = True
+        if not self.isRunning():
+            self.finish()
+
+    def finish(self):
+        """Chiude FFmpeg una sola volta."""
+        if self.ffmpeg_process and not self.ffmpeg_closed:
+            self.ffmpeg_closed = True
+            if self.scaler is not None:
+                self.scaler.close()
+            self.close_ffmpeg()
             self.emit_tally_signal("info", "Streaming stopped")
             logging.info("Streaming stopped.")
 
@@ -179,7 +359,9 @@ class BaseWorker016(QThread):
             'message': str(message),
         }
         self.tally_SIGNAL.emit(tally_status)
-        logging.info(f"Tally Signal Emitted: {tally_status}")
+        # chiave senza il testo: con messaggi d'errore sempre diversi il limitatore non deve crescere
+        rtLogger.info(f"{self.name}.{cmd}", "Tally Signal Emitted", sender=tally_status['sender'],
+                      cmd=cmd, text=tally_status['message'])
 
     def quit(self):
         """Override del metodo quit per impostare il flag di uscita."""
@@ -0,0 +1,195 @@
+import os
+import threading
+import time
+
+"""
+Telemetria dell'encoder dall'output -progress di FFmpeg.
+
+Con "-progress pipe:N -stats_period 1" FFmpeg scrive una volta al secondo un blocco
+di righe chiave=valore su un file descriptor dedicato, che finisce con progress=continue
+(o progress=end all'ultimo blocco):
+
+    frame=1200
+    fps=59.94
+    bitrate=4512.3kbits/s
+    total_size=33849344
+    out_time_us=20000000
+    dup_frames=0
+    drop_frames=0
+    speed=1.00x
+    progress=continue
+
+EncoderMetrics tiene l'ultimo blocco interpretato insieme alla profondità della coda
+del worker e segnala quando l'encoder non tiene il passo: speed sotto la soglia per
+alcuni blocchi di fila, oppure coda in crescita con un riempimento previsto entro
+pochi secondi. Così l'allarme arriva prima che la frame_queue trabocchi e si perdano frame.
+
+Sui sistemi POSIX il progress viaggia su una pipe passata al processo (pass_fds);
+dove non si può (Windows) si usa la stdout di FFmpeg, che le uscite non usano.
+"""
+
+
+def progressArguments(fd=None, period=1.0):
+    """
+    Opzioni globali di FFmpeg per il progress leggibile a macchina e niente statistiche sullo stderr.
+
+    :param fd: file descriptor di scrittura nel processo figlio, None per la stdout.
+    """
+    return ["-hide_banner", "-nostats", "-stats_period", f"{period:g}", "-progress", f"pipe:{fd or 1}"]
+
+
+def openProgressPipe():
+    """
+    :return: (fd di lettura, fd di scrittura) oppure (None, None) se il sistema non passa fd ai figli
+    """
+    if os.name != "posix":
+        return None, None
+    return os.pipe()
+
+
+def parseBitrate(value):
+    """
+    "4512.3kbits/s" -> 4512.3 (kbit/s); "N/A" -> None
+    """
+    value = value.strip()
+    if value.endswith("kbits/s"):
+        try:
+            return float(value[:-7])
+        except ValueError:
+            return None
+    return None
+
+
+def parseSpeed(value):
+    """
+    "1.01x" -> 1.01; "N/A" -> None
+    """
+    value = value.strip().rstrip("x")
+    try:
+        return float(value)
+    except ValueError:
+        return None
+
+
+class EncoderMetrics:
+    def __init__(self, targetFps=60, queueCapacity=60, minSpeed=0.97, slowBlocks=3, overflowHorizon=5.0):
+        """
+        :param targetFps: frame rate che l'encoder deve sostenere.
+        :param queueCapacity: dimensione della frame_queue del worker.
+        :param minSpeed: speed sotto cui un blocco conta come lento.
+        :param slowBlocks: blocchi lenti consecutivi prima dell'allarme.
+        :param overflowHorizon: secondi entro cui un riempimento previsto della coda fa scattare l'allarme.
+        """
+        self.targetFps = float(targetFps)
+        self.queueCapacity = queueCapacity
+        self.minSpeed = minSpeed
+        self.slowBlocks = slowBlocks
+        self.overflowHorizon = overflowHorizon
+        self._block = {}
+        self._snapshot = {}
+        self._lock = threading.Lock()
+        self._slowCount = 0
+        self._lastDepth = None
+        self._lastTime = None
+        self.updates = 0
+        self.behind = False
+        self.behindEvents = 0
+
+    def feedLine(self, line, queueDepth=0):
+        """
+        Aggiunge una riga dell'output -progress.
+
+        :return: True se la riga chiude un blocco e le metriche sono state aggiornate
+        """
+        key, _, value = line.strip().partition("=")
+        if not key:
+            return False
+        self._block[key] = value
+        if key != "progress":
+            return False
+        block, self._block = self._block, {}
+        self.update(block, queueDepth)
+        return True
+
+    def update(self, block, queueDepth=0, now=None):
+        """
+        Interpreta un blocco completo e aggiorna lo stato "encoder non al passo".
+        """
+        if block.get('progress') == "end":
+            # ultimo blocco alla chiusura: l'encoder ha finito, non ha recuperato
+            with self._lock:
+                self._snapshot = dict(self._snapshot, ended=True)
+            return self._snapshot
+        now = time.monotonic() if now is None else now
+        fps = _float(block.get('fps'))
+        speed = parseSpeed(block.get('speed', "N/A"))
+        if speed is None and fps is not None and self.targetFps:
+            speed = fps / self.targetFps
+        growth = 0.0
+        if self._lastTime is not None and now > self._lastTime:
+            growth = (queueDepth - self._lastDepth) / (now - self._lastTime)
+        self._lastDepth, self._lastTime = queueDepth, now
+        overflowIn = (self.queueCapacity - queueDepth) / growth if growth > 0 else None
+
+        self._slowCount = self._slowCount + 1 if speed is not None and speed < self.minSpeed else 0
+        behind = self._slowCount >= self.slowBlocks or (overflowIn is not None and overflowIn < self.overflowHorizon)
+        if self.behind and self._slowCount and queueDepth >= self.queueCapacity // 2:
+            # già in ritardo: si esce solo quando l'encoder torna veloce o la coda si svuota
+            behind = True
+        if behind and not self.behind:
+            self.behindEvents += 1
+        self.behind = behind
+        self.updates += 1
+        snapshot = {
+            'frame': _int(block.get('frame')),
+            'fps': fps,
+            'speed': speed,
+            'bitrateKbps': parseBitrate(block.get('bitrate', "N/A")),
+            'totalSize': _int(block.get('total_size')),
+            'outTimeS': round(_int(block.get('out_time_us')) / 1e6, 2) if _int(block.get('out_time_us')) else None,
+            'dupFrames': _int(block.get('dup_frames')),
+            'dropFrames': _int(block.get('drop_frames')),
+            'queueDepth': queueDepth,
+            'queueGrowthFps': round(growth, 2),
+            'overflowInS': round(overflowIn, 1) if overflowIn is not None else None,
+            'behind': behind,
+            'ended': False,
+        }
+        with self._lock:
+            self._snapshot = snapshot
+        return snapshot
+
+    def getSnapshot(self):
+        with self._lock:
+            snapshot = dict(self._snapshot)
+        snapshot['updates'] = self.updates
+        snapshot['behindEvents'] = self.behindEvents
+        return snapshot
+
+
+def _float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _int(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+if __name__ == "__main__":
+    metrics = EncoderMetrics(targetFps=60, queueCapacity=60)
+    depth = 0
+    for second in range(8):
+        speed = 1.0 if second < 3 else 0.8  # dal quarto secondo l'encoder rallenta
+        depth += 0 if second < 3 else 12
+        block = {'frame': str(second * 60), 'fps': f"{60 * speed:.2f}", 'bitrate': "4512.3kbits/s",
+                 'out_time_us': str(second * 1000000), 'dup_frames': "0", 'drop_frames': "0",
+                 'speed': f"{speed}x", 'progress': "continue"}
+        metrics.update(block, depth, now=float(second))
+        snapshot = metrics.getSnapshot()
+        print(second, snapshot['speed'], snapshot['queueDepth'], snapshot['overflowInS'], snapshot['behind'])
@@ -0,0 +1,199 @@
+import os
+import time
+
+import numpy as np
+
+"""
+Clock di uscita a frame rate costante e scrittura dei frame verso FFmpeg senza copie.
+
+FrameClock calcola ogni scadenza dall'istante di partenza (start + n / fps) invece di
+dormire un periodo fisso a ogni giro, quindi il ritmo non accumula deriva anche con
+fps frazionari (59.94). waitNext() dice quanti slot sono passati dall'ultima chiamata:
+1 se il worker è puntuale, di più se è in ritardo. Gli slot persi vanno riempiti
+ripetendo l'ultimo frame, così FFmpeg (che calcola i timestamp dal numero di frame)
+riceve sempre esattamente fps frame al secondo. Oltre maxCatchUp slot di ritardo il
+clock si riallinea e gli slot saltati vengono contati come persi.
+
+FrameWriter scrive i frame sul file descriptor della stdin di FFmpeg con os.writev
+e una memoryview per frame: nessun tobytes() e nessun b''.join, il kernel legge
+direttamente dai buffer numpy. Dove os.writev non c'è (Windows) scrive una memoryview
+alla volta. Il tempo passato dentro le write (la pipe piena perché l'encoder è indietro)
+viene misurato come tempo di blocco.
+"""
+
+# massimo numero di buffer per una writev (IOV_MAX è 1024 su Linux e macOS)
+MAX_IOV = 1024
+
+
+class FrameClock:
+    """
+    :param fps: frame rate di uscita, anche frazionario.
+    :param maxCatchUp: massimo numero di slot recuperati ripetendo frame; oltre si riallinea.
+    :param spin: secondi finali di attesa fatti senza dormire, per la precisione della scadenza.
+    """
+
+    def __init__(self, fps=60, maxCatchUp=None, spin=0.001):
+        self.fps = float(fps)
+        self.period = 1.0 / self.fps
+        self.maxCatchUp = maxCatchUp if maxCatchUp is not None else max(1, int(self.fps // 2))
+        self.spin = spin
+        self._start = None
+        self._index = 0
+        self.ticks = 0
+        self.lateSlots = 0
+        self.skippedSlots = 0
+        self.resyncs = 0
+
+    def start(self):
+        self._start = time.perf_counter()
+        self._index = 0
+
+    def deadline(self, index=None):
+        """
+        :return: istante (perf_counter) dello slot index, di default il prossimo.
+        """
+        return self._start + (self._index + 1 if index is None else index) * self.period
+
+    def waitNext(self):
+        """
+        Aspetta la scadenza del prossimo slot.
+
+        :return: numero di slot da riempire (almeno 1)
+        """
+        if self._start is None:
+            self.start()
+        target = self.deadline()
+        remaining = target - time.perf_counter()
+        if remaining > self.spin:
+            time.sleep(remaining - self.spin)
+        while time.perf_counter() < target:
+            time.sleep(0)
+        elapsed = int((time.perf_counter() - self._start) / self.period)
+        slots = max(1, elapsed - self._index)
+        if slots > self.maxCatchUp:
+            self.skippedSlots += slots - 1
+            self.resyncs += 1
+            self._index = elapsed
+            slots = 1
+        else:
+            self._index += slots
+            self.lateSlots += slots - 1
+        self.ticks += slots
+        return slots
+
+    def getStats(self):
+        return {'ticks': self.ticks, 'lateSlots': self.lateSlots, 'skippedSlots': self.skippedSlots,
+                'resyncs': self.resyncs}
+
+
+def frameView(frame):
+    """
+    :return: (memoryview a byte del frame, True se è stato necessario copiarlo)
+    """
+    if frame.flags['C_CONTIGUOUS']:
+        return memoryview(frame).cast('B'), False
+    return memoryview(np.ascontiguousarray(frame)).cast('B'), True
+
+
+class FrameWriter:
+    """
+    :param stream: la stdin di FFmpeg (aperta con bufsize=0, quindi senza buffer Python).
+    """
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.fd = stream.fileno()
+        self._writev = getattr(os, "writev", None)
+        self.frames = 0
+        self.bytes = 0
+        self.copies = 0
+        self.writes = 0
+        self.blockedNs = 0
+        self.maxBlockNs = 0
+
+    def write(self, frames):
+        """
+        Scrive i frame in ordine, gestendo le scritture parziali.
+
+        :return: ns passati bloccati nella scrittura
+        """
+        views = []
+        for frame in frames:
+            view, copied = frameView(frame)
+            self.copies += copied
+            views.append(view)
+        count, size = len(views), sum(view.nbytes for view in views)
+        start = time.perf_counter_ns()
+        if self._writev is not None:
+            self._writeVectored(views)
+        else:
+            for view in views:
+                self._writeAll(view)
+        blocked = time.perf_counter_ns() - start
+        self.frames += count
+        self.bytes += size
+        self.blockedNs += blocked
+        if blocked > self.maxBlockNs:
+            self.maxBlockNs = blocked
+        return blocked
+
+    def _writeVectored(self, views):
+        while views:
+            written = self._writev(self.fd, views[:MAX_IOV])
+            self.writes += 1
+            while views and written >= views[0].nbytes:
+                written -= views[0].nbytes
+                views.pop(0)
+            if written:
+                views[0] = views[0][written:]
+
+    def _writeAll(self, view):
+        while view.nbytes:
+            written = self.stream.write(view)
+            self.writes += 1
+            if written is None:  # pipe non bloccante piena
+                time.sleep(0)
+                continue
+            view = view[written:]
+
+    def getStats(self, elapsed=None):
+        """
+        :param elapsed: secondi di riferimento per la percentuale di tempo bloccato.
+        """
+        stats = {
+            'framesWritten': self.frames,
+            'mbWritten': round(self.bytes / (1024 * 1024), 1),
+            'writeCalls': self.writes,
+            'copies': self.copies,
+            'blockedMs': round(self.blockedNs / 1e6, 1),
+            'maxBlockMs': round(self.maxBlockNs / 1e6, 2),
+            'avgBlockMs': round(self.blockedNs / self.frames / 1e6, 3) if self.frames else 0.0,
+        }
+        if elapsed:
+            stats['blockedPercent'] = round(100 * self.blockedNs / 1e9 / elapsed, 1)
+        return stats
+
+
+if __name__ == "__main__":
+    import subprocess
+    import sys
+
+    width, height, fps = 1920, 1080, 60
+    frames = [np.full((height, width, 3), value, dtype=np.uint8) for value in (0, 128, 255)]
+    # un lettore lento al posto di FFmpeg: consuma la pipe e ne conta i byte
+    reader = subprocess.Popen([sys.executable, "-c",
+                               "import sys\nn = 0\nwhile True:\n    b = sys.stdin.buffer.read(1 << 20)\n"
+                               "    if not b: break\n    n += len(b)\nprint(n)"],
+                              stdin=subprocess.PIPE, stdout=subprocess.PIPE, bufsize=0)
+    writer = FrameWriter(reader.stdin)
+    clock = FrameClock(fps)
+    clock.start()
+    start = time.perf_counter()
+    for tick in range(2 * fps):
+        slots = clock.waitNext()
+        writer.write([frames[tick % 3]] * slots)
+    elapsed = time.perf_counter() - start
+    reader.stdin.close()
+    print(f"reader got {int(reader.stdout.read())} bytes in {elapsed:.3f} s")
+    print(clock.getStats())
+    print(writer.getStats(elapsed))
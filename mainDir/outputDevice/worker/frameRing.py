@@ -0,0 +1,69 @@
+import sys
+
+import numpy as np
+
+from mainDir.performance.memoryRegistry import memoryRegistry
+
+"""
+Ring di buffer preallocati per i frame che vanno verso le pipe di FFmpeg.
+
+Chi produce un frame (ProgramFanOut, FrameScaler) chiede un buffer libero con acquire()
+e ci scrive dentro. Un buffer è libero quando nessuno lo tiene più: le code dei worker
+conservano un riferimento al frame finché non è scritto nella pipe, quindi basta il
+conteggio dei riferimenti di CPython. Se sono tutti occupati il ring cresce fino a
+maxSize e oltre restituisce buffer temporanei, contati in getStats().
+"""
+
+
+class FrameRing:
+    def __init__(self, shape, dtype=np.uint8, size=4, maxSize=16, label="frameRing"):
+        """
+        :param shape: forma di ogni buffer.
+        :param size: buffer preallocati.
+        :param maxSize: numero massimo di buffer del ring.
+        :param label: nome della voce nel memoryRegistry (sottosistema framePools).
+        """
+        self.shape = tuple(shape)
+        self.dtype = dtype
+        self.maxSize = maxSize
+        self.label = label
+        self._buffers = [np.empty(self.shape, dtype=dtype) for _ in range(size)]
+        self._next = 0
+        self.transient = 0
+        self._account()
+
+    def _account(self):
+        memoryRegistry.account('framePools', self, sum(buffer.nbytes for buffer in self._buffers), self.label)
+
+    def acquire(self, exclude=None):
+        """
+        :param exclude: buffer da non restituire anche se libero (per esempio l'ultimo pubblicato).
+        :return: un buffer che nessun altro tiene
+        """
+        count = len(self._buffers)
+        for step in range(count):
+            index = (self._next + step) % count
+            buffer = self._buffers[index]
+            # riferimenti: la lista del ring, la variabile buffer e l'argomento di getrefcount
+            if buffer is not exclude and sys.getrefcount(buffer) <= 3:
+                self._next = (index + 1) % count
+                return buffer
+        buffer = np.empty(self.shape, dtype=self.dtype)
+        if count < self.maxSize:
+            self._buffers.append(buffer)
+            self._account()
+        else:
+            self.transient += 1
+        return buffer
+
+    def close(self):
+        self._buffers = []
+        memoryRegistry.release('framePools', self)
+
+    def __len__(self):
+        return len(self._buffers)
+
+    def getStats(self):
+        frameBytes = int(np.prod(self.shape)) * np.dtype(self.dtype).itemsize
+        return {'ringSize': len(self._buffers), 'transient': self.transient,
+                'frameMB': round(frameBytes / (1024 * 1024), 2)}
@@ -0,0 +1,122 @@
+import time
+
+import cv2
+import numpy as np
+
+from mainDir.outputDevice.worker.frameRing import FrameRing
+from mainDir.performance.stageTimer import stageTimer
+
+"""
+Ridimensionamento dei frame prima della pipe di FFmpeg.
+
+Se l'uscita è più piccola del program (per esempio 720p30 da un program 1080p60) non ha
+senso mandare a FFmpeg ogni frame a piena risoluzione per fargliene buttare via la
+maggior parte: il worker ridimensiona qui con INTER_AREA in un FrameRing preallocato
+e il suo FrameClock, che gira al frame rate dell'uscita, prende un frame di program
+per slot. Byte nella pipe e costo di parsing dell'input di FFmpeg scendono del
+rapporto tra le aree (2.25x da 1080p a 720p) per il rapporto tra i frame rate.
+
+Funziona con frame bgr24 (h, w, 3) e con frame I420 (h * 3 / 2, w) del ProgramFanOut:
+in I420 i piani Y, U e V vengono ridimensionati ognuno nella sua parte del buffer.
+"""
+
+
+class FrameScaler:
+    def __init__(self, outputSize, pixelFormat="bgr24", ringSize=4, maxRing=16):
+        """
+        :param outputSize: (larghezza, altezza) dell'uscita; in I420 devono essere pari.
+        :param pixelFormat: "bgr24" oppure "yuv420p".
+        """
+        width, height = outputSize
+        if pixelFormat == "yuv420p" and (width % 2 or height % 2):
+            raise ValueError(f"I420 output size must be even: {outputSize}")
+        self.outputSize = (width, height)
+        self.pixelFormat = pixelFormat
+        shape = (height * 3 // 2, width) if pixelFormat == "yuv420p" else (height, width, 3)
+        self._ring = FrameRing(shape, size=ringSize, maxSize=maxRing, label=f"scaler{width}x{height}")
+        self.frames = 0
+        self.passthrough = 0
+        self.scaleNs = 0
+        self.bytesIn = 0
+        self.bytesOut = 0
+
+    def sourceSize(self, frame):
+        """
+        :return: (larghezza, altezza) dell'immagine contenuta nel frame
+        """
+        if self.pixelFormat == "yuv420p":
+            return frame.shape[1], frame.shape[0] * 2 // 3
+        return frame.shape[1], frame.shape[0]
+
+    def scale(self, frame):
+        """
+        :return: il frame alla dimensione d'uscita (lo stesso frame se lo è già)
+        """
+        self.bytesIn += frame.nbytes
+        if self.sourceSize(frame) == self.outputSize:
+            self.passthrough += 1
+            self.bytesOut += frame.nbytes
+            return frame
+        start = time.perf_counter_ns()
+        with stageTimer.span("scale", args={'size': self.outputSize}):
+            out = self._ring.acquire()
+            if self.pixelFormat == "yuv420p":
+                self._scaleI420(frame, out)
+            else:
+                cv2.resize(frame, self.outputSize, dst=out, interpolation=cv2.INTER_AREA)
+        self.scaleNs += time.perf_counter_ns() - start
+        self.frames += 1
+        self.bytesOut += out.nbytes
+        return out
+
+    def _scaleI420(self, frame, out):
+        width, height = self.sourceSize(frame)
+        outWidth, outHeight = self.outputSize
+        src, dst = frame.reshape(-1), out.reshape(-1)
+        for offset, outOffset, w, h, ow, oh in self._planes(width, height, outWidth, outHeight):
+            plane = src[offset:offset + w * h].reshape(h, w)
+            target = dst[outOffset:outOffset + ow * oh].reshape(oh, ow)
+            cv2.resize(plane, (ow, oh), dst=target, interpolation=cv2.INTER_AREA)
+
+    @staticmethod
+    def _planes(width, height, outWidth, outHeight):
+        """
+        Offset e dimensioni dei piani Y, U, V in ingresso e in uscita.
+        """
+        ySize, outYSize = width * height, outWidth * outHeight
+        cSize, outCSize = ySize // 4, outYSize // 4
+        return (
+            (0, 0, width, height, outWidth, outHeight),
+            (ySize, outYSize, width // 2, height // 2, outWidth // 2, outHeight // 2),
+            (ySize + cSize, outYSize + outCSize, width // 2, height // 2, outWidth // 2, outHeight // 2),
+        )
+
+    def close(self):
+        self._ring.close()
+
+    def getStats(self):
+        stats = {
+            'outputSize': f"{self.outputSize[0]}x{self.outputSize[1]}",
+            'scaled': self.frames,
+            'passthrough': self.passthrough,
+            'avgScaleMs': round(self.scaleNs / self.frames / 1e6, 2) if self.frames else 0.0,
+            'byteReduction': round(self.bytesIn / self.bytesOut, 2) if self.bytesOut else 1.0,
+        }
+        stats.update(self._ring.getStats())
+        return stats
+
+
+if __name__ == "__main__":
+    # immagine liscia (gradienti): con il rumore casuale il sottocampionamento della crominanza
+    # prima o dopo il resize dà differenze grandi che non dicono nulla sulla correttezza
+    y, x = np.mgrid[0:1080, 0:1920].astype(np.float32)
+    bgr = np.dstack((x / 1920 * 255, y / 1080 * 255, (x + y) / 3000 * 255)).astype(np.uint8)
+    i420 = cv2.cvtColor(bgr, cv2.COLOR_BGR2YUV_I420)
+    for pixelFormat, frame in (("bgr24", bgr), ("yuv420p", i420)):
+        scaler = FrameScaler((1280, 720), pixelFormat)
+        for _ in range(60):
+            out = scaler.scale(frame)
+        print(pixelFormat, out.shape, scaler.getStats())
+    # il risultato I420 coincide con la conversione dell'immagine ridimensionata, a meno dell'arrotondamento
+    reference = cv2.cvtColor(cv2.resize(bgr, (1280, 720), interpolation=cv2.INTER_AREA), cv2.COLOR_BGR2YUV_I420)
+    print("max I420 difference:", int(np.abs(out.astype(np.int16) - reference).max()))
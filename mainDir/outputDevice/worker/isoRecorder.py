@@ -0,0 +1,595 @@
+import collections
+import os
+import re
+import subprocess
+import threading
+import time
+
+import cv2
+from PyQt6.QtCore import QObject, pyqtSignal
+
+from mainDir.errorClass.asyncLogger import rtLogger
+from mainDir.outputDevice.commonWidgets.ffmpegStringGenerator import FFMpegStringGenerator
+from mainDir.outputDevice.worker.frameClock import FrameClock, FrameWriter
+from mainDir.performance.memoryRegistry import memoryRegistry
+from mainDir.performance.stageTimer import stageTimer
+
+"""
+Registrazione ISO: ogni input selezionato del videoHubMatrix registrato in un file a sé.
+
+Un RecWorker014 per input vorrebbe dire nove FFmpeg e nove code da 1200 frame (7 GB
+ciascuna a 1080p). Qui invece:
+
+    - gli input vengono distribuiti su un pool di al massimo maxEncoders processi FFmpeg;
+      ogni processo riceve i suoi input su pipe separate (un -i pipe:N per input, FFmpeg
+      legge ogni input con un suo thread) e scrive un file per input;
+    - ogni processo ha un thread che campiona i suoi input al frame rate della regia,
+      prende solo i frame con un numero di sequenza nuovo (InputDevice.getSequencedFrame)
+      e li converte in I420, metà dei byte del BGR24 e già nel formato dell'encoder;
+    - ogni input ha una coda limitata in byte: se la sua pipe è indietro si scartano
+      i frame più vecchi, e c'è un tetto complessivo per tutte le code;
+    - i timestamp li mette FFmpeg all'arrivo (-use_wallclock_as_timestamps) e l'uscita
+      è a frame rate costante: i frame scartati come duplicati diventano ripetizioni
+      fatte dall'encoder, senza passare dalla pipe. Un input fermo viene comunque
+      ripetuto ogni keepAlive secondi, così il suo file continua a crescere.
+
+Il controllo di ammissione guarda le uscite del program (code e stato dell'encoder dei
+worker di recording e streaming), il ritardo dei campionatori ISO e la memoria delle
+code: alla prima pressione sospende l'input ISO di priorità più bassa (l'ultimo della
+lista), uno ogni pauseStep secondi, prima che il program cominci a perdere frame;
+dopo resumeAfter secondi senza pressione li riprende uno alla volta, dal più importante.
+
+    iso = IsoRecorder(videoHub, "iso", positions=["1", "2", "3"], maxEncoders=2,
+                      programWorkers=lambda: [recordingManager.recordingWorker])
+    iso.start()
+    ...
+    iso.stop()
+"""
+
+MB = 1024 * 1024
+
+
+class IsoStream:
+    """
+    Un input registrato: la sua coda di frame I420 limitata in byte e i suoi contatori.
+    """
+
+    def __init__(self, position, name, path, size, maxBytes):
+        """
+        :param size: (larghezza, altezza) dichiarata a FFmpeg; i frame diversi vengono ridimensionati.
+        :param maxBytes: byte massimi in coda; oltre si scartano i frame più vecchi.
+        """
+        self.position = position
+        self.name = name
+        self.path = path
+        self.size = size
+        self.frameBytes = size[0] * size[1] * 3 // 2
+        self.maxBytes = maxBytes
+        self.queue = collections.deque()
+        self.queuedBytes = 0
+        self.condition = threading.Condition()
+        self.writer = None
+        self.thread = None
+        self.closed = False
+        self.failed = False
+        self.paused = False
+        self.pausedAt = None
+        self.pausedSeconds = 0.0
+        self.lastKey = None  # (id del device, sequenza) dell'ultimo frame accodato
+        self.lastFrame = None  # ultimo frame convertito, ripetuto come keepalive
+        self.lastSentAt = 0.0
+        self.sampled = 0
+        self.duplicates = 0
+        self.dropped = 0
+        self.keepAlives = 0
+        self.resized = 0
+        self.pauses = 0
+        self.errors = 0
+        self.erroring = False  # l'ultimo campionamento è fallito: la tally è già stata mandata
+
+    def push(self, frame):
+        with self.condition:
+            if self.failed:
+                return
+            self.queue.append(frame)
+            self.queuedBytes += frame.nbytes
+            while len(self.queue) > 1 and self.queuedBytes > self.maxBytes:
+                self.queuedBytes -= self.queue.popleft().nbytes
+                self.dropped += 1
+            self.condition.notify()
+
+    def pop(self):
+        """
+        :return: il prossimo frame da scrivere; None quando la coda è chiusa e vuota
+        """
+        with self.condition:
+            while not self.queue and not self.closed:
+                self.condition.wait()
+            if not self.queue:
+                return None
+            frame = self.queue.popleft()
+            self.queuedBytes -= frame.nbytes
+            return frame
+
+    def close(self):
+        with self.condition:
+            self.closed = True
+            self.condition.notify()
+
+    def discard(self):
+        with self.condition:
+            self.failed = True
+            self.dropped += len(self.queue)
+            self.queue.clear()
+            self.queuedBytes = 0
+
+    def getStats(self):
+        paused = self.pausedSeconds + (time.perf_counter() - self.pausedAt if self.paused else 0.0)
+        stats = {
+            'name': self.name,
+            'path': self.path,
+            'paused': self.paused,
+            'failed': self.failed,
+            'sampled': self.sampled,
+            'duplicates': self.duplicates,
+            'dropped': self.dropped,
+            'keepAlives': self.keepAlives,
+            'resized': self.resized,
+            'pauses': self.pauses,
+            'errors': self.errors,
+            'pausedS': round(paused, 1),
+            'queuedMB': round(self.queuedBytes / MB, 1),
+        }
+        if self.writer is not None:
+            stats['blockedMs'] = round(self.writer.blockedNs / 1e6, 1)
+        return stats
+
+
+class IsoEncoder:
+    """
+    Un processo FFmpeg del pool con il suo gruppo di input: un thread campiona e
+    converte, un thread per input scrive nella sua pipe.
+    """
+
+    def __init__(self, recorder, index, streams):
+        self.recorder = recorder
+        self.index = index
+        self.streams = streams
+        self.clock = FrameClock(recorder.fps)
+        self.process = None
+        self.running = False
+        self._sampler = None
+        self._finisher = None
+
+    def start(self):
+        if os.name != "posix":
+            return self._startStdin()
+        readFds, writeFds = [], []
+        for _ in self.streams:
+            readFd, writeFd = os.pipe()
+            readFds.append(readFd)
+            writeFds.append(writeFd)
+        try:
+            self.process = subprocess.Popen(self.recorder.encoderCommand(self.streams, readFds),
+                                            stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL,
+                                            stderr=subprocess.PIPE, pass_fds=readFds)
+        except OSError as e:
+            for fd in writeFds:
+                os.close(fd)
+            self._failed(e)
+            return False
+        finally:
+            # i lati di lettura restano solo a FFmpeg: se esce, le write ricevono EPIPE
+            for fd in readFds:
+                os.close(fd)
+        self._startThreads([os.fdopen(writeFd, "wb", buffering=0) for writeFd in writeFds])
+        return True
+
+    def _startStdin(self):
+        """
+        Dove non si possono passare altri fd al processo (Windows) ogni processo ha un solo input, sulla stdin.
+        """
+        try:
+            self.process = subprocess.Popen(self.recorder.encoderCommand(self.streams, [0]), stdin=subprocess.PIPE,
+                                            stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, bufsize=0)
+        except OSError as e:
+            self._failed(e)
+            return False
+        self._startThreads([self.process.stdin])
+        return True
+
+    def _failed(self, error):
+        for stream in self.streams:
+            stream.failed = True
+        self.recorder.emitTallySignal("error", f"Cannot start ISO encoder {self.index}: {error}")
+
+    def _startThreads(self, pipes):
+        for stream, pipe in zip(self.streams, pipes):
+            stream.writer = FrameWriter(pipe)
+            stream.thread = threading.Thread(target=self._writeLoop, args=(stream,), name=f"isoWrite{stream.position}",
+                                             daemon=True)
+            stream.thread.start()
+        threading.Thread(target=self._readStderr, name=f"isoStderr{self.index}", daemon=True).start()
+        self.running = True
+        self._sampler = threading.Thread(target=self._sampleLoop, name=f"isoSample{self.index}", daemon=True)
+        self._sampler.start()
+
+    def _sampleLoop(self):
+        self.clock.start()
+        while self.running:
+            self.clock.waitNext()
+            now = time.perf_counter()
+            for stream in self.streams:
+                if stream.failed:
+                    continue
+                # un input che dà errore non deve fermare gli altri stream di questo processo
+                try:
+                    self.recorder.sample(stream, now)
+                    stream.erroring = False
+                except Exception as e:
+                    stream.errors += 1
+                    rtLogger.error(f"iso.sample{stream.position}", "ISO: cannot sample input",
+                                   input=stream.position, error=e)
+                    if not stream.erroring:
+                        stream.erroring = True
+                        self.recorder.emitTallySignal("error", f"ISO {stream.name}: cannot sample input ({e})")
+
+    def _writeLoop(self, stream):
+        while True:
+            frame = stream.pop()
+            if frame is None:
+                break
+            try:
+                stream.writer.write((frame,))
+            except OSError as e:
+                stream.discard()
+                self.recorder.emitTallySignal("error", f"ISO {stream.name}: encoder pipe closed ({e})")
+                break
+        try:
+            stream.writer.stream.close()
+        except OSError:
+            pass
+
+    def _readStderr(self):
+        for line in self.process.stderr:
+            rtLogger.warning(f"iso.ffmpeg{self.index}", line.decode(errors="replace").rstrip(), encoder=self.index)
+
+    def stop(self):
+        """
+        Ferma il campionamento e chiude il processo in background: i writer svuotano le
+        code, chiudono le pipe e FFmpeg finisce i file.
+        """
+        self.running = False
+        if self._sampler is not None:
+            self._sampler.join()
+        for stream in self.streams:
+            stream.close()
+        if self.process is not None:
+            self._finisher = threading.Thread(target=self._finish, name=f"isoFinish{self.index}")
+            self._finisher.start()
+
+    def _finish(self):
+        for stream in self.streams:
+            if stream.thread is not None:
+                stream.thread.join()
+        try:
+            self.process.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+            self.recorder.emitTallySignal("error", f"ISO encoder {self.index} killed while closing")
+
+    def join(self, timeout=None):
+        if self._finisher is not None:
+            self._finisher.join(timeout)
+
+
+class IsoRecorder(QObject):
+    tally_SIGNAL = pyqtSignal(dict)
+
+    def __init__(self, videoHub, directory, positions=None, maxEncoders=3, fps=60, queueMB=48, maxTotalMB=384,
+                 codec="libx264", preset="veryfast", bitrate=12000, container="mkv", keepAlive=1.0,
+                 programWorkers=None, checkInterval=0.25, pauseStep=0.5, resumeAfter=3.0, queueThreshold=0.5,
+                 ffmpeg="ffmpeg", parent=None):
+        """
+        :param videoHub: il VideoHubData018 da cui leggere gli input.
+        :param directory: cartella dei file ISO.
+        :param positions: posizioni del videoHubMatrix da registrare, in ordine di priorità
+                          (la prima è l'ultima a essere sospesa); None = gli input 0..8 non neri.
+        :param maxEncoders: processi FFmpeg massimi, qualunque sia il numero di input.
+        :param queueMB: byte massimi in coda per input (48 MB sono 16 frame I420 1080p).
+        :param maxTotalMB: tetto di tutte le code insieme.
+        :param keepAlive: secondi dopo cui un input fermo o sospeso viene ripetuto.
+        :param programWorkers: funzione che restituisce i worker del program da proteggere
+                               (BaseWorker016, RecWorker014: frame_queue ed eventualmente getStats).
+        :param queueThreshold: riempimento della coda di un worker del program che conta come pressione.
+        """
+        super().__init__(parent)
+        self.videoHub = videoHub
+        self.directory = directory
+        self.positions = [str(position) for position in positions] if positions is not None else None
+        self.maxEncoders = max(1, maxEncoders)
+        self.fps = fps
+        self.queueBytes = int(queueMB * MB)
+        self.maxTotalBytes = int(maxTotalMB * MB)
+        self.codec = codec
+        self.preset = preset
+        self.bitrate = bitrate
+        self.container = container
+        self.keepAlive = keepAlive
+        self.programWorkers = programWorkers or (lambda: ())
+        self.checkInterval = checkInterval
+        self.pauseStep = pauseStep
+        self.resumeAfter = resumeAfter
+        self.queueThreshold = queueThreshold
+        self.ffmpeg = ffmpeg
+        self.streams = []
+        self.encoders = []
+        self._stopEvent = threading.Event()
+        self._guard = None
+        self._programDropped = {}
+        self._lateSlots = 0
+        self.pressureEvents = 0
+        self.lastPressure = []
+        self.startedAt = None
+
+    def selectedPositions(self):
+        if self.positions is not None:
+            return self.positions
+        return [str(position) for position in range(9)
+                if self.videoHub.getInputDevice(position) is not None
+                and self.videoHub.getInputDevice(position).getType() != "BlackGenerator"]
+
+    def start(self):
+        if self.startedAt is not None:
+            return False
+        positions = self.selectedPositions()
+        if not positions:
+            self.emitTallySignal("warning", "ISO recording: no input selected")
+            return False
+        os.makedirs(self.directory, exist_ok=True)
+        stamp = time.strftime("%Y%m%d_%H%M%S")
+        for position in positions:
+            device = self.videoHub.getInputDevice(position)
+            name = device.getNickname() if device is not None else f"Input_{position}"
+            path = os.path.join(self.directory, f"{stamp}_{position}_{re.sub(r'[^A-Za-z0-9_-]', '_', name)}"
+                                                f".{self.container}")
+            self.streams.append(IsoStream(position, name, path, self.frameSize(device), self.queueBytes))
+        if os.name != "posix" and len(self.streams) > self.maxEncoders:
+            # un input per processo: oltre il pool gli input meno importanti non si registrano
+            for stream in self.streams[self.maxEncoders:]:
+                self.emitTallySignal("warning", f"ISO {stream.name} not recorded: encoder pool full")
+            del self.streams[self.maxEncoders:]
+        count = min(self.maxEncoders, len(self.streams))
+        # a ogni processo input di tutte le priorità: sospendere i meno importanti alleggerisce tutti
+        self.encoders = [IsoEncoder(self, index, self.streams[index::count]) for index in range(count)]
+        self.startedAt = time.perf_counter()
+        for encoder in self.encoders:
+            encoder.start()
+        self._stopEvent.clear()
+        self._guard = threading.Thread(target=self._guardLoop, name="isoAdmission", daemon=True)
+        self._guard.start()
+        self.emitTallySignal("info", f"ISO recording started: {len(self.streams)} inputs on {count} encoders "
+                                     f"in {self.directory}")
+        return True
+
+    def stop(self):
+        if self.startedAt is None:
+            return
+        self._stopEvent.set()
+        if self._guard is not None:
+            self._guard.join()
+            self._guard = None
+        for encoder in self.encoders:
+            encoder.stop()
+        memoryRegistry.release('iso', self)
+        self.startedAt = None
+        self.emitTallySignal("info", "ISO recording stopped")
+
+    def join(self, timeout=None):
+        """
+        Aspetta che tutti i file ISO siano chiusi (lo stop ritorna subito).
+        """
+        for encoder in self.encoders:
+            encoder.join(timeout)
+
+    def isRunning(self):
+        return self.startedAt is not None
+
+    @staticmethod
+    def frameSize(device):
+        """
+        Dimensione dichiarata a FFmpeg: la risoluzione dell'input object, arrotondata a valori pari per l'I420.
+        """
+        inputObject = device.getInputObject() if device is not None else None
+        resolution = getattr(inputObject, "resolution", None)
+        width, height = (resolution.width(), resolution.height()) if resolution is not None else (1920, 1080)
+        return width & ~1, height & ~1
+
+    def codecArguments(self):
+        codec = {'codec': self.codec, 'preset': self.preset, 'profile': "high" if self.codec == "libx264" else "main",
+                 'bitrate': self.bitrate}
+        return FFMpegStringGenerator().initVideoCodec({'codec': codec}) + [
+            "-b:v", f"{self.bitrate}k",
+            "-g", str(int(2 * self.fps)),
+        ]
+
+    def encoderCommand(self, streams, fds):
+        command = [self.ffmpeg, "-hide_banner", "-loglevel", "error", "-nostats", "-y"]
+        for stream, fd in zip(streams, fds):
+            width, height = stream.size
+            command += [
+                "-f", "rawvideo", "-pix_fmt", "yuv420p", "-s", f"{width}x{height}",
+                "-use_wallclock_as_timestamps", "1",
+                "-thread_queue_size", "8",  # la coda vera è quella limitata in byte dello stream
+                "-i", f"pipe:{fd}",
+            ]
+        codec = self.codecArguments()
+        for index, stream in enumerate(streams):
+            command += ["-map", f"{index}:v"] + codec + ["-fps_mode", "cfr", "-r", f"{self.fps:g}", stream.path]
+        return command
+
+    def sample(self, stream, now):
+        """
+        Campiona un input (dal thread del suo encoder): accoda il frame solo se ha un numero di sequenza nuovo.
+        """
+        device = self.videoHub.getInputDevice(stream.position)
+        sequence, frame = device.getSequencedFrame() if device is not None else (None, None)
+        if frame is None:
+            # input avviato ma senza ancora un frame catturato (0, None): come un input senza frame nuovi
+            sequence = None
+        # il device in una posizione può essere sostituito: la sequenza vale solo con il suo device
+        key = (id(device), sequence)
+        if stream.paused or sequence is None or key == stream.lastKey:
+            if not stream.paused and sequence is not None:
+                stream.duplicates += 1
+            if stream.lastFrame is not None and now - stream.lastSentAt >= self.keepAlive:
+                stream.push(stream.lastFrame)
+                stream.keepAlives += 1
+                stream.lastSentAt = now
+            return
+        stream.lastKey = key
+        if self.queuedBytes() + stream.frameBytes > self.maxTotalBytes:
+            stream.dropped += 1
+            return
+        width, height = stream.size
+        with stageTimer.span("isoConvert", args={'input': stream.position}):
+            if frame.shape[:2] != (height, width):
+                frame = cv2.resize(frame, (width, height))
+                stream.resized += 1
+            # la conversione è anche la copia: il generatore può riusare il suo buffer
+            converted = cv2.cvtColor(frame, cv2.COLOR_BGR2YUV_I420)
+        stream.lastFrame = converted
+        stream.lastSentAt = now
+        stream.sampled += 1
+        stream.push(converted)
+
+    def queuedBytes(self):
+        return sum(stream.queuedBytes for stream in self.streams)
+
+    # --- controllo di ammissione -----------------------------------------------------
+
+    def programPressure(self):
+        """
+        :return: motivi per cui il program è sotto pressione (lista vuota se va tutto bene)
+        """
+        reasons = []
+        for worker in self.programWorkers():
+            if worker is None:
+                continue
+            name = getattr(worker, "name", type(worker).__name__)
+            frameQueue = getattr(worker, "frame_queue", None)
+            if frameQueue is not None and frameQueue.maxsize \
+                    and frameQueue.qsize() >= frameQueue.maxsize * self.queueThreshold:
+                reasons.append(f"{name} queue {frameQueue.qsize()}/{frameQueue.maxsize}")
+            if not hasattr(worker, "getStats"):
+                continue
+            stats = worker.getStats()
+            if stats.get('encoder', {}).get('behind'):
+                reasons.append(f"{name} encoder behind")
+            dropped = stats.get('dropped', 0)
+            previous = self._programDropped.get(id(worker))
+            self._programDropped[id(worker)] = dropped
+            if previous is not None and dropped > previous:
+                reasons.append(f"{name} dropping frames")
+        lateSlots = sum(encoder.clock.lateSlots + encoder.clock.skippedSlots for encoder in self.encoders)
+        # un ritardo isolato (una pausa del GC) non conta: serve più del 10% di slot persi nell'intervallo
+        if lateSlots - self._lateSlots > self.checkInterval * self.fps * len(self.encoders) * 0.1:
+            reasons.append("ISO sampling late")
+        self._lateSlots = lateSlots
+        if self.queuedBytes() >= self.maxTotalBytes * 0.75:
+            reasons.append("ISO queues full")
+        return reasons
+
+    def _guardLoop(self):
+        calmSince = lastStep = time.perf_counter()
+        while not self._stopEvent.wait(self.checkInterval):
+            memoryRegistry.account('iso', self, self.queuedBytes(), "ISO queues")
+            reasons = self.programPressure()
+            now = time.perf_counter()
+            if reasons:
+                if not self.lastPressure:
+                    self.pressureEvents += 1
+                calmSince = now
+                if now - lastStep >= self.pauseStep and self.pauseNext(reasons):
+                    lastStep = now
+            elif now - calmSince >= self.resumeAfter and now - lastStep >= self.resumeAfter:
+                if self.resumeNext():
+                    lastStep = now
+            self.lastPressure = reasons
+
+    def pauseNext(self, reasons=()):
+        """
+        Sospende l'input attivo di priorità più bassa.
+        """
+        for stream in reversed(self.streams):
+            if not stream.paused and not stream.failed:
+                stream.paused = True
+                stream.pausedAt = time.perf_counter()
+                stream.pauses += 1
+                message = f"ISO {stream.name} paused: {', '.join(reasons)}"
+                rtLogger.warning("iso.pause", message, input=stream.position)
+                self.emitTallySignal("warning", message)
+                return True
+        return False
+
+    def resumeNext(self):
+        """
+        Riprende l'input sospeso di priorità più alta.
+        """
+        for stream in self.streams:
+            if stream.paused and not stream.failed:
+                stream.paused = False
+                stream.pausedSeconds += time.perf_counter() - stream.pausedAt
+                stream.lastKey = None
+                self.emitTallySignal("info", f"ISO {stream.name} resumed")
+                return True
+        return False
+
+    def getStats(self):
+        return {
+            'encoders': len(self.encoders),
+            'encodersAlive': sum(1 for encoder in self.encoders
+                                 if encoder.process is not None and encoder.process.poll() is None),
+            'queuedMB': round(self.queuedBytes() / MB, 1),
+            'paused': [stream.position for stream in self.streams if stream.paused],
+            'pressure': self.lastPressure,
+            'pressureEvents': self.pressureEvents,
+            'samplerLateSlots': self._lateSlots,
+            'streams': {stream.position: stream.getStats() for stream in self.streams},
+        }
+
+    def emitTallySignal(self, cmd, message):
+        tally_status = {
+            'sender': "isoRecorder",
+            'cmd': cmd,
+            'message': str(message),
+        }
+        self.tally_SIGNAL.emit(tally_status)
+
+
+if __name__ == "__main__":
+    import tempfile
+
+    from PyQt6.QtCore import QCoreApplication
+
+    from mainDir.inputDevice.generatorDevice.inputDevice_movingPatternGenerator import \
+        InputDevice_MovingPatternGenerator
+    from mainDir.videoHub.videoHubData018 import VideoHubData018
+
+    app = QCoreApplication([])
+    videoHub = VideoHubData018()
+    for position in range(1, 5):
+        # input a 30 fps campionati a 60: metà dei campioni sono duplicati e non passano dalla pipe
+        videoHub.addInputDevice(position, InputDevice_MovingPatternGenerator(str(position), fps=30))
+        videoHub.startInputDevice(position)
+    iso = IsoRecorder(videoHub, tempfile.mkdtemp(prefix="iso_"), positions=["1", "2", "3", "4", "0"], maxEncoders=2)
+    iso.tally_SIGNAL.connect(print)
+    iso.start()
+    time.sleep(3)
+    iso.pauseNext(["demo"])
+    time.sleep(1)
+    iso.stop()
+    iso.join(30)
+    for position, stats in iso.getStats()['streams'].items():
+        print(position, stats)
+    videoHub.stopAllDevices()
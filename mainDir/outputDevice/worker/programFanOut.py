@@ -0,0 +1,183 @@
+import threading
+import time
+
+import cv2
+import numpy as np
+from PyQt6.QtCore import QObject
+
+from mainDir.outputDevice.worker.frameRing import FrameRing
+from mainDir.performance.stageTimer import stageTimer
+
+"""
+Fan-out del program verso le uscite (recording, streaming, ...).
+
+Prima ogni uscita leggeva dal clean feed il frame BGR24 (6 MB a 1080p), lo mandava
+nella sua pipe e ogni FFmpeg lo convertiva per conto suo in yuv420p. Qui la
+conversione BGR24 -> I420 (yuv420p planare, metà dei byte) viene fatta una volta
+sola per frame di program, qualunque sia il numero di uscite attive:
+
+    fanOut = ProgramFanOut.forSource(cleanFeedViewer)
+    tap = fanOut.addSink("Stream")
+    worker = BaseWorker016(tap, command_con_pix_fmt_yuv420p, "Stream")
+
+Ogni tap ha l'interfaccia dei viewer (getFrame) e restituisce l'ultimo frame
+convertito. La conversione è pigra: il primo tap che chiede un frame di program
+nuovo (riconosciuto per identità, il viewer restituisce lo stesso array finché non
+arriva il frame successivo) lo converte, gli altri ricevono lo stesso buffer.
+
+I frame convertiti stanno in un FrameRing: un buffer viene riscritto solo quando
+nessuna coda dei worker lo tiene più.
+"""
+
+
+class FanOutTap:
+    """
+    Uscita del fan-out: sorgente per un worker, con la stessa interfaccia dei viewer.
+    """
+
+    def __init__(self, fanOut, name):
+        self.fanOut = fanOut
+        self.name = name
+        self.pixelFormat = fanOut.pixelFormat
+        self.frames = 0
+
+    def getFrame(self):
+        frame = self.fanOut.getConverted()
+        if frame is not None:
+            self.frames += 1
+        return frame
+
+    def getVideoSize(self):
+        return self.fanOut.videoSize
+
+    def close(self):
+        self.fanOut.removeSink(self)
+
+
+class ProgramFanOut(QObject):
+    _instances = {}
+    _instancesLock = threading.Lock()
+
+    def __init__(self, source, ringSize=4, maxRing=16, parent=None):
+        """
+        :param source: oggetto con getFrame() che restituisce il program in BGR24 (il clean feed viewer).
+        :param ringSize: buffer preallocati alla prima conversione.
+        :param maxRing: numero massimo di buffer del ring.
+        """
+        super().__init__(parent)
+        self.source = source
+        self.pixelFormat = "yuv420p"
+        self.videoSize = None
+        self.ringSize = ringSize
+        self.maxRing = maxRing
+        self._ring = None
+        self._lastSource = None
+        self._latest = None
+        self._lock = threading.Lock()
+        self._sinks = []
+        self.conversions = 0
+        self.reused = 0
+        self.conversionNs = 0
+
+    @classmethod
+    def forSource(cls, source):
+        """
+        Fan-out condiviso per una sorgente: recording e streaming sullo stesso viewer usano lo stesso.
+        """
+        with cls._instancesLock:
+            fanOut = cls._instances.get(id(source))
+            if fanOut is None or fanOut.source is not source:
+                fanOut = cls(source)
+                cls._instances[id(source)] = fanOut
+            return fanOut
+
+    def addSink(self, name):
+        tap = FanOutTap(self, name)
+        with self._lock:
+            self._sinks.append(tap)
+        return tap
+
+    def removeSink(self, tap):
+        with self._lock:
+            if tap in self._sinks:
+                self._sinks.remove(tap)
+            if not self._sinks:
+                # nessuna uscita attiva: il ring non serve più
+                if self._ring is not None:
+                    self._ring.close()
+                self._ring = None
+                self.videoSize = None
+                self._lastSource = None
+                self._latest = None
+
+    def getSinks(self):
+        return [tap.name for tap in self._sinks]
+
+    def getConverted(self):
+        """
+        :return: l'ultimo frame di program in I420, convertito al massimo una volta per frame
+        """
+        frame = self.source.getFrame()
+        if frame is None:
+            return None
+        with self._lock:
+            if frame is self._lastSource:
+                self.reused += 1
+                return self._latest
+            height, width = frame.shape[:2]
+            if self.videoSize != (width, height):
+                self._resize(width, height)
+            start = time.perf_counter_ns()
+            with stageTimer.span("conversion", args={'stage': "fanOut"}):
+                slot = self._ring.acquire(exclude=self._latest)
+                cv2.cvtColor(frame, cv2.COLOR_BGR2YUV_I420, dst=slot)
+            self.conversionNs += time.perf_counter_ns() - start
+            self.conversions += 1
+            self._lastSource = frame
+            self._latest = slot
+            return slot
+
+    def _resize(self, width, height):
+        if self._ring is not None:
+            self._ring.close()
+        self.videoSize = (width, height)
+        self._ring = FrameRing((height * 3 // 2, width), size=self.ringSize, maxSize=self.maxRing,
+                               label="programFanOut")
+        self._latest = None
+
+    def getStats(self):
+        stats = {
+            'sinks': self.getSinks(),
+            'conversions': self.conversions,
+            'reused': self.reused,
+            'avgConversionMs': round(self.conversionNs / self.conversions / 1e6, 2) if self.conversions else 0.0,
+        }
+        if self._ring is not None:
+            stats.update(self._ring.getStats())
+        return stats
+
+
+if __name__ == "__main__":
+    class Source:
+        def __init__(self):
+            self.frames = [np.random.randint(0, 255, (1080, 1920, 3), dtype=np.uint8) for _ in range(2)]
+            self.index = 0
+
+        def getFrame(self):
+            return self.frames[self.index % 2]
+
+    source = Source()
+    fanOut = ProgramFanOut.forSource(source)
+    rec, stream = fanOut.addSink("Rec"), fanOut.addSink("Stream")
+    held = []
+    for tick in range(120):
+        source.index = tick
+        held.append(rec.getFrame())  # il recorder tiene in coda gli ultimi frame
+        stream.getFrame()
+        if len(held) > 6:
+            held.pop(0)
+    print(fanOut.getStats())
+    reference = cv2.cvtColor(source.getFrame(), cv2.COLOR_BGR2YUV_I420)
+    print("last frame matches:", np.array_equal(stream.getFrame(), reference))
+    from mainDir.performance.memoryRegistry import memoryRegistry
+    print(memoryRegistry.formatBreakdown())
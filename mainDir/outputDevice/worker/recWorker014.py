@@ -1,21 +1,41 @@
+import os
 import queue
 import subprocess
 import threading
+import time
 
 from PyQt6.QtCore import *
 from PyQt6.QtGui import *
 from PyQt6.QtWidgets import *
 import numpy as np
 
+from mainDir.outputDevice.worker.segmentFinalizer import SegmentFinalizer
+from mainDir.performance.stageTimer import stageTimer
+
+# estensione e opzioni del muxer per ogni formato di segmento
+SEGMENT_FORMATS = {
+    'mpegts': ("ts", []),
+    # fMP4: ogni segmento è leggibile fino all'ultimo frammento scritto anche se FFmpeg muore
+    'mp4': ("mp4", ["-segment_format_options", "movflags=+frag_keyframe+empty_moov+default_base_moof"]),
+}
+
 
 class RecWorker014(QThread):
     tally_SIGNAL = pyqtSignal(dict)
 
     def __init__(self, get_frame_func, output_file="output.mp4",
                  codec="libx264", fps=60, resolution=(1920, 1080),
+                 pixel_format="bgr24", segment_seconds=0, segment_format="mpegts", max_segments=0,
                  parent=None):
+        """
+        :param pixel_format: formato dei frame di get_frame_func, "yuv420p" con un tap del ProgramFanOut.
+        :param segment_seconds: durata dei segmenti; 0 registra un unico file con faststart.
+        :param segment_format: "mpegts" oppure "mp4" (MP4 frammentato).
+        :param max_segments: segmenti da conservare nell'indice a rotazione (0 = tutti).
+        """
         super().__init__(parent)
         self.get_frame_func = get_frame_func
+        self.pixel_format = pixel_format
         self.output_file = output_file
         self.codec = codec
         self.fps = fps
@@ -23,12 +43,20 @@ class RecWorker014(QThread):
         self.is_recording = False
         self.ffmpeg_process = None
         self.frame_queue = queue.Queue(maxsize=1200)
+        self.segment_seconds = segment_seconds
+        self.segment_format = segment_format if segment_format in SEGMENT_FORMATS else "mpegts"
+        self.max_segments = max_segments
+        self.finalizer = None
+        self.writer_thread = None
 
     def __del__(self):
         self.stop()
         self.wait()
 
     def run(self):
+        if self.segment_seconds > 0:
+            self.finalizer = SegmentFinalizer(self.segmentDirectory(), self.max_segments,
+                                              tallyCallback=self.emitTallySignal)
 
         ffmpeg_command = [
             'ffmpeg',
@@ -37,7 +65,7 @@ class RecWorker014(QThread):
             '-hwaccel_output_format', 'cuda',  # Imposta il formato di output per CUDA
             '-f', 'rawvideo',  # Formato in input
             '-vcodec', 'rawvideo',
-            '-pix_fmt', 'bgr24',  # Formato pixel BGR
+            '-pix_fmt', self.pixel_format,  # Formato pixel in ingresso
             '-s', '1920x1080',  # Risoluzione
             '-r', '60',  # Framerate
             '-vsync', '2',  # Sincronizzazione frame
@@ -51,9 +79,7 @@ class RecWorker014(QThread):
             '-tier', 'high',
             '-gpu', '-1',
             '-b:v', '20M',  # Bitrate massimo a 20 Mbps
-            '-movflags', 'faststart',  # Moov atom inizio file
-            self.output_file
-        ]
+        ] + self.outputOptions()
 
         # Avvia FFmpeg
         self.ffmpeg_process = subprocess.Popen(ffmpeg_command, stdin=subprocess.PIPE)
@@ -61,7 +87,10 @@ class RecWorker014(QThread):
         self.emitTallySignal("info", "Recording started")
 
         # Thread separato per la registrazione dei frame
-        threading.Thread(target=self._write_frames, daemon=True).start()
+        self.writer_thread = threading.Thread(target=self._write_frames, daemon=True)
+        self.writer_thread.start()
+        if self.finalizer is not None:
+            self.finalizer.start()
 
         # Cattura i frame e mettili nella coda FIFO
         frame_count = 0
@@ -69,7 +98,7 @@ class RecWorker014(QThread):
             frame = self.get_frame_func()
             if frame is not None:
                 try:
-                    self.frame_queue.put_nowait(frame)
+                    self.frame_queue.put_nowait((time.perf_counter_ns(), frame))
                 except queue.Full:
                     self.emitTallySignal("warning", "Frame queue is full")
             else:
@@ -77,20 +106,68 @@ class RecWorker014(QThread):
             frame_count += 1
             self.msleep(int(1000 / self.fps))  # Sincronizzazione del frame rate
 
+        if self.finalizer is not None:
+            # lo stop ritorna subito: coda, ultimo segmento e indice si chiudono in background
+            threading.Thread(target=self._close_segmented, name="recClose").start()
+            self.emitTallySignal("info", "Recording stopped, finalising the last segment")
+            return
         self.ffmpeg_process.stdin.close()
         self.ffmpeg_process.wait()
         self.emitTallySignal("warning", "Recording stopped")
 
+    def segmentDirectory(self):
+        """
+        Cartella dei segmenti: "show.mp4" -> "show_20241019-203000", una per registrazione.
+        """
+        stem = os.path.splitext(self.output_file)[0]
+        return f"{stem}_{time.strftime('%Y%m%d-%H%M%S')}"
+
+    def outputOptions(self):
+        """
+        Uscita di FFmpeg: un file unico con faststart, oppure il muxer segment con keyframe
+        forzati al confine di ogni segmento e la lista dei segmenti chiusi per il SegmentFinalizer.
+        """
+        if self.finalizer is None:
+            return ['-movflags', 'faststart', self.output_file]  # Moov atom inizio file
+        extension, format_options = SEGMENT_FORMATS[self.segment_format]
+        return [
+            '-force_key_frames', f'expr:gte(t,n_forced*{self.segment_seconds})',
+            '-f', 'segment',
+            '-segment_time', str(self.segment_seconds),
+            '-segment_format', self.segment_format,
+            *format_options,
+            '-reset_timestamps', '1',
+            '-segment_list', self.finalizer.listFile,
+            '-segment_list_type', 'csv',
+            self.finalizer.segmentPattern(extension),
+        ]
+
+    def _close_segmented(self):
+        self.writer_thread.join()
+        try:
+            self.ffmpeg_process.stdin.close()
+        except OSError:
+            pass
+        self.finalizer.finish(self.ffmpeg_process)
+
+    def getStats(self):
+        stats = {'queued': self.frame_queue.qsize()}
+        if self.finalizer is not None:
+            stats['segments'] = self.finalizer.getStats()
+        return stats
+
     def _write_frames(self):
         buffer = []
         while self.is_recording or not self.frame_queue.empty():
             try:
-                frame = self.frame_queue.get(timeout=1)
+                queued_at, frame = self.frame_queue.get(timeout=1)
+                stageTimer.record("queue", queued_at, time.perf_counter_ns(), args={'worker': 'rec'})
                 buffer.append(frame)
 
                 # Scrive i frame in blocco
                 if len(buffer) >= 10:
-                    self.ffmpeg_process.stdin.write(b''.join([f.tobytes() for f in buffer]))
+                    with stageTimer.span("encode", args={'worker': 'rec', 'frames': len(buffer)}):
+                        self.ffmpeg_process.stdin.write(b''.join([f.tobytes() for f in buffer]))
                     buffer.clear()
             except queue.Empty:
                 self.emitTallySignal("info", "Frame queue is empty")
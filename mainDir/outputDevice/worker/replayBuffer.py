@@ -0,0 +1,222 @@
+import collections
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+from PyQt6.QtCore import QObject, pyqtSignal
+
+from mainDir.outputDevice.worker.frameClock import FrameClock
+from mainDir.performance.memoryRegistry import memoryRegistry
+from mainDir.performance.stageTimer import stageTimer
+
+"""
+Buffer di instant replay sul program.
+
+Tenere 60 secondi di program 1080p60 in chiaro sono 22 GB: qui ogni frame di program
+viene compresso in JPEG (cv2.imencode rilascia il GIL, quindi i thread del pool
+lavorano davvero in parallelo) e tenuto in un ring limitato sia in durata sia in byte.
+Il tap legge il clean feed al frame rate del program con un FrameClock, riconosce i
+frame nuovi per identità come il ProgramFanOut e non blocca mai: se il pool è indietro
+il frame viene saltato e contato.
+
+Ogni frame ha un numero di sequenza crescente senza buchi, così il player (ReplayPlayer,
+input del VideoHubData018) indirizza il ring per sequenza mentre i frame più vecchi
+escono dal fondo:
+
+    replay = ReplayBuffer.forSource(cleanFeedViewer)
+    replay.start()
+    first, last = replay.getRange()
+    frame = replay.decode(last - 120)     # due secondi fa a 60 fps
+"""
+
+
+class ReplayBuffer(QObject):
+    tally_SIGNAL = pyqtSignal(dict)
+    _instances = {}
+    _instancesLock = threading.Lock()
+    _active = None
+
+    def __init__(self, source, fps=60, seconds=60, maxMB=1024, quality=85, workers=None, parent=None):
+        """
+        :param source: oggetto con getFrame() che restituisce il program in BGR24 (il clean feed viewer).
+        :param seconds: durata massima del ring.
+        :param maxMB: memoria massima dei frame compressi; oltre si scartano i più vecchi.
+        :param quality: qualità JPEG (0-100).
+        :param workers: thread di compressione, di default metà dei core.
+        """
+        super().__init__(parent)
+        self.source = source
+        self.fps = fps
+        self.seconds = seconds
+        self.maxBytes = int(maxMB * 1024 * 1024)
+        self.quality = quality
+        self.workers = workers or max(1, (os.cpu_count() or 2) // 2)
+        # frame in compressione oltre i quali si salta: il pool non deve accumulare ritardo
+        self.maxPending = self.workers * 2
+        self._entries = collections.deque()  # [sequenza, istante, jpeg o None]
+        self._lock = threading.Lock()
+        self._pool = None
+        self._thread = None
+        self._running = False
+        self._nextSeq = 0
+        self._pending = 0
+        self.totalBytes = 0
+        self.encoded = 0
+        self.skipped = 0
+        self.evicted = 0
+        self.encodeNs = 0
+        self.rawBytes = 0
+        self.jpegBytes = 0
+
+    @classmethod
+    def forSource(cls, source, **kwargs):
+        with cls._instancesLock:
+            buffer = cls._instances.get(id(source))
+            if buffer is None or buffer.source is not source:
+                buffer = cls(source, **kwargs)
+                cls._instances[id(source)] = buffer
+            return buffer
+
+    @classmethod
+    def active(cls):
+        """
+        L'ultimo buffer avviato: la sorgente predefinita dei ReplayPlayer.
+        """
+        return cls._active
+
+    def start(self):
+        if self._running:
+            return
+        self._running = True
+        self._pool = ThreadPoolExecutor(self.workers, thread_name_prefix="replayEncode")
+        self._thread = threading.Thread(target=self._captureLoop, name="replayTap", daemon=True)
+        self._thread.start()
+        ReplayBuffer._active = self
+        self.emitTallySignal("info", f"Replay buffer started: {self.seconds} s, {self.maxBytes // (1024 * 1024)} MB")
+
+    def stop(self):
+        self._running = False
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        if self._pool is not None:
+            self._pool.shutdown(wait=True)
+            self._pool = None
+        if ReplayBuffer._active is self:
+            ReplayBuffer._active = None
+
+    def isRunning(self):
+        return self._running
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.totalBytes = 0
+        memoryRegistry.release('replay', self)
+
+    def _captureLoop(self):
+        clock = FrameClock(self.fps)
+        clock.start()
+        last = None
+        while self._running:
+            clock.waitNext()
+            frame = self.source.getFrame()
+            if frame is None or frame is last:
+                continue
+            last = frame
+            if self._pending >= self.maxPending:
+                self.skipped += 1
+                continue
+            with self._lock:
+                entry = [self._nextSeq, time.perf_counter(), None]
+                self._nextSeq += 1
+                self._entries.append(entry)
+                self._pending += 1
+            self._pool.submit(self._encode, entry, frame)
+
+    def _encode(self, entry, frame):
+        start = time.perf_counter_ns()
+        with stageTimer.span("replayEncode", args={'seq': entry[0]}):
+            ok, data = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, self.quality])
+        with self._lock:
+            self.encodeNs += time.perf_counter_ns() - start
+            self._pending -= 1
+            # uscito dal ring mentre era in compressione (durata massima raggiunta)
+            if not ok or not self._entries or entry[0] < self._entries[0][0]:
+                return
+            entry[2] = data
+            self.totalBytes += data.nbytes
+            self.rawBytes += frame.nbytes
+            self.jpegBytes += data.nbytes
+            self.encoded += 1
+            self._evict()
+            totalBytes = self.totalBytes
+        memoryRegistry.account('replay', self, totalBytes, "replay buffer")
+
+    def _evict(self):
+        """
+        Toglie dal fondo del ring i frame oltre la durata o il budget di memoria (sotto lock).
+        """
+        capacity = int(self.seconds * self.fps)
+        while self._entries and (len(self._entries) > capacity or self.totalBytes > self.maxBytes):
+            entry = self._entries.popleft()
+            if entry[2] is not None:
+                self.totalBytes -= entry[2].nbytes
+            self.evicted += 1
+
+    def getRange(self):
+        """
+        :return: (prima sequenza, ultima sequenza compressa) oppure (None, None) se il ring è vuoto
+        """
+        with self._lock:
+            if not self._entries:
+                return None, None
+            last = len(self._entries) - 1
+            while last >= 0 and self._entries[last][2] is None:
+                last -= 1
+            if last < 0:
+                return None, None
+            return self._entries[0][0], self._entries[last][0]
+
+    def getEncoded(self, seq):
+        """
+        :return: il JPEG del frame seq, None se è uscito dal ring o è ancora in compressione
+        """
+        with self._lock:
+            if not self._entries:
+                return None
+            index = seq - self._entries[0][0]
+            if index < 0 or index >= len(self._entries):
+                return None
+            return self._entries[index][2]
+
+    def decode(self, seq):
+        data = self.getEncoded(seq)
+        if data is None:
+            return None
+        with stageTimer.span("replayDecode", args={'seq': seq}):
+            return cv2.imdecode(data, cv2.IMREAD_COLOR)
+
+    def getStats(self):
+        first, last = self.getRange()
+        return {
+            'frames': len(self._entries),
+            'seconds': round((last - first + 1) / self.fps, 1) if first is not None else 0.0,
+            'mb': round(self.totalBytes / (1024 * 1024), 1),
+            'encoded': self.encoded,
+            'skipped': self.skipped,
+            'evicted': self.evicted,
+            'pending': self._pending,
+            'avgEncodeMs': round(self.encodeNs / self.encoded / 1e6, 2) if self.encoded else 0.0,
+            'compression': round(self.rawBytes / self.jpegBytes, 1) if self.jpegBytes else 0.0,
+        }
+
+    def emitTallySignal(self, cmd, message):
+        tally_status = {
+            'sender': "replayBuffer",
+            'cmd': cmd,
+            'message': str(message),
+        }
+        self.tally_SIGNAL.emit(tally_status)
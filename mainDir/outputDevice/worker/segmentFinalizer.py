@@ -0,0 +1,197 @@
+import collections
+import os
+import subprocess
+import threading
+import time
+
+"""
+Chiusura dei segmenti di una registrazione segmentata, fuori dal percorso di cattura.
+
+FFmpeg (muxer segment) scrive i segmenti in corso in <cartella>/.writing e, ogni volta
+che ne chiude uno, aggiunge una riga "nome,inizio,fine" alla lista segments.csv. Il
+SegmentFinalizer legge solo le righe nuove della lista, sposta il segmento completo
+nella cartella della registrazione (os.replace sullo stesso disco: una rename, nessuna
+copia) e lo aggiunge all'indice index.ffconcat, da cui si ottiene il file unico con
+
+    ffmpeg -f concat -i index.ffconcat -c copy show.mp4
+
+Con maxSegments > 0 l'indice è a rotazione: restano solo gli ultimi N segmenti e i più
+vecchi vengono cancellati. Memoria e I/O restano costanti per tutta la durata dello
+show: la lista si legge dall'ultimo offset e l'indice cresce solo in append.
+
+Allo stop il worker consegna qui il processo FFmpeg: attesa della chiusura e spostamento
+dell'ultimo segmento avvengono in questo thread, così lo stop della registrazione è immediato.
+"""
+
+WRITING_DIRECTORY = ".writing"
+SEGMENT_LIST = "segments.csv"
+INDEX_FILE = "index.ffconcat"
+
+
+class SegmentFinalizer:
+    def __init__(self, directory, maxSegments=0, pollInterval=0.5, tallyCallback=None):
+        """
+        :param directory: cartella della registrazione; i segmenti in corso stanno nella sua .writing.
+        :param maxSegments: segmenti da conservare (0 = tutti).
+        :param tallyCallback: funzione (cmd, message) per gli avvisi, per esempio emitTallySignal del worker.
+        """
+        self.directory = directory
+        self.writingDirectory = os.path.join(directory, WRITING_DIRECTORY)
+        self.listFile = os.path.join(self.writingDirectory, SEGMENT_LIST)
+        self.indexFile = os.path.join(directory, INDEX_FILE)
+        self.maxSegments = maxSegments
+        self.pollInterval = pollInterval
+        self.tallyCallback = tallyCallback
+        self._segments = collections.deque()
+        self._listOffset = 0
+        self._partial = b""
+        self._process = None
+        self._stopEvent = threading.Event()
+        self._thread = None
+        self.finalized = 0
+        self.removed = 0
+        self.bytesFinalized = 0
+        self.lastFinalizeMs = 0.0
+        self.maxFinalizeMs = 0.0
+        self.finishedAt = None
+        os.makedirs(self.writingDirectory, exist_ok=True)
+        with open(self.indexFile, "w") as f:
+            f.write("ffconcat version 1.0\n")
+
+    def segmentPattern(self, extension):
+        """
+        Percorso dei segmenti per l'opzione di output del muxer segment.
+        """
+        return os.path.join(self.writingDirectory, f"segment_%05d.{extension}")
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="segmentFinalizer")
+        self._thread.start()
+
+    def finish(self, process):
+        """
+        Chiude la registrazione in background: aspetta l'uscita di FFmpeg, finalizza
+        l'ultimo segmento e ritorna subito al chiamante.
+
+        :param process: il subprocess.Popen di FFmpeg, con la stdin già chiusa o da chiudere.
+        """
+        self._process = process
+        self._stopEvent.set()
+
+    def join(self, timeout=None):
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _run(self):
+        while not self._stopEvent.wait(self.pollInterval):
+            self.poll()
+        if self._process is not None:
+            try:
+                self._process.wait(timeout=30)
+            except subprocess.TimeoutExpired:
+                self._process.kill()
+                self._notify("error", "FFmpeg killed while closing the last segment")
+        self.poll()
+        self._finalizeLeftovers()
+        self.finishedAt = time.time()
+        self._notify("info", f"Recording finalised: {self.finalized} segments in {self.directory}")
+
+    def poll(self):
+        """
+        Finalizza i segmenti chiusi da FFmpeg dall'ultima chiamata.
+        """
+        try:
+            with open(self.listFile, "rb") as f:
+                f.seek(self._listOffset)
+                data = f.read()
+        except FileNotFoundError:
+            return
+        self._listOffset += len(data)
+        lines = (self._partial + data).split(b"\n")
+        # l'ultima riga può essere ancora a metà: si riprende alla prossima lettura
+        self._partial = lines.pop()
+        for line in lines:
+            fields = line.decode(errors="replace").strip().split(",")
+            if fields[0]:
+                self.finalize(fields[0], fields[1:])
+
+    def finalize(self, name, times=()):
+        start = time.perf_counter()
+        source = os.path.join(self.writingDirectory, os.path.basename(name))
+        target = os.path.join(self.directory, os.path.basename(name))
+        try:
+            os.replace(source, target)
+        except OSError as e:
+            self._notify("error", f"Cannot finalise segment {name}: {e}")
+            return
+        duration = None
+        if len(times) >= 2:
+            try:
+                duration = float(times[1]) - float(times[0])
+            except ValueError:
+                pass
+        self._segments.append((os.path.basename(target), duration))
+        self.bytesFinalized += os.path.getsize(target)
+        self.finalized += 1
+        if self.maxSegments and len(self._segments) > self.maxSegments:
+            self._prune()
+        else:
+            with open(self.indexFile, "a") as f:
+                f.write(self._indexEntry(os.path.basename(target), duration))
+        self.lastFinalizeMs = (time.perf_counter() - start) * 1000
+        self.maxFinalizeMs = max(self.maxFinalizeMs, self.lastFinalizeMs)
+
+    def _prune(self):
+        """
+        Rotazione: cancella i segmenti più vecchi e riscrive l'indice (al massimo maxSegments righe).
+        """
+        while len(self._segments) > self.maxSegments:
+            name, _ = self._segments.popleft()
+            try:
+                os.remove(os.path.join(self.directory, name))
+                self.removed += 1
+            except OSError:
+                pass
+        temporary = self.indexFile + ".tmp"
+        with open(temporary, "w") as f:
+            f.write("ffconcat version 1.0\n")
+            for name, duration in self._segments:
+                f.write(self._indexEntry(name, duration))
+        os.replace(temporary, self.indexFile)
+
+    @staticmethod
+    def _indexEntry(name, duration):
+        entry = f"file '{name}'\n"
+        if duration:
+            entry += f"duration {duration:.3f}\n"
+        return entry
+
+    def _finalizeLeftovers(self):
+        """
+        Segmenti rimasti in .writing senza riga nella lista (FFmpeg terminato male):
+        con fMP4 e MPEG-TS restano leggibili fino all'ultimo frammento scritto.
+        """
+        for name in sorted(os.listdir(self.writingDirectory)):
+            if name != SEGMENT_LIST:
+                self.finalize(name)
+        try:
+            os.remove(self.listFile)
+            os.rmdir(self.writingDirectory)
+        except OSError:
+            pass
+
+    def _notify(self, cmd, message):
+        if self.tallyCallback is not None:
+            self.tallyCallback(cmd, message)
+
+    def getStats(self):
+        return {
+            'directory': self.directory,
+            'segments': len(self._segments),
+            'finalized': self.finalized,
+            'removed': self.removed,
+            'mbFinalized': round(self.bytesFinalized / (1024 * 1024), 1),
+            'lastFinalizeMs': round(self.lastFinalizeMs, 2),
+            'maxFinalizeMs': round(self.maxFinalizeMs, 2),
+            'finished': self.finishedAt is not None,
+        }
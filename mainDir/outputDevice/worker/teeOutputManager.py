@@ -0,0 +1,183 @@
+import logging
+import os
+import threading
+
+from PyQt6.QtCore import QObject, pyqtSignal
+
+from mainDir.outputDevice.commonWidgets.ffmpegStringGenerator import FFMpegStringGenerator
+from mainDir.outputDevice.worker.baseWorker016 import BaseWorker016
+from mainDir.outputDevice.worker.programFanOut import ProgramFanOut
+
+"""
+Uscita condivisa: recording e streaming con un solo processo FFmpeg.
+
+Con recording e streaming attivi insieme lo stesso clean feed veniva codificato due
+volte. In modalità "tee" i manager non avviano un worker proprio ma registrano la loro
+destinazione qui: un solo BaseWorker016 codifica il program una volta e il muxer tee
+di FFmpeg lo consegna a tutte le destinazioni (file, RTMP, SRT, UDP).
+
+Il codec è quello della prima destinazione registrata. Il tee non accetta nuove uscite
+a processo avviato, quindi aggiungere o togliere una destinazione riavvia l'encoder
+con il nuovo elenco: le uscite di rete si ricollegano e ogni file che era in scrittura
+continua in un file nuovo (show.mp4 -> show_part2.mp4, ...), perché FFmpeg parte con -y
+e riaprire lo stesso percorso cancellerebbe la registrazione in corso. Il riavvio viene
+segnalato con un tally di warning. Una destinazione che fallisce invece viene chiusa da
+FFmpeg (onfail=ignore) e le altre continuano.
+"""
+
+
+class TeeOutputManager(QObject):
+    tally_SIGNAL = pyqtSignal(dict)
+    _instances = {}
+    _instancesLock = threading.Lock()
+
+    def __init__(self, source, name="Tee", parent=None):
+        """
+        :param source: il clean feed viewer (oggetto con getFrame()).
+        """
+        super().__init__(parent)
+        self.source = source
+        self.name = name
+        self.generator = FFMpegStringGenerator(self)
+        self.destinations = {}
+        self._paths = {}  # owner -> file attualmente in scrittura (per i riavvii)
+        self.request = None
+        self.worker = None
+        self.programTap = None
+        self.restarts = 0
+
+    @classmethod
+    def forSource(cls, source):
+        with cls._instancesLock:
+            manager = cls._instances.get(id(source))
+            if manager is None or manager.source is not source:
+                manager = cls(source)
+                cls._instances[id(source)] = manager
+            return manager
+
+    def attach(self, owner, destination, request):
+        """
+        Aggiunge (o sostituisce) la destinazione di owner e riavvia l'encoder condiviso.
+
+        :param owner: nome dell'uscita, per esempio "Rec" o "Stream".
+        :param destination: percorso del file o URL di rete.
+        :param request: richiesta del widget ('codec', ...); conta solo quella della prima uscita.
+        """
+        if not self.destinations:
+            self.request = request
+        if self.destinations.get(owner) != destination:
+            self._paths.pop(owner, None)
+        self.destinations[owner] = destination
+        self.restart(f"{owner} added")
+
+    def detach(self, owner):
+        if self.destinations.pop(owner, None) is None:
+            return
+        self._paths.pop(owner, None)
+        if self.destinations:
+            self.restart(f"{owner} removed")
+        else:
+            self.stopWorker()
+            self.request = None
+
+    @staticmethod
+    def isFile(destination):
+        return "://" not in destination
+
+    @staticmethod
+    def nextPart(destination):
+        """
+        Il primo file libero show_partN.mp4 dopo destination (mai uno già esistente: FFmpeg sovrascrive).
+        """
+        root, extension = os.path.splitext(destination)
+        base, _, number = root.rpartition("_part")
+        if base and number.isdigit():
+            root, part = base, int(number) + 1
+        else:
+            part = 2
+        while os.path.exists(f"{root}_part{part}{extension}"):
+            part += 1
+        return f"{root}_part{part}{extension}"
+
+    def outputDestinations(self):
+        """
+        Destinazioni del prossimo avvio: i file in scrittura nel processo da fermare passano a una nuova parte.
+        """
+        outputs = []
+        for owner, destination in self.destinations.items():
+            if self.isFile(destination):
+                current = self._paths.get(owner)
+                if current is None:
+                    path = destination if not os.path.exists(destination) else self.nextPart(destination)
+                else:
+                    path = self.nextPart(current)
+                self._paths[owner] = path
+                outputs.append(path)
+            else:
+                outputs.append(destination)
+        return outputs
+
+    def isActive(self, owner=None):
+        if owner is None:
+            return bool(self.destinations)
+        return owner in self.destinations
+
+    def generateCommand(self):
+        codec = self.request.get('codec', {})
+        fps = codec.get('fps', 60)
+        request = {
+            'pixelFormat': self.programTap.pixelFormat,
+            'videoSize': "1920x1080",
+            'frameRate': fps,
+            'codec': codec,
+        }
+        return self.generator.generateTeeCommand(request, self.outputDestinations())
+
+    def restart(self, reason=""):
+        running = self.worker is not None
+        if running:
+            self.restarts += 1
+        self.stopWorker()
+        self.programTap = ProgramFanOut.forSource(self.source).addSink(self.name)
+        command = self.generateCommand()
+        if running:
+            files = [path for owner, path in self._paths.items() if owner in self.destinations]
+            self.emitTallySignal("warning", f"Shared encoder restarted ({reason}): network outputs reconnect"
+                                            + (f", recording continues in {', '.join(files)}" if files else ""))
+        logging.info(f"Tee FFmpeg command: {command}")
+        self.worker = BaseWorker016(self.programTap, command, self.name,
+                                    fps=self.request.get('codec', {}).get('fps', 60), resolution=(1920, 1080))
+        self.worker.tally_SIGNAL.connect(self.tally_SIGNAL.emit)
+        self.worker.start()
+        self.emitTallySignal("info", f"Shared encoder started for {', '.join(self.destinations)}")
+
+    def stopWorker(self):
+        if self.worker is not None:
+            self.worker.stop()
+            self.worker.wait()
+            self.worker = None
+        if self.programTap is not None:
+            self.programTap.close()
+            self.programTap = None
+
+    def getStats(self):
+        stats = {'destinations': dict(self.destinations), 'files': dict(self._paths), 'restarts': self.restarts}
+        if self.worker is not None:
+            stats['worker'] = self.worker.getStats()
+        return stats
+
+    def emitTallySignal(self, cmd, message):
+        tally_status = {
+            'sender': f"{self.name}Manager",
+            'cmd': cmd,
+            'message': str(message),
+        }
+        self.tally_SIGNAL.emit(tally_status)
+
+
+if __name__ == "__main__":
+    generator = FFMpegStringGenerator()
+    command = generator.generateTeeCommand(
+        {'pixelFormat': "yuv420p", 'frameRate': 60, 'codec': {'codec': "libx264", 'bitrate': 6000}},
+        ["C:/rec/show.mp4", "rtmp://a.rtmp.youtube.com/live2/key", "srt://127.0.0.1:9000?mode=caller"])
+    print(" ".join(command))
@@ -7,6 +7,7 @@ from PyQt6.QtWidgets import *
 from PyQt6.QtOpenGLWidgets import QOpenGLWidget
 
 from mainDir.errorClass.loggerClass import ErrorClass
+from mainDir.errorClass.traceClass import tracer
 
 
 class OpenGLViewer(QOpenGLWidget):
@@ -17,13 +18,13 @@ class OpenGLViewer(QOpenGLWidget):
         self.image = QImage()
         self.resolution = resolution
 
-    @ErrorClass().log(log_level=logging.INFO)
+    @tracer.trace(log_level=logging.INFO)
     def setImage(self, image):
         # fra il resize e l'update, l'immagine viene ridimensionata
         self.image = image
         self.update()
 
-    @ErrorClass().log(log_level=logging.INFO)
+    @tracer.trace(log_level=logging.INFO)
     def paintGL(self):
         if not self.image is None:
             painter = QPainter(self)
@@ -7,6 +7,7 @@ from PyQt6.QtOpenGLWidgets import QOpenGLWidget
 import logging
 
 from mainDir.errorClass.loggerClass import ErrorClass
+from mainDir.errorClass.traceClass import tracer
 
 error_logger = ErrorClass()
 
@@ -21,7 +22,7 @@ class OpenGLViewer015(QOpenGLWidget):
         self.resolution = resolution
         logging.debug("OpenGLViewer015: Initialized.")
 
-    @ErrorClass().log(log_level=logging.INFO)
+    @tracer.trace(log_level=logging.INFO)
     def setFrame(self, _numpyArray):
         """
         Sends the NumPy frame for conversion to QImage on a thread from the pool.
@@ -40,7 +41,7 @@ class OpenGLViewer015(QOpenGLWidget):
         except Exception as e:
             logging.exception(f"OpenGLViewer015: Exception during QImage creation: {e}")
 
-    @ErrorClass().log(log_level=logging.INFO)
+    @tracer.trace(log_level=logging.INFO)
     def getFrame(self):
         return self._numpyFrame
 
@@ -56,7 +57,7 @@ class OpenGLViewer015(QOpenGLWidget):
     def getQImage(self):
         return self.image
 
-    @ErrorClass().log(log_level=logging.INFO)
+    @tracer.trace(log_level=logging.INFO)
     def paintGL(self):
         if not self.image.isNull():
             painter = QPainter(self)
@@ -6,6 +6,8 @@ from PyQt6.QtOpenGLWidgets import QOpenGLWidget
 
 from PyQt6.QtCore import QRunnable, QThreadPool, pyqtSignal, QObject
 
+from mainDir.performance.stageTimer import stageTimer
+
 
 class FrameConverter(QRunnable):
     """
@@ -23,19 +25,25 @@ class FrameConverter(QRunnable):
 
     def run(self):
         try:
-            # Assicurati che il frame sia contiguo in memoria
-            if not self.numpy_frame.flags['C_CONTIGUOUS']:
-                self.numpy_frame = np.ascontiguousarray(self.numpy_frame)
-
-            height, width, channel = self.numpy_frame.shape
-            bytes_per_line = 3 * width
-            qImage = QImage(self.numpy_frame.data, width, height, bytes_per_line, QImage.Format.Format_BGR888).copy()
-            self.signals.finished.emit(qImage)
+            with stageTimer.span("conversion"):
+                self.convert()
         except Exception as e:
             print(f"Error in FrameConverter: {e}")
 
+    def convert(self):
+        # Assicurati che il frame sia contiguo in memoria
+        if not self.numpy_frame.flags['C_CONTIGUOUS']:
+            self.numpy_frame = np.ascontiguousarray(self.numpy_frame)
+
+        height, width, channel = self.numpy_frame.shape
+        bytes_per_line = 3 * width
+        qImage = QImage(self.numpy_frame.data, width, height, bytes_per_line, QImage.Format.Format_BGR888).copy()
+        self.signals.finished.emit(qImage)
+
 
 class OpenGLViewerThread016(QOpenGLWidget):
+    latencyDetector = None  # LatencyDetector opzionale, legge il pattern al momento del paint
+    latencyStage = "viewer"
 
     def __init__(self, resolution: QSize = QSize(640, 360), isFullScreen=False, parent=None):
         super().__init__(parent)
@@ -72,9 +80,19 @@ class OpenGLViewerThread016(QOpenGLWidget):
     def getQImage(self):
         return self.image
 
+    def setLatencyDetector(self, detector, stage="viewer"):
+        """
+        Aggancia un LatencyDetector al paint del viewer (None per sganciarlo).
+        """
+        self.latencyDetector = detector
+        self.latencyStage = stage
+
     def paintGL(self):
+        if self.latencyDetector is not None:
+            self.latencyDetector.tapQImage(self.latencyStage, self.image)
         if not self.image.isNull():
-            painter = QPainter(self)
-            # Disegna l'immagine mantenendo le proporzioni
-            painter.drawImage(self.rect(), self.image)
-            painter.end()
+            with stageTimer.span("paint"):
+                painter = QPainter(self)
+                # Disegna l'immagine mantenendo le proporzioni
+                painter.drawImage(self.rect(), self.image)
+                painter.end()
@@ -0,0 +1,128 @@
+import argparse
+import shutil
+import subprocess
+import threading
+import time
+
+import cv2
+import numpy as np
+
+from mainDir.outputDevice.commonWidgets.ffmpegStringGenerator import FFMpegStringGenerator, parseRenditions, \
+    DEFAULT_RENDITIONS
+from mainDir.outputDevice.worker.frameClock import FrameWriter
+
+"""
+Benchmark della scala ABR su questa macchina.
+
+Per ogni rendition manda a FFmpeg lo stesso program raw usato in streaming (yuv420p
+1080p dalla pipe, come fa il ProgramFanOut) e misura quanti frame al secondo riesce a
+scalare e codificare verso un output nullo; poi ripete con la scala completa in un
+solo processo. Un realtime >= 1 significa che la rendition (o la scala) regge il
+frame rate del program.
+
+Esempio:
+    python -m mainDir.performance.ladderBenchmark --renditions "1080p:6000, 720p:3000, 480p:1200"
+    python -m mainDir.performance.ladderBenchmark --codec h264_nvenc --preset p4 --frames 600
+"""
+
+
+def syntheticFrames(width=1920, height=1080, count=8):
+    """
+    Frame I420 con un pattern in movimento: un frame statico verrebbe codificato quasi gratis.
+    """
+    frames = []
+    x = np.arange(width, dtype=np.uint16)
+    y = np.arange(height, dtype=np.uint16)[:, None]
+    for index in range(count):
+        shift = index * 37
+        bgr = np.empty((height, width, 3), dtype=np.uint8)
+        bgr[..., 0] = ((x + shift) ^ y) & 0xFF
+        bgr[..., 1] = (x * 2 + y + shift) & 0xFF
+        bgr[..., 2] = (y * 3 - x + shift) & 0xFF
+        frames.append(cv2.cvtColor(bgr, cv2.COLOR_BGR2YUV_I420))
+    return frames
+
+
+def runEncode(command, frames, numFrames):
+    """
+    Avvia FFmpeg, gli scrive numFrames frame dalla pipe e aspetta la fine.
+
+    :return: (secondi, ultime righe dello stderr in caso di errore)
+    """
+    process = subprocess.Popen(command, stdin=subprocess.PIPE, stdout=subprocess.DEVNULL,
+                               stderr=subprocess.PIPE, bufsize=0)
+    stderr = []
+    reader = threading.Thread(target=lambda: stderr.extend(process.stderr.read().decode(errors="replace")
+                                                            .splitlines()[-5:]), daemon=True)
+    reader.start()
+    writer = FrameWriter(process.stdin)
+    start = time.perf_counter()
+    try:
+        for index in range(0, numFrames, len(frames)):
+            writer.write(frames[:min(len(frames), numFrames - index)])
+        process.stdin.close()
+    except (BrokenPipeError, OSError):
+        pass
+    process.wait()
+    elapsed = time.perf_counter() - start
+    reader.join(1)
+    return elapsed, (stderr if process.returncode else [])
+
+
+def benchmarkLadder(renditions, codec, fps=60, numFrames=300):
+    """
+    :return: {'renditions': {nome: {'fps', 'realtime', 'seconds'}}, 'ladder': {...}}
+    """
+    generator = FFMpegStringGenerator()
+    frames = syntheticFrames()
+    source = {'pixelFormat': "yuv420p", 'videoSize': "1920x1080", 'frameRate': fps, 'codec': codec}
+    report = {'codec': codec.get('codec', 'libx264'), 'frames': numFrames, 'targetFps': fps, 'renditions': {}}
+    runs = [(rendition['name'], [rendition]) for rendition in renditions]
+    runs.append(("ladder", renditions))
+    for name, ladder in runs:
+        command = generator.generateLadderCommand(source, ladder, "null")
+        command[1:1] = ["-loglevel", "error", "-nostats"]
+        seconds, errors = runEncode(command, frames, numFrames)
+        result = {
+            'seconds': round(seconds, 2),
+            'fps': round(numFrames / seconds, 1) if seconds else 0.0,
+            'realtime': round(numFrames / seconds / fps, 2) if seconds else 0.0,
+        }
+        if errors:
+            result['errors'] = errors
+        if name == "ladder":
+            report['ladder'] = result
+        else:
+            report['renditions'][name] = result
+    return report
+
+
+def printReport(report):
+    print(f"--- ABR ladder benchmark: {report['codec']}, {report['frames']} frames, target {report['targetFps']} fps ---")
+    for name, result in list(report['renditions'].items()) + [("ladder", report['ladder'])]:
+        print(f"    {name:>8}: {result['fps']:7.1f} fps  realtime x{result['realtime']:.2f}  ({result['seconds']} s)")
+        for line in result.get('errors', []):
+            print(f"              {line}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="openPyVision ABR ladder encode benchmark")
+    parser.add_argument("--renditions", type=str, default=DEFAULT_RENDITIONS)
+    parser.add_argument("--codec", type=str, default="libx264")
+    parser.add_argument("--preset", type=str, default="veryfast")
+    parser.add_argument("--profile", type=str, default="main")
+    parser.add_argument("--fps", type=float, default=60)
+    parser.add_argument("--frames", type=int, default=300)
+    args = parser.parse_args(argv)
+
+    if shutil.which("ffmpeg") is None:
+        print("ffmpeg not found in PATH")
+        return None
+    codec = {'codec': args.codec, 'preset': args.preset, 'profile': args.profile, 'keyframeInterval': 2}
+    report = benchmarkLadder(parseRenditions(args.renditions), codec, args.fps, args.frames)
+    printReport(report)
+    return report
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,173 @@
+import threading
+
+import numpy as np
+from PyQt6.QtCore import QObject, pyqtSignal
+from PyQt6.QtGui import QImage
+
+from mainDir.inputDevice.generatorDevice.inputObject.generator_LatencyPattern import decodeLatencyCode, clockMicros
+
+"""
+Detector del pattern di latenza (vedi generator_LatencyPattern.py).
+
+Il detector viene "agganciato" in più punti della catena video, ognuno con il nome
+dello stadio: l'uscita del MixBus (program), il paint dei viewer e l'ingresso
+dell'encoder (BaseWorker016.write_buffer). Per ogni stadio decodifica counter e
+timestamp e registra:
+    - la latenza in ms rispetto al captureFrame del generatore;
+    - il ritardo in frame rispetto all'ultimo frame prodotto dal generatore.
+Ogni frame viene contato una sola volta per stadio (la prima volta che arriva),
+quindi un viewer che ridisegna la stessa immagine non sporca l'istogramma.
+"""
+
+
+class LatencyDetector(QObject):
+    """
+    :param generator: il LatencyPatternGenerator usato come sorgente, serve per il ritardo in frame.
+    :param binMs: larghezza di un bin dell'istogramma in millisecondi.
+    :param maxMs: latenza massima rappresentata, oltre finisce nell'ultimo bin.
+    """
+    histogram_SIGNAL = pyqtSignal(dict)
+
+    def __init__(self, generator=None, binMs=1.0, maxMs=500.0, parent=None):
+        super().__init__(parent)
+        self.generator = generator
+        self.binMs = binMs
+        self.numBins = int(maxMs / binMs) + 1
+        self.maxFrames = 64
+        self._lock = threading.Lock()
+        self._stages = {}
+
+    def _stage(self, stage):
+        data = self._stages.get(stage)
+        if data is None:
+            data = {
+                'latency': np.zeros(self.numBins, dtype=np.int64),
+                'frames': np.zeros(self.maxFrames + 1, dtype=np.int64),
+                'lastCounter': None,
+                'decodeErrors': 0,
+            }
+            self._stages[stage] = data
+        return data
+
+    def tap(self, stage, frame):
+        """
+        Decodifica il pattern da un frame numpy e registra la latenza per lo stadio.
+
+        :return: la latenza in ms, o None se il frame non contiene un codice valido.
+        """
+        if frame is None:
+            return None
+        now = clockMicros()
+        code = decodeLatencyCode(frame)
+        with self._lock:
+            data = self._stage(stage)
+            if code is None:
+                data['decodeErrors'] += 1
+                return None
+            counter, timestamp = code
+            if counter == data['lastCounter']:
+                return None
+            data['lastCounter'] = counter
+            latency_ms = ((now - timestamp) & 0xFFFFFFFF) / 1000
+            data['latency'][min(self.numBins - 1, int(latency_ms / self.binMs))] += 1
+            if self.generator is not None:
+                delay = (self.generator.getCounter() - counter) & 0xFFFFFFFF
+                data['frames'][min(self.maxFrames, delay)] += 1
+        return latency_ms
+
+    def tapQImage(self, stage, qImage):
+        """
+        Come tap, ma per le QImage che arrivano ai viewer. Nessuna copia: la
+        QImage viene letta attraverso un array numpy che punta ai suoi byte.
+        """
+        if qImage is None or qImage.isNull():
+            return None
+        return self.tap(stage, self.qImageToArray(qImage))
+
+    @staticmethod
+    def qImageToArray(qImage: QImage):
+        width, height = qImage.width(), qImage.height()
+        channels = max(1, qImage.depth() // 8)
+        ptr = qImage.constBits()
+        ptr.setsize(qImage.sizeInBytes())
+        rows = np.frombuffer(ptr, np.uint8).reshape(height, qImage.bytesPerLine())
+        return rows[:, :width * channels].reshape(height, width, channels)
+
+    @staticmethod
+    def _percentile(histogram, binWidth, q):
+        total = histogram.sum()
+        if total == 0:
+            return 0.0
+        index = int(np.searchsorted(np.cumsum(histogram), q / 100 * total))
+        return round(index * binWidth, 2)
+
+    def getHistograms(self):
+        """
+        Restituisce, per ogni stadio, gli istogrammi e i percentili principali.
+        """
+        result = {}
+        with self._lock:
+            for stage, data in self._stages.items():
+                latency = data['latency'].copy()
+                frames = data['frames'].copy()
+                result[stage] = {
+                    'count': int(latency.sum()),
+                    'decodeErrors': data['decodeErrors'],
+                    'binMs': self.binMs,
+                    'latencyHistogram': latency.tolist(),
+                    'frameDelayHistogram': frames.tolist(),
+                    'p50Ms': self._percentile(latency, self.binMs, 50),
+                    'p90Ms': self._percentile(latency, self.binMs, 90),
+                    'p99Ms': self._percentile(latency, self.binMs, 99),
+                    'p50Frames': self._percentile(frames, 1, 50),
+                    'p99Frames': self._percentile(frames, 1, 99),
+                }
+        return result
+
+    def publish(self):
+        """
+        Emette gli istogrammi correnti su histogram_SIGNAL.
+        """
+        histograms = self.getHistograms()
+        self.histogram_SIGNAL.emit(histograms)
+        return histograms
+
+    def reset(self):
+        with self._lock:
+            self._stages.clear()
+
+
+if __name__ == "__main__":
+    import sys
+    from PyQt6.QtCore import QCoreApplication, QTimer
+
+    from mainDir.inputDevice.generatorDevice.inputDevice_latencyGenerator import InputDevice_LatencyGenerator
+    from mainDir.mixBus.mixBus018 import MixBus018
+    from mainDir.videoHub.videoHubData018 import VideoHubData018
+
+    app = QCoreApplication(sys.argv)
+    videoHub = VideoHubData018()
+    device = InputDevice_LatencyGenerator("Latency")
+    videoHub.addInputDevice(1, device)
+    videoHub.startInputDevice(1)
+    detector = LatencyDetector(device.getGenerator())
+    mixBus = MixBus018(videoHub)
+    mixBus.setLatencyDetector(detector)
+    mixBus.parseTallySignal({'cmd': 'programChange', 'program': 1})
+
+    renderTimer = QTimer()
+    renderTimer.timeout.connect(mixBus.getMixed)
+    renderTimer.start(16)
+
+    def report():
+        for stage, stats in detector.getHistograms().items():
+            print(f"{stage}: {stats['count']} frames  p50 {stats['p50Ms']} ms  p90 {stats['p90Ms']} ms  "
+                  f"p99 {stats['p99Ms']} ms  delay p50 {stats['p50Frames']} frames  "
+                  f"errors {stats['decodeErrors']}")
+        renderTimer.stop()
+        mixBus.stop()
+        videoHub.stopAllDevices()
+        app.quit()
+
+    QTimer.singleShot(5000, report)
+    sys.exit(app.exec())
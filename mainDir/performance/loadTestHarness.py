@@ -0,0 +1,416 @@
+import argparse
+import logging
+import os
+import sys
+import threading
+import time
+import tracemalloc
+
+import numpy as np
+from PyQt6.QtCore import QObject, QTimer, QEventLoop, Qt, QCoreApplication, QSize
+
+try:
+    import psutil
+except ImportError:  # psutil è opzionale: senza si usano /proc o tracemalloc
+    psutil = None
+
+from mainDir.errorClass.traceClass import tracer
+from mainDir.inputDevice.generatorDevice.inputDevice_movingPatternGenerator import \
+    InputDevice_MovingPatternGenerator
+from mainDir.mixBus.mixBus018 import MixBus018, MIX_TYPE
+from mainDir.outputDevice.worker.baseWorker016 import BaseWorker016
+from mainDir.performance.memoryRegistry import memoryRegistry
+from mainDir.performance.stageTimer import stageTimer
+from mainDir.videoHub.videoHubData018 import VideoHubData018
+
+"""
+Load test harness.
+
+Riempie VideoHubData018 con N input sintetici in movimento, fa girare il MixBus018
+a frame rate fisso con auto transizioni continue e attacca due sink (recording e
+streaming) che codificano verso un output nullo di FFmpeg.
+Alla fine riporta fps sostenuti del program, percentili del frame time, frame persi
+per stadio, CPU per thread e memoria. Con --sweep ripete il test per diversi N e
+trova il punto di saturazione della macchina.
+
+Esempio:
+    python -m mainDir.performance.loadTestHarness --inputs 4 --duration 10
+    python -m mainDir.performance.loadTestHarness --sweep 1,2,4,8,12,16 --no-sinks
+"""
+
+
+def nullSinkCommand(width, height, fps, preset="ultrafast"):
+    """
+    Comando FFmpeg che legge bgr24 da stdin, codifica in H.264 e butta via il risultato.
+    """
+    return [
+        "ffmpeg", "-y", "-loglevel", "error",
+        "-f", "rawvideo", "-pix_fmt", "bgr24",
+        "-s", f"{width}x{height}", "-r", str(fps),
+        "-i", "-", "-an",
+        "-c:v", "libx264", "-preset", preset,
+        "-f", "null", "-"
+    ]
+
+
+def sampleThreadCpu():
+    """
+    Restituisce il tempo di CPU consumato da ogni thread del processo.
+
+    :return: dizionario {thread_id: secondi di cpu}
+    """
+    if psutil is not None:
+        return {t.id: t.user_time + t.system_time for t in psutil.Process().threads()}
+    task_dir = "/proc/self/task"
+    if not os.path.isdir(task_dir):
+        return {}
+    ticks = os.sysconf("SC_CLK_TCK")
+    result = {}
+    for tid in os.listdir(task_dir):
+        try:
+            with open(f"{task_dir}/{tid}/stat") as f:
+                fields = f.read().rsplit(")", 1)[1].split()
+            result[int(tid)] = (int(fields[11]) + int(fields[12])) / ticks
+        except (OSError, IndexError, ValueError):
+            continue
+    return result
+
+
+def threadNames():
+    """
+    Nomi dei thread: quelli Python da threading, gli altri (QThread, pool) dal sistema operativo.
+    """
+    names = {t.native_id: t.name for t in threading.enumerate() if t.native_id}
+    task_dir = "/proc/self/task"
+    if os.path.isdir(task_dir):
+        for tid in os.listdir(task_dir):
+            if int(tid) in names:
+                continue
+            try:
+                with open(f"{task_dir}/{tid}/comm") as f:
+                    names[int(tid)] = f"{f.read().strip()}-{tid}"
+            except OSError:
+                continue
+    return names
+
+
+def processMemoryMB():
+    """
+    Memoria residente del processo in MB.
+    """
+    if psutil is not None:
+        return psutil.Process().memory_info().rss / 2 ** 20
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2 ** 20
+    except (OSError, ValueError, AttributeError):
+        pass
+    if tracemalloc.is_tracing():
+        return tracemalloc.get_traced_memory()[0] / 2 ** 20
+    return 0.0
+
+
+class ProgramSink(QObject):
+    """
+    Tiene l'ultimo frame di program per i worker di uscita.
+    Ha la stessa interfaccia dei viewer (getFrame), quindi BaseWorker016 lo usa senza modifiche.
+    """
+
+    def __init__(self, resolution=QSize(1920, 1080), parent=None):
+        super().__init__(parent)
+        self._frame = np.zeros((resolution.height(), resolution.width(), 3), dtype=np.uint8)
+
+    def setFrame(self, frame):
+        self._frame = frame
+
+    def getFrame(self):
+        return self._frame
+
+
+class LoadTestHarness(QObject):
+    """
+    Esegue un singolo test di carico con un numero fisso di input.
+
+    :param numInputs: numero di input sintetici da mettere nel video hub.
+    :param inputFps: frame rate di ciascun input.
+    :param programFps: frame rate a cui viene chiamato MixBus018.getMixed.
+    :param withSinks: se True attacca i sink di recording e streaming.
+    :param resolution: risoluzione di lavoro.
+    """
+
+    def __init__(self, numInputs, inputFps=60, programFps=60, withSinks=True,
+                 resolution=QSize(1920, 1080), parent=None):
+        super().__init__(parent)
+        self.numInputs = numInputs
+        self.inputFps = inputFps
+        self.programFps = programFps
+        self.withSinks = withSinks
+        self.resolution = resolution
+        self.videoHub = None
+        self.mixBus = None
+        self.inputs = []
+        self.workers = {}
+        self.sink = ProgramSink(resolution, self)
+        self.renderTimer = QTimer(self)
+        self.renderTimer.setTimerType(Qt.TimerType.PreciseTimer)
+        self.renderTimer.timeout.connect(self.onRenderTick)
+        self.transitionTimer = QTimer(self)
+        self.transitionTimer.timeout.connect(self.driveTransitions)
+        self._nextRender = 0.0
+        self._nextPreview = 1
+        self._effects = [MIX_TYPE.FADE, MIX_TYPE.WIPE_LEFT_TO_RIGHT, MIX_TYPE.WIPE_RIGHT_TO_LEFT]
+        self._effectIndex = 0
+        self.resetCounters()
+
+    def resetCounters(self):
+        self.ticks = 0
+        self.framesDelivered = 0
+        self.transitions = 0
+        self.frameIntervals = []
+        self.lastFrameTime = None
+        self.sinkDrops = {name: 0 for name in self.workers}
+        self.sinkErrors = {name: 0 for name in self.workers}
+        self.measureStart = time.perf_counter()
+        self.inputStartIndex = [device.getInputObject().frame_index for device in self.inputs]
+        self.cpuStart = sampleThreadCpu()
+        tracer.reset()
+        stageTimer.reset()
+        if self.mixBus:
+            self.mixBus.resetCommandStats()
+
+    def setup(self):
+        self.videoHub = VideoHubData018(self)
+        for i in range(1, self.numInputs + 1):
+            old_device = self.videoHub.getInputDevice(i)
+            if old_device:
+                old_device.stop()
+            device = InputDevice_MovingPatternGenerator(str(i), fps=self.inputFps)
+            self.videoHub.addInputDevice(i, device)
+            self.videoHub.startInputDevice(i)
+            self.inputs.append(device)
+        self.mixBus = MixBus018(self.videoHub)
+        self.mixBus.frame_ready.connect(self.onFrameReady)
+        if self.withSinks:
+            width, height = self.resolution.width(), self.resolution.height()
+            for name, preset in (("LoadRec", "veryfast"), ("LoadStream", "ultrafast")):
+                worker = BaseWorker016(self.sink, nullSinkCommand(width, height, self.programFps, preset), name,
+                                       fps=self.programFps, resolution=(width, height))
+                worker.tally_SIGNAL.connect(self.onWorkerTally)
+                self.workers[name] = worker
+        self.resetCounters()
+
+    def start(self):
+        for worker in self.workers.values():
+            worker.start()
+        self._nextRender = time.perf_counter()
+        self.renderTimer.start(1)
+        self.transitionTimer.start(100)
+
+    def teardown(self):
+        self.renderTimer.stop()
+        self.transitionTimer.stop()
+        for worker in self.workers.values():
+            worker.stop()
+            worker.wait()
+        if self.mixBus:
+            self.mixBus.stop()
+        if self.videoHub:
+            self.videoHub.stopAllDevices()
+
+    def onRenderTick(self):
+        """
+        Il QTimer ha risoluzione al millisecondo, quindi gira a 1 ms e il render
+        parte solo quando si raggiunge la scadenza del frame successivo.
+        """
+        now = time.perf_counter()
+        if now < self._nextRender:
+            return
+        period = 1.0 / self.programFps
+        self._nextRender += period
+        if now - self._nextRender > period:
+            self._nextRender = now + period
+        self.ticks += 1
+        self.mixBus.getMixed()
+
+    def onFrameReady(self, prw_frame, prg_frame, fps):
+        now = time.perf_counter()
+        if self.lastFrameTime is not None:
+            self.frameIntervals.append((now - self.lastFrameTime) * 1000)
+        self.lastFrameTime = now
+        self.framesDelivered += 1
+        self.sink.setFrame(prg_frame)
+
+    def driveTransitions(self):
+        """
+        Appena finisce una transizione ne lancia un'altra su un input diverso,
+        alternando gli effetti, così il mix bus non è mai a riposo.
+        """
+        if self.numInputs < 2 or self.mixBus.isTransitionRunning():
+            return
+        self._nextPreview = self._nextPreview % self.numInputs + 1
+        self.mixBus.parseTallySignal({'cmd': 'previewChange', 'preview': self._nextPreview})
+        self.mixBus.setEffectType(self._effects[self._effectIndex])
+        self._effectIndex = (self._effectIndex + 1) % len(self._effects)
+        self.mixBus.parseTallySignal({'cmd': 'auto'})
+        self.transitions += 1
+
+    def onWorkerTally(self, tally_data):
+        name = tally_data.get('sender', '').replace("Worker", "")
+        if name not in self.workers:
+            return
+        message = tally_data.get('message', '')
+        if "queue is full" in message:
+            self.sinkDrops[name] += 1
+        elif tally_data.get('cmd') == 'error':
+            self.sinkErrors[name] += 1
+
+    def collectReport(self):
+        elapsed = time.perf_counter() - self.measureStart
+        intervals = np.array(self.frameIntervals) if self.frameIntervals else np.zeros(1)
+        capture_drops = {}
+        for device, start_index in zip(self.inputs, self.inputStartIndex):
+            produced = device.getInputObject().frame_index - start_index
+            capture_drops[device.getName()] = max(0, int(round(self.inputFps * elapsed)) - produced)
+        cpu_end = sampleThreadCpu()
+        names = threadNames()
+        cpu = {}
+        for tid, seconds in cpu_end.items():
+            used = seconds - self.cpuStart.get(tid, 0.0)
+            if used > 0:
+                cpu[names.get(tid, f"tid-{tid}")] = round(100 * used / elapsed, 1)
+        return {
+            'inputs': self.numInputs,
+            'elapsed': round(elapsed, 2),
+            'targetFps': self.programFps,
+            'programFps': round(self.framesDelivered / elapsed, 2) if elapsed > 0 else 0,
+            'frameTimeMs': {
+                'p50': round(float(np.percentile(intervals, 50)), 2),
+                'p90': round(float(np.percentile(intervals, 90)), 2),
+                'p99': round(float(np.percentile(intervals, 99)), 2),
+                'max': round(float(intervals.max()), 2),
+            },
+            'drops': {
+                'capture': sum(capture_drops.values()),
+                'captureByInput': capture_drops,
+                'mix': max(0, self.ticks - self.framesDelivered),
+                'sinks': dict(self.sinkDrops),
+            },
+            'sinkErrors': dict(self.sinkErrors),
+            'transitions': self.transitions,
+            'cpuPercentByThread': dict(sorted(cpu.items(), key=lambda item: -item[1])),
+            'memoryMB': round(processMemoryMB(), 1),
+            'memoryBreakdown': memoryRegistry.getBreakdown(),
+            'trace': tracer.getStats(),
+            'stages': stageTimer.getStageStats(1000 / self.programFps),
+            'commands': self.mixBus.getCommandStats(),
+            'outputs': {name: worker.getStats() for name, worker in self.workers.items()},
+        }
+
+    @staticmethod
+    def wait(seconds):
+        loop = QEventLoop()
+        QTimer.singleShot(int(seconds * 1000), loop.quit)
+        loop.exec()
+
+    def run(self, duration=10.0, warmup=2.0):
+        """
+        Esegue il test: warmup (non misurato) e poi la finestra di misura.
+
+        :return: dizionario con il report.
+        """
+        if self.videoHub is None:
+            self.setup()
+        self.start()
+        self.wait(warmup)
+        self.resetCounters()
+        self.wait(duration)
+        return self.collectReport()
+
+
+def sweep(counts, duration=10.0, warmup=2.0, inputFps=60, programFps=60, withSinks=True, threshold=0.95):
+    """
+    Ripete il test di carico per ogni numero di input in counts.
+    Il punto di saturazione è il primo N per cui il program non riesce più
+    a sostenere threshold * programFps.
+
+    :return: (lista dei report, N di saturazione o None)
+    """
+    reports = []
+    saturation = None
+    for count in counts:
+        harness = LoadTestHarness(count, inputFps, programFps, withSinks)
+        try:
+            report = harness.run(duration, warmup)
+        finally:
+            harness.teardown()
+            harness.deleteLater()
+            QCoreApplication.processEvents()
+        reports.append(report)
+        printReport(report)
+        if saturation is None and report['programFps'] < threshold * programFps:
+            saturation = count
+    return reports, saturation
+
+
+def printReport(report):
+    frame_time = report['frameTimeMs']
+    drops = report['drops']
+    print(f"--- inputs: {report['inputs']} ({report['elapsed']} s) ---")
+    print(f"program fps: {report['programFps']} / {report['targetFps']}  transitions: {report['transitions']}")
+    print(f"frame time ms  p50: {frame_time['p50']}  p90: {frame_time['p90']}  "
+          f"p99: {frame_time['p99']}  max: {frame_time['max']}")
+    print(f"drops  capture: {drops['capture']}  mix: {drops['mix']}  sinks: {drops['sinks']}")
+    print(f"memory: {report['memoryMB']} MB  (tracked frame memory {report['memoryBreakdown']['totalMB']} MB)")
+    for name, data in report['memoryBreakdown']['subsystems'].items():
+        if data['usedMB'] or data['refused']:
+            print(f"    {name}: {data['usedMB']} MB  budget {data['budgetMB']}  refused {data['refused']}")
+    for name, percent in list(report['cpuPercentByThread'].items())[:12]:
+        print(f"    cpu {percent:6.1f}%  {name}")
+    for name, stats in report['stages'].items():
+        print(f"    stage {name}: p50 {stats['p50Ms']} ms  p99 {stats['p99Ms']} ms  "
+              f"max {stats['maxMs']} ms  overruns {stats['overruns']}")
+    for name, stats in report['commands'].items():
+        print(f"    command {name}: {stats['count']}x  to air p50 {stats['p50Ms']} ms  p99 {stats['p99Ms']} ms  "
+              f"max {stats['maxMs']} ms ({stats['maxFrames']} frames waited)")
+    for name, stats in report['outputs'].items():
+        print(f"    output {name}: {stats['ticks']} slots  repeated {stats['repeated']}  dropped {stats['dropped']}  "
+              f"blocked {stats.get('blockedPercent', 0.0)}% (max {stats.get('maxBlockMs', 0.0)} ms)")
+        encoder = stats.get('encoder')
+        if encoder:
+            print(f"        encoder: speed {encoder['speed']}x  {encoder['fps']} fps  {encoder['bitrateKbps']} kbit/s  "
+                  f"dup {encoder['dupFrames']}  drop {encoder['dropFrames']}  "
+                  f"not keeping up {encoder['behindEvents']}x")
+    for name, stats in report['trace'].items():
+        print(f"    trace {name}: {stats['calls']} calls  avg {stats['avgUs']} us  max {stats['maxUs']} us")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="openPyVision synthetic load test")
+    parser.add_argument("--inputs", type=int, default=4, help="number of synthetic inputs")
+    parser.add_argument("--sweep", type=str, default="", help="comma separated list of input counts")
+    parser.add_argument("--duration", type=float, default=10.0, help="measured seconds per run")
+    parser.add_argument("--warmup", type=float, default=2.0, help="seconds before measuring")
+    parser.add_argument("--input-fps", type=float, default=60)
+    parser.add_argument("--program-fps", type=float, default=60)
+    parser.add_argument("--no-sinks", action="store_true", help="do not attach the FFmpeg null sinks")
+    parser.add_argument("--trace", type=str, default="", help="write a Chrome trace of the last run to this file")
+    args = parser.parse_args(argv)
+
+    logging.getLogger().setLevel(logging.WARNING)
+    app = QCoreApplication.instance() or QCoreApplication(sys.argv[:1])
+    counts = [int(n) for n in args.sweep.split(",") if n] if args.sweep else [args.inputs]
+    reports, saturation = sweep(counts, args.duration, args.warmup, args.input_fps, args.program_fps,
+                                not args.no_sinks)
+    if args.trace:
+        stageTimer.exportChromeTrace(args.trace, background=False)
+        print(f"Chrome trace written to {args.trace}")
+    if len(counts) > 1:
+        if saturation is None:
+            print(f"No saturation up to {counts[-1]} inputs.")
+        else:
+            print(f"Saturation reached at {saturation} inputs.")
+    return reports
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,200 @@
+import threading
+import weakref
+
+from PyQt6.QtCore import QObject, pyqtSignal
+
+"""
+Registro della memoria occupata dalle cache di frame.
+
+Ogni oggetto che tiene frame in memoria (banchi di rumore pre-generati, stinger,
+still image, pool di buffer) dichiara quanti byte occupa con account(). Ogni
+sottosistema ha un budget opzionale e una politica per quando il budget è raggiunto:
+
+    "refuse" -> account() restituisce False e il chiamante non deve allocare
+    "evict"  -> vengono chiamate le callback evict delle altre voci dello stesso
+                sottosistema (dalla più vecchia) finché lo spazio basta; se non
+                basta si rifiuta comunque
+
+Le voci vengono rimosse da sole quando l'oggetto proprietario viene distrutto.
+getBreakdown() restituisce la situazione attuale per la UI e per la modalità headless.
+"""
+
+MB = 1024 * 1024
+
+# budget predefiniti in MB (None = nessun limite) e politica
+DEFAULT_BUDGETS = {
+    'noiseBanks': (512, "evict"),
+    'stingers': (None, "refuse"),
+    'stills': (None, "refuse"),
+    'framePools': (None, "refuse"),
+    # il ReplayBuffer rispetta il suo maxMB scartando i frame più vecchi: qui solo per il breakdown
+    'replay': (None, "refuse"),
+    # le code ISO hanno il loro tetto (maxTotalMB dell'IsoRecorder): anche qui solo per il breakdown
+    'iso': (None, "refuse"),
+}
+
+
+def framesBytes(*frameLists):
+    """
+    Byte occupati da una o più liste di array numpy.
+    """
+    return sum(frame.nbytes for frames in frameLists for frame in frames if frame is not None)
+
+
+class MemoryRegistry(QObject):
+    budget_SIGNAL = pyqtSignal(dict)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._lock = threading.RLock()
+        self._subsystems = {}
+        for name, (budget, policy) in DEFAULT_BUDGETS.items():
+            self.setBudget(name, budget, policy)
+
+    def _subsystem(self, name):
+        subsystem = self._subsystems.get(name)
+        if subsystem is None:
+            subsystem = {'budget': None, 'policy': "refuse", 'entries': {}, 'refused': 0, 'evicted': 0}
+            self._subsystems[name] = subsystem
+        return subsystem
+
+    def setBudget(self, subsystem, megabytes, policy="refuse"):
+        """
+        :param subsystem: nome del sottosistema.
+        :param megabytes: budget in MB, None per nessun limite.
+        :param policy: "refuse" o "evict".
+        """
+        if policy not in ("refuse", "evict"):
+            raise ValueError(f"Unknown memory policy: {policy}")
+        with self._lock:
+            data = self._subsystem(subsystem)
+            data['budget'] = None if megabytes is None else int(megabytes * MB)
+            data['policy'] = policy
+
+    def account(self, subsystem, owner, nbytes, label=None, evict=None):
+        """
+        Dichiara che owner occupa nbytes nel sottosistema (sostituisce il valore precedente).
+
+        :param owner: l'oggetto che tiene la memoria.
+        :param nbytes: byte totali che owner occuperà.
+        :param label: nome leggibile per il breakdown.
+        :param evict: callback senza argomenti che libera memoria e restituisce i byte rimasti.
+                      Viene chiamata sotto lock, quindi non deve richiamare il registro.
+        :return: True se la memoria è concessa, False se il budget la rifiuta.
+        """
+        key = id(owner)
+        with self._lock:
+            data = self._subsystem(subsystem)
+            entries = data['entries']
+            entry = entries.get(key)
+            current = entry['bytes'] if entry else 0
+            budget = data['budget']
+            if budget is not None and nbytes > current:
+                used = sum(item['bytes'] for item in entries.values())
+                if used - current + nbytes > budget and data['policy'] == "evict":
+                    used = self._evict(data, key, used - current + nbytes - budget) + current
+                if used - current + nbytes > budget:
+                    data['refused'] += 1
+                    self.budget_SIGNAL.emit({'subsystem': subsystem, 'cmd': 'refused', 'label': label,
+                                             'requested': nbytes, 'budget': budget})
+                    return False
+            if entry is None:
+                entry = {'bytes': 0, 'label': label or type(owner).__name__, 'evict': None}
+                entries[key] = entry
+                weakref.finalize(owner, self.release, subsystem, key)
+            entry['bytes'] = nbytes
+            if evict is not None:
+                # un metodo legato terrebbe vivo owner: si conserva un riferimento debole
+                entry['evict'] = weakref.WeakMethod(evict) if hasattr(evict, '__self__') else (lambda: evict)
+            return True
+
+    def _evict(self, data, requester, needed):
+        """
+        Chiama le callback evict delle voci (tranne requester) finché non si liberano needed byte.
+
+        :return: byte occupati dal sottosistema dopo l'eviction
+        """
+        for key, entry in list(data['entries'].items()):
+            if needed <= 0:
+                break
+            evict = entry['evict']() if entry['evict'] is not None else None
+            if key == requester or evict is None or entry['bytes'] == 0:
+                continue
+            before = entry['bytes']
+            entry['bytes'] = max(0, int(evict()))
+            needed -= before - entry['bytes']
+            data['evicted'] += 1
+        return sum(item['bytes'] for item in data['entries'].values())
+
+    def release(self, subsystem, owner):
+        """
+        Rimuove la voce di owner (accetta anche l'id già calcolato).
+        """
+        key = owner if isinstance(owner, int) else id(owner)
+        with self._lock:
+            data = self._subsystems.get(subsystem)
+            if data:
+                data['entries'].pop(key, None)
+
+    def getBreakdown(self):
+        """
+        :return: {'totalMB', 'subsystems': {nome: {'usedMB', 'budgetMB', 'policy', 'refused', 'evicted', 'entries'}}}
+        """
+        with self._lock:
+            result = {}
+            total = 0
+            for name, data in self._subsystems.items():
+                used = sum(entry['bytes'] for entry in data['entries'].values())
+                total += used
+                result[name] = {
+                    'usedMB': round(used / MB, 1),
+                    'budgetMB': None if data['budget'] is None else round(data['budget'] / MB, 1),
+                    'policy': data['policy'],
+                    'refused': data['refused'],
+                    'evicted': data['evicted'],
+                    'entries': sorted(((entry['label'], round(entry['bytes'] / MB, 1))
+                                       for entry in data['entries'].values()), key=lambda item: -item[1]),
+                }
+        return {'totalMB': round(total / MB, 1), 'subsystems': result}
+
+    def formatBreakdown(self):
+        """
+        Breakdown in forma di testo, per la finestra della UI e per la console.
+        """
+        breakdown = self.getBreakdown()
+        lines = [f"Tracked frame memory: {breakdown['totalMB']} MB"]
+        for name, data in breakdown['subsystems'].items():
+            budget = "unlimited" if data['budgetMB'] is None else f"{data['budgetMB']} MB"
+            lines.append(f"{name}: {data['usedMB']} MB / {budget} ({data['policy']}, "
+                         f"refused {data['refused']}, evicted {data['evicted']})")
+            for label, megabytes in data['entries']:
+                lines.append(f"    {label}: {megabytes} MB")
+        return "\n".join(lines)
+
+
+# registro condiviso da tutta l'applicazione
+memoryRegistry = MemoryRegistry()
+
+
+if __name__ == "__main__":
+    import numpy as np
+
+    class Bank:
+        def __init__(self, name):
+            self.name = name
+            self.frames = []
+
+        def trim(self):
+            del self.frames[4:]
+            return framesBytes(self.frames)
+
+    memoryRegistry.setBudget('noiseBanks', 100, "evict")
+    banks = [Bank(f"bank{i}") for i in range(3)]
+    for bank in banks:
+        for _ in range(20):
+            frame = np.zeros((1080, 1920, 3), np.uint8)
+            if not memoryRegistry.account('noiseBanks', bank, framesBytes(bank.frames) + frame.nbytes,
+                                          bank.name, bank.trim):
+                break
+            bank.frames.append(frame)
+    print(memoryRegistry.formatBreakdown())
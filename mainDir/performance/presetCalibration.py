@@ -0,0 +1,279 @@
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import time
+
+try:
+    import resource
+except ImportError:  # Windows: la CPU dei processi figli si legge con psutil, se c'è
+    resource = None
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+from mainDir.outputDevice.commonWidgets.codecPermutationDictionary import CODEC_PERMUTATION
+from mainDir.outputDevice.commonWidgets.ffmpegStringGenerator import FFMpegStringGenerator
+from mainDir.performance.ladderBenchmark import syntheticFrames, runEncode
+
+"""
+Calibrazione dei preset dell'encoder su questa macchina.
+
+CODEC_PERMUTATION elenca i preset di ogni codec (da ultrafast a veryslow, da p1 a p7 per
+NVENC) ma non dice quale regge il program 1080p60 su questa CPU o GPU. Qui:
+
+    1. si interroga FFmpeg una volta sugli encoder disponibili (ffmpeg -encoders, più una
+       prova da un frame per quelli hardware, che possono essere compilati ma senza GPU);
+    2. per ogni preset candidato, dal più veloce al più lento, si codifica qualche secondo
+       di program sintetico verso un output nullo misurando fps sostenuti e CPU di FFmpeg;
+    3. si consiglia il preset di qualità più alta che resta in tempo reale con il margine
+       richiesto (headroom 1.25 = almeno il 125% del frame rate).
+
+Appena un preset non regge il tempo reale ci si ferma: i successivi sono più lenti.
+Encoder disponibili e risultati finiscono in encoderCalibration.json accanto a questo
+file, legati alla macchina e alla versione di FFmpeg; recommendedPreset() li rilegge
+senza rifare le misure.
+
+Esempio:
+    python -m mainDir.performance.presetCalibration
+    python -m mainDir.performance.presetCalibration --codec libx264 --fps 60 --headroom 1.3 --max-cpu 50
+"""
+
+CACHE_FILE = os.path.join(os.path.dirname(os.path.realpath(__file__)), "encoderCalibration.json")
+
+# profilo usato per scegliere la lista di preset in CODEC_PERMUTATION
+CALIBRATION_PROFILES = {'libx264': "main", 'libx265': "main", 'h264_nvenc': "default"}
+
+
+def loadCache(path=CACHE_FILE):
+    try:
+        with open(path, "r") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def saveCache(cache, path=CACHE_FILE):
+    try:
+        with open(path, "w") as f:
+            json.dump(cache, f, indent=2)
+    except IOError as e:
+        print(f"Error saving encoder calibration: {e}")
+
+
+def fingerprint(ffmpeg="ffmpeg"):
+    """
+    Identifica macchina e build di FFmpeg: se cambiano, la cache non vale più.
+    """
+    try:
+        version = subprocess.run([ffmpeg, "-hide_banner", "-version"], capture_output=True, text=True,
+                                 timeout=10).stdout.splitlines()[0]
+    except (OSError, subprocess.SubprocessError, IndexError):
+        version = "unknown"
+    return f"{platform.node()}|{platform.processor() or platform.machine()}|{os.cpu_count()}|{version}"
+
+
+def listEncoders(ffmpeg="ffmpeg"):
+    """
+    :return: nomi degli encoder video compilati in FFmpeg (da "ffmpeg -encoders")
+    """
+    output = subprocess.run([ffmpeg, "-hide_banner", "-encoders"], capture_output=True, text=True,
+                            timeout=10).stdout
+    encoders = set()
+    for line in output.splitlines():
+        fields = line.split()
+        # " V....D libx264   libx264 H.264 / AVC ..." (le righe della legenda hanno "=")
+        if len(fields) >= 2 and fields[0].startswith("V") and "=" not in fields[1]:
+            encoders.add(fields[1])
+    return encoders
+
+
+def encoderWorks(codec, ffmpeg="ffmpeg"):
+    """
+    Prova da un frame: un encoder hardware può essere compilato ma senza GPU o driver.
+    """
+    command = [ffmpeg, "-hide_banner", "-loglevel", "error", "-f", "lavfi", "-i", "color=size=256x144:rate=1",
+               "-frames:v", "1", "-c:v", codec, "-f", "null", "-"]
+    try:
+        return subprocess.run(command, capture_output=True, timeout=20).returncode == 0
+    except (OSError, subprocess.SubprocessError):
+        return False
+
+
+def probeEncoders(ffmpeg="ffmpeg", refresh=False, path=CACHE_FILE):
+    """
+    Codec di CODEC_PERMUTATION utilizzabili su questa macchina, dalla cache se valida.
+    """
+    cache = loadCache(path)
+    key = fingerprint(ffmpeg)
+    if cache.get('fingerprint') != key:
+        cache = {'fingerprint': key, 'calibrations': {}}
+    if refresh or 'encoders' not in cache:
+        compiled = listEncoders(ffmpeg)
+        cache['encoders'] = [codec for codec in CODEC_PERMUTATION if codec in compiled and encoderWorks(codec, ffmpeg)]
+        saveCache(cache, path)
+    return cache['encoders']
+
+
+def candidatePresets(codec):
+    """
+    Preset del codec dal più veloce al più lento, cioè in ordine di qualità crescente.
+    """
+    presets = CODEC_PERMUTATION.get(codec, {}).get('presets', {})
+    return list(presets.get(CALIBRATION_PROFILES.get(codec), next(iter(presets.values()), [])))
+
+
+def childCpuSeconds():
+    """
+    CPU consumata dai processi figli già terminati (user + system), None se non misurabile.
+    """
+    if resource is not None:
+        usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+        return usage.ru_utime + usage.ru_stime
+    if psutil is not None:
+        times = psutil.Process().cpu_times()
+        return times.children_user + times.children_system
+    return None
+
+
+def calibrationCommand(codec, preset, fps, bitrate):
+    generator = FFMpegStringGenerator()
+    request = {
+        'pixelFormat': "yuv420p",
+        'videoSize': "1920x1080",
+        'frameRate': fps,
+        'codec': {'codec': codec, 'preset': preset, 'profile': CALIBRATION_PROFILES.get(codec, "main"),
+                  'bitrate': bitrate, 'keyframeInterval': 2},
+    }
+    command = generator.initVideoSource(request) + generator.initVideoCodec(request) + generator.addTuning(request)
+    command[1:1] = ["-hide_banner", "-loglevel", "error", "-nostats"]
+    return command + ["-an", "-f", "null", "-"]
+
+
+def measurePreset(codec, preset, frames, fps=60, numFrames=300, bitrate=6000):
+    """
+    :return: {'preset', 'fps', 'realtime', 'cpuPercent', 'machinePercent', 'seconds'}
+    """
+    cpuBefore = childCpuSeconds()
+    seconds, errors = runEncode(calibrationCommand(codec, preset, fps, bitrate), frames, numFrames)
+    cpuAfter = childCpuSeconds()
+    result = {
+        'preset': preset,
+        'seconds': round(seconds, 2),
+        'fps': round(numFrames / seconds, 1) if seconds else 0.0,
+        'realtime': round(numFrames / seconds / fps, 2) if seconds else 0.0,
+        'cpuPercent': None,
+        'machinePercent': None,
+    }
+    if cpuBefore is not None and seconds:
+        # percentuale di un core, come top; machinePercent è sulla macchina intera
+        result['cpuPercent'] = round((cpuAfter - cpuBefore) / seconds * 100, 1)
+        result['machinePercent'] = round(result['cpuPercent'] / (os.cpu_count() or 1), 1)
+    if errors:
+        result['errors'] = errors
+    return result
+
+
+def recommend(results, headroom=1.25, maxCpu=None):
+    """
+    Il preset di qualità più alta (l'ultimo della lista) con realtime >= headroom e,
+    se maxCpu è dato, CPU della macchina sotto maxCpu per cento.
+
+    :return: (preset, True se rispetta i vincoli); senza candidati validi il più veloce, False
+    """
+    valid = [result for result in results if not result.get('errors') and result['realtime'] >= headroom
+             and (maxCpu is None or result['machinePercent'] is None or result['machinePercent'] <= maxCpu)]
+    if valid:
+        return valid[-1]['preset'], True
+    return (results[0]['preset'], False) if results else (None, False)
+
+
+def calibrateCodec(codec, fps=60, numFrames=300, headroom=1.25, maxCpu=None, bitrate=6000, frames=None):
+    """
+    Misura i preset di codec dal più veloce al più lento, fermandosi al primo che non regge il tempo reale.
+    """
+    frames = frames or syntheticFrames()
+    results = []
+    for preset in candidatePresets(codec):
+        result = measurePreset(codec, preset, frames, fps, numFrames, bitrate)
+        results.append(result)
+        if result.get('errors') or result['realtime'] < 1.0:
+            break
+    preset, meetsTarget = recommend(results, headroom, maxCpu)
+    return {'codec': codec, 'targetFps': fps, 'frames': numFrames, 'headroom': headroom, 'maxCpu': maxCpu,
+            'results': results, 'recommended': preset, 'meetsTarget': meetsTarget, 'measuredAt': time.time()}
+
+
+def calibrate(codecs=None, fps=60, numFrames=300, headroom=1.25, maxCpu=None, bitrate=6000, ffmpeg="ffmpeg",
+              refresh=False, path=CACHE_FILE):
+    """
+    Calibra i codec richiesti (tutti quelli disponibili se None) e salva i risultati nella cache.
+    """
+    available = probeEncoders(ffmpeg, refresh, path)
+    codecs = [codec for codec in (codecs or available) if codec in available]
+    cache = loadCache(path)
+    frames = syntheticFrames()
+    reports = []
+    for codec in codecs:
+        report = calibrateCodec(codec, fps, numFrames, headroom, maxCpu, bitrate, frames)
+        cache.setdefault('calibrations', {}).setdefault(codec, {})[f"{fps:g}"] = report
+        reports.append(report)
+    saveCache(cache, path)
+    return reports
+
+
+def recommendedPreset(codec, fps=60, path=CACHE_FILE):
+    """
+    Preset consigliato dall'ultima calibrazione di questa macchina, None se manca.
+    """
+    cache = loadCache(path)
+    report = cache.get('calibrations', {}).get(codec, {}).get(f"{fps:g}")
+    if report is None or cache.get('fingerprint') != fingerprint():
+        return None
+    return report['recommended']
+
+
+def printReport(report):
+    print(f"--- preset calibration: {report['codec']}, 1080p{report['targetFps']:g}, "
+          f"{report['frames']} frames, headroom x{report['headroom']} ---")
+    for result in report['results']:
+        cpu = f"cpu {result['cpuPercent']}% ({result['machinePercent']}% of machine)" \
+            if result['cpuPercent'] is not None else "cpu n/a"
+        print(f"    {result['preset']:>10}: {result['fps']:7.1f} fps  realtime x{result['realtime']:.2f}  {cpu}")
+        for line in result.get('errors', []):
+            print(f"                {line}")
+    if report['meetsTarget']:
+        print(f"    recommended: {report['recommended']}")
+    else:
+        print(f"    no preset keeps real time with headroom; fastest: {report['recommended']}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="openPyVision encoder preset calibration")
+    parser.add_argument("--codec", action="append", help="codec to calibrate (repeatable, default: all available)")
+    parser.add_argument("--fps", type=float, default=60)
+    parser.add_argument("--frames", type=int, default=300)
+    parser.add_argument("--bitrate", type=int, default=6000)
+    parser.add_argument("--headroom", type=float, default=1.25, help="required realtime factor")
+    parser.add_argument("--max-cpu", type=float, default=None, help="max percent of the machine for the encoder")
+    parser.add_argument("--refresh", action="store_true", help="probe the encoders again")
+    args = parser.parse_args(argv)
+
+    if shutil.which("ffmpeg") is None:
+        print("ffmpeg not found in PATH")
+        return None
+    reports = calibrate(args.codec, args.fps, args.frames, args.headroom, args.max_cpu, args.bitrate,
+                        refresh=args.refresh)
+    if not reports:
+        print("no calibratable encoder available")
+    for report in reports:
+        printReport(report)
+    return reports
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,238 @@
+import collections
+import json
+import os
+import threading
+import time
+import weakref
+
+import numpy as np
+
+"""
+Registro dei tempi per stadio della catena video.
+
+Ogni stadio (capture, mix, conversion, paint, queue, encode, ...) apre uno span:
+
+    with stageTimer.span("mix"):
+        ...
+
+Gli span finiscono in un ring buffer per thread (collections.deque con maxlen),
+quindi la registrazione non prende lock e la memoria è limitata. In qualsiasi
+momento exportChromeTrace scrive un JSON nel formato Chrome trace, che si apre
+con chrome://tracing o con https://ui.perfetto.dev, senza fermare la regia:
+la copia dei ring è immediata e la scrittura su disco avviene in un thread a parte.
+
+I ring dei thread terminati (writer, pool di encode e decode, ...) escono dal registro:
+restano disponibili, al massimo maxExited, fino al prossimo export e poi vengono liberati.
+"""
+
+
+class _ThreadToken:
+    """
+    Vive solo nel threading.local del thread: quando il thread termina viene liberato
+    e la weakref nel registro muore (vale anche per i QThread, vedi traceClass).
+    """
+    __slots__ = ("__weakref__",)
+
+
+class _Span:
+    __slots__ = ("timer", "name", "cat", "args", "start")
+
+    def __init__(self, timer, name, cat, args):
+        self.timer = timer
+        self.name = name
+        self.cat = cat
+        self.args = args
+        self.start = 0
+
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        self.timer.record(self.name, self.start, time.perf_counter_ns(), self.cat, self.args)
+        return False
+
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class StageTimer:
+    """
+    :param capacity: numero di span conservati per ogni thread.
+    :param enabled: se False span() non misura nulla.
+    :param maxExited: ring di thread terminati tenuti per il prossimo export.
+    """
+
+    def __init__(self, capacity=20000, enabled=True, maxExited=16):
+        self.capacity = capacity
+        self.enabled = enabled
+        self._local = threading.local()
+        # (weakref al token del thread, nome, ident, ring) per ogni thread vivo
+        self._registry = []
+        # (nome, ident, ring) dei thread terminati, in attesa dell'ultimo export
+        self._exited = collections.deque(maxlen=maxExited)
+        self._registryLock = threading.Lock()
+        self._pid = os.getpid()
+
+    def setEnabled(self, enabled):
+        self.enabled = enabled
+
+    def isEnabled(self):
+        return self.enabled
+
+    def _ring(self):
+        ring = getattr(self._local, "ring", None)
+        if ring is None:
+            ring = collections.deque(maxlen=self.capacity)
+            token = _ThreadToken()
+            self._local.ring = ring
+            self._local.token = token
+            thread = threading.current_thread()
+            with self._registryLock:
+                self._pruneLocked()
+                self._registry.append((weakref.ref(token), thread.name, threading.get_ident(), ring))
+        return ring
+
+    def _pruneLocked(self):
+        """
+        Sposta i ring dei thread terminati in _exited. Va chiamato con _registryLock preso.
+        """
+        alive = []
+        for entry in self._registry:
+            if entry[0]() is not None:
+                alive.append(entry)
+            else:
+                self._exited.append(entry[1:])
+        self._registry = alive
+
+    def span(self, name, cat="frame", args=None):
+        """
+        Context manager che misura il blocco e lo registra come stadio name.
+        """
+        if not self.enabled:
+            return _NULL_SPAN
+        return _Span(self, name, cat, args)
+
+    def record(self, name, startNs, endNs, cat="frame", args=None):
+        """
+        Registra uno span già misurato (per esempio il tempo che un frame passa in coda).
+        """
+        if self.enabled:
+            self._ring().append((name, cat, startNs, endNs - startNs, args))
+
+    def snapshot(self, releaseExited=False):
+        """
+        Copia i ring buffer di tutti i thread, compresi quelli terminati dall'ultimo export.
+
+        :param releaseExited: dopo la copia libera i ring dei thread terminati (lo fa l'export).
+        :return: lista di (nome thread, ident, lista di span)
+        """
+        with self._registryLock:
+            self._pruneLocked()
+            registry = [entry[1:] for entry in self._registry] + list(self._exited)
+            if releaseExited:
+                self._exited.clear()
+        return [(threadName, ident, list(ring)) for threadName, ident, ring in registry]
+
+    def getStageStats(self, budgetMs=1000 / 60):
+        """
+        Statistiche per stadio sugli span presenti nei ring buffer.
+
+        :param budgetMs: durata di un frame; gli span più lunghi vengono contati come overrun.
+        :return: {stadio: {'count', 'avgMs', 'p50Ms', 'p99Ms', 'maxMs', 'overruns'}}
+        """
+        durations = collections.defaultdict(list)
+        for _, _, spans in self.snapshot():
+            for name, _, _, duration, _ in spans:
+                durations[name].append(duration)
+        stats = {}
+        for name, values in durations.items():
+            values = np.array(values, dtype=np.float64) / 1e6
+            stats[name] = {
+                'count': int(values.size),
+                'avgMs': round(float(values.mean()), 3),
+                'p50Ms': round(float(np.percentile(values, 50)), 3),
+                'p99Ms': round(float(np.percentile(values, 99)), 3),
+                'maxMs': round(float(values.max()), 3),
+                'overruns': int((values > budgetMs).sum()),
+            }
+        return stats
+
+    def toChromeTrace(self, snapshot=None):
+        """
+        Converte gli span nel formato Chrome trace (eventi "X" complete e
+        metadati thread_name). I tempi sono in microsecondi.
+        """
+        snapshot = self.snapshot() if snapshot is None else snapshot
+        events = []
+        for threadName, ident, spans in snapshot:
+            events.append({'name': 'thread_name', 'ph': 'M', 'pid': self._pid, 'tid': ident,
+                           'args': {'name': threadName}})
+            for name, cat, start, duration, args in spans:
+                event = {'name': name, 'cat': cat, 'ph': 'X', 'pid': self._pid, 'tid': ident,
+                         'ts': start / 1000, 'dur': duration / 1000}
+                if args:
+                    event['args'] = args
+                events.append(event)
+        return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+    def exportChromeTrace(self, path, background=True):
+        """
+        Scrive il trace su file. La copia dei ring avviene subito, la
+        serializzazione JSON e la scrittura in un thread separato se background.
+        I ring dei thread terminati compaiono in questo export per l'ultima volta.
+
+        :return: il thread di scrittura (già avviato) oppure None
+        """
+        snapshot = self.snapshot(releaseExited=True)
+
+        def write():
+            with open(path, "w") as f:
+                json.dump(self.toChromeTrace(snapshot), f)
+
+        if not background:
+            write()
+            return None
+        writer = threading.Thread(target=write, name="StageTimerExport", daemon=True)
+        writer.start()
+        return writer
+
+    def reset(self):
+        with self._registryLock:
+            self._pruneLocked()
+            self._exited.clear()
+            for _, _, _, ring in self._registry:
+                ring.clear()
+
+
+# istanza condivisa da tutti gli stadi
+stageTimer = StageTimer()
+
+
+if __name__ == "__main__":
+    def worker(name):
+        for i in range(200):
+            with stageTimer.span("capture", args={'input': name}):
+                time.sleep(0.001)
+            with stageTimer.span("mix"):
+                time.sleep(0.002 if i % 50 else 0.02)
+
+    threads = [threading.Thread(target=worker, args=(f"IN{i}",), name=f"Input{i}") for i in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    for stage, stats in stageTimer.getStageStats().items():
+        print(stage, stats)
+    stageTimer.exportChromeTrace("stageTimer_demo.json", background=False)
+    print("trace written to stageTimer_demo.json")
@@ -0,0 +1,444 @@
+import asyncio
+import base64
+import hashlib
+import json
+import struct
+import threading
+import time
+
+from PyQt6.QtCore import QThread, pyqtSignal
+
+from mainDir.errorClass.asyncLogger import rtLogger
+from mainDir.inputDevice.playerDevice.inputObject.player_Replay import REPLAY_SPEEDS
+
+"""
+Server di controllo remoto per la regia.
+
+Pannelli esterni e automazioni si collegano in locale via TCP o WebSocket (stessa porta:
+una connessione che inizia con "GET " viene promossa a WebSocket) e mandano comandi
+testuali, uno per riga o separati da ';':
+
+    cut
+    auto [frames]
+    fade 0.35            (anche "fader")
+    preview 3
+    program 2
+    effect Wipe Left to Right
+    replay cue 5         (anche "replay play 0.5", "replay pause", "replay speed 0.25")
+
+È accettato anche un oggetto JSON nel formato dei tally, per esempio
+{"cmd": "faderChange", "fade": 0.35}: i suoi campi passano dagli stessi controlli dei
+comandi testuali, quindi un comando non valido riceve "err" e non arriva al mixer.
+
+Tutto quello che arriva in una lettura dal socket è un batch: viene analizzato in una
+volta, i fader dello stesso batch vengono ridotti all'ultimo valore e i comandi escono
+come dizionari di tally con sender "remoteControl". Ogni riga riceve una risposta
+"ok <cmd>" oppure "err <motivo>".
+
+Il server gira in un QThread con il suo loop asyncio. Di default i comandi vengono
+emessi con tally_SIGNAL e seguono lo stesso percorso della tastiera (TallyManager);
+con setDirectTarget vengono invece consegnati direttamente dal thread del server, per
+esempio a MixBus018.parseTallySignal, che si limita ad accodarli al prossimo frame:
+così il thread della UI non è nel percorso.
+"""
+
+SENDER = "remoteControl"
+INPUT_COUNT = 9  # input del videoHub, da 0 a 8
+WEBSOCKET_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+
+
+def _parseCut(argument):
+    return {'cmd': 'cut'}
+
+
+def _parseAuto(argument):
+    command = {'cmd': 'auto'}
+    if argument:
+        command['frames'] = int(argument)
+        if command['frames'] <= 0:
+            raise ValueError("auto frames must be positive")
+    return command
+
+
+def _parseFade(argument):
+    value = float(argument)
+    if not 0.0 <= value <= 1.0:
+        raise ValueError("fade must be between 0 and 1")
+    return {'cmd': 'faderChange', 'fade': value}
+
+
+def _parseInput(argument):
+    position = int(argument)
+    if not 0 <= position < INPUT_COUNT:
+        raise ValueError(f"input must be between 0 and {INPUT_COUNT - 1}")
+    return position
+
+
+def _parsePreview(argument):
+    return {'cmd': 'previewChange', 'preview': _parseInput(argument)}
+
+
+def _parseProgram(argument):
+    return {'cmd': 'programChange', 'program': _parseInput(argument)}
+
+
+def _parseEffect(argument):
+    if not argument:
+        raise ValueError("missing effect name")
+    return {'cmd': 'effectChange', 'effect': argument}
+
+
+def _parseSpeed(argument):
+    if not argument:
+        raise ValueError("missing replay speed")
+    speed = float(argument)
+    if speed not in REPLAY_SPEEDS:
+        raise ValueError(f"replay speed must be one of {REPLAY_SPEEDS}")
+    return speed
+
+
+def _parseReplay(argument):
+    action, _, value = argument.partition(" ")
+    action = action.lower()
+    value = value.strip()
+    command = {'cmd': 'replay', 'replay': action}
+    if action == 'cue':
+        command['seconds'] = float(value) if value else 5.0
+        if not 0 <= command['seconds'] < float("inf"):
+            raise ValueError("cue seconds must be positive")
+    elif action == 'play':
+        if value:
+            command['speed'] = _parseSpeed(value)
+    elif action == 'speed':
+        command['speed'] = _parseSpeed(value)
+    elif action != 'pause':
+        raise ValueError(f"unknown replay action {action!r}")
+    return command
+
+
+# verbo -> parser; la tabella viene consultata con una sola lookup per comando
+TEXT_COMMANDS = {
+    'cut': _parseCut,
+    'auto': _parseAuto,
+    'fade': _parseFade,
+    'fader': _parseFade,
+    'preview': _parsePreview,
+    'program': _parseProgram,
+    'effect': _parseEffect,
+    'replay': _parseReplay,
+}
+
+def _jsonArgument(command, key, required=True):
+    """
+    Il campo key di un comando JSON come testo, da passare al parser del comando testuale.
+    """
+    value = command.get(key)
+    if value is None:
+        if required:
+            raise ValueError(f"missing {key!r}")
+        return ""
+    if isinstance(value, bool) or not isinstance(value, (int, float, str)):
+        raise ValueError(f"invalid {key!r}: {value!r}")
+    return str(value).strip()
+
+
+def _jsonReplay(command):
+    action = _jsonArgument(command, 'replay')
+    valueKey = {'cue': 'seconds', 'play': 'speed', 'speed': 'speed'}.get(action.lower())
+    value = _jsonArgument(command, valueKey, required=False) if valueKey else ""
+    return _parseReplay(f"{action} {value}".strip())
+
+
+# comandi accettati nel formato JSON (gli stessi della tastiera) -> validazione con i parser testuali
+TALLY_COMMANDS = {
+    'cut': lambda command: _parseCut(""),
+    'auto': lambda command: _parseAuto(_jsonArgument(command, 'frames', required=False)),
+    'faderChange': lambda command: _parseFade(_jsonArgument(command, 'fade')),
+    'effectChange': lambda command: _parseEffect(_jsonArgument(command, 'effect')),
+    'previewChange': lambda command: _parsePreview(_jsonArgument(command, 'preview')),
+    'programChange': lambda command: _parseProgram(_jsonArgument(command, 'program')),
+    'replay': _jsonReplay,
+}
+
+
+def parseCommand(text):
+    """
+    Converte un comando testuale o JSON in un dizionario di tally.
+
+    :raise ValueError: se il comando non è valido.
+    """
+    text = text.strip()
+    if text.startswith("{"):
+        command = json.loads(text)
+        if not isinstance(command, dict):
+            raise ValueError("JSON command must be an object")
+        parser = TALLY_COMMANDS.get(command.get('cmd'))
+        if parser is None:
+            raise ValueError(f"unknown command {command.get('cmd')!r}")
+        # si consegna solo il comando ricostruito dal parser, non i campi arrivati dal client
+        return parser(command)
+    verb, _, argument = text.partition(" ")
+    parser = TEXT_COMMANDS.get(verb.lower())
+    if parser is None:
+        raise ValueError(f"unknown command {verb!r}")
+    return parser(argument.strip())
+
+
+def parseBatch(payload):
+    """
+    Analizza un blocco di testo con uno o più comandi (righe o ';').
+
+    :return: (lista di comandi da consegnare, lista di risposte, una per comando ricevuto)
+    """
+    commands = []
+    replies = []
+    faderIndex = None
+    for line in payload.replace(";", "\n").splitlines():
+        if not line.strip():
+            continue
+        try:
+            command = parseCommand(line)
+        except (ValueError, TypeError) as e:
+            replies.append(f"err {e}")
+            continue
+        replies.append(f"ok {command['cmd']}")
+        if command['cmd'] == 'faderChange':
+            # solo l'ultimo valore del fader nel batch conta
+            if faderIndex is not None:
+                commands[faderIndex] = None
+            faderIndex = len(commands)
+        commands.append(command)
+    return [command for command in commands if command is not None], replies
+
+
+class ControlServer(QThread):
+    tally_SIGNAL = pyqtSignal(dict)
+
+    def __init__(self, host="127.0.0.1", port=9910, parent=None):
+        """
+        :param host: indirizzo di ascolto (di default solo locale).
+        :param port: porta TCP; 0 per una porta libera scelta dal sistema (vedi self.port).
+        """
+        super().__init__(parent)
+        self.host = host
+        self.port = port
+        self._directTarget = None
+        self._loop = None
+        self._stopEvent = None
+        self._ready = threading.Event()
+        self._stats = {'connections': 0, 'batches': 0, 'commands': 0, 'delivered': 0, 'errors': 0,
+                       'parseNs': 0}
+
+    def setDirectTarget(self, target):
+        """
+        Consegna i comandi chiamando target(tally_data) dal thread del server invece di
+        emettere tally_SIGNAL. target deve essere thread safe (None per tornare al segnale).
+        """
+        self._directTarget = target
+
+    def waitReady(self, timeout=None):
+        """
+        Attende che il server sia in ascolto.
+
+        :return: True se il server è pronto.
+        """
+        return self._ready.wait(timeout)
+
+    def run(self):
+        asyncio.run(self._serve())
+
+    def stop(self):
+        if self._loop is not None and self._stopEvent is not None:
+            self._loop.call_soon_threadsafe(self._stopEvent.set)
+        self.wait()
+
+    async def _serve(self):
+        self._loop = asyncio.get_running_loop()
+        self._stopEvent = asyncio.Event()
+        try:
+            server = await asyncio.start_server(self._handleClient, self.host, self.port)
+        except OSError as e:
+            rtLogger.error("remote.listen", "CONTROL SERVER: cannot listen", host=self.host, port=self.port,
+                           error=e)
+            self._ready.set()
+            return
+        self.port = server.sockets[0].getsockname()[1]
+        rtLogger.info("remote.listen", "CONTROL SERVER: listening", host=self.host, port=self.port)
+        self._ready.set()
+        async with server:
+            await self._stopEvent.wait()
+
+    def _deliver(self, payload):
+        """
+        Analizza un batch e consegna i comandi.
+
+        :return: le risposte per il client
+        """
+        start = time.perf_counter_ns()
+        commands, replies = parseBatch(payload)
+        self._stats['parseNs'] += time.perf_counter_ns() - start
+        self._stats['batches'] += 1
+        self._stats['commands'] += len(replies)
+        self._stats['errors'] += len(replies) - sum(1 for reply in replies if reply.startswith("ok"))
+        target = self._directTarget
+        for command in commands:
+            command['sender'] = SENDER
+            if target is not None:
+                target(command)
+            else:
+                self.tally_SIGNAL.emit(command)
+        self._stats['delivered'] += len(commands)
+        return replies
+
+    async def _handleClient(self, reader, writer):
+        self._stats['connections'] += 1
+        try:
+            try:
+                first = await reader.readexactly(4)
+            except asyncio.IncompleteReadError as e:
+                first = e.partial
+            if first == b"GET ":
+                await self._handleWebSocket(reader, writer)
+            else:
+                await self._handleTcp(first, reader, writer)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def _handleTcp(self, buffer, reader, writer):
+        """
+        Ogni lettura dal socket è un batch: tutte le righe complete arrivate insieme
+        vengono analizzate e consegnate in una volta.
+        """
+        while True:
+            complete, separator, buffer = buffer.rpartition(b"\n")
+            if separator:
+                replies = self._deliver(complete.decode("utf-8", "replace"))
+                if replies:
+                    writer.write(("\n".join(replies) + "\n").encode())
+                    await writer.drain()
+            chunk = await reader.read(65536)
+            if not chunk:
+                if buffer.strip():
+                    self._deliver(buffer.decode("utf-8", "replace"))
+                return
+            buffer += chunk
+
+    async def _handleWebSocket(self, reader, writer):
+        await reader.readline()  # resto della request line
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+        key = headers.get("sec-websocket-key")
+        if not key:
+            writer.write(b"HTTP/1.1 400 Bad Request\r\n\r\n")
+            await writer.drain()
+            return
+        accept = base64.b64encode(hashlib.sha1((key + WEBSOCKET_GUID).encode()).digest()).decode()
+        writer.write(("HTTP/1.1 101 Switching Protocols\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n"
+                      f"Sec-WebSocket-Accept: {accept}\r\n\r\n").encode())
+        await writer.drain()
+        while True:
+            opcode, payload = await readWebSocketFrame(reader)
+            if opcode == 0x8:  # close
+                writer.write(encodeWebSocketFrame(payload[:2], 0x8))
+                await writer.drain()
+                return
+            if opcode == 0x9:  # ping
+                writer.write(encodeWebSocketFrame(payload, 0xA))
+            elif opcode in (0x1, 0x2):
+                replies = self._deliver(payload.decode("utf-8", "replace"))
+                if replies:
+                    writer.write(encodeWebSocketFrame("\n".join(replies).encode()))
+            await writer.drain()
+
+    def getStats(self):
+        """
+        :return: connessioni, batch, comandi ricevuti/consegnati/errati e tempo medio di parsing per comando
+        """
+        stats = dict(self._stats)
+        parseNs = stats.pop('parseNs')
+        stats['avgParseUs'] = round(parseNs / stats['commands'] / 1000, 2) if stats['commands'] else 0.0
+        return stats
+
+
+async def readWebSocketFrame(reader):
+    """
+    Legge un frame WebSocket (RFC 6455) e restituisce (opcode, payload già smascherato).
+    """
+    header = await reader.readexactly(2)
+    opcode = header[0] & 0x0F
+    masked = header[1] & 0x80
+    length = header[1] & 0x7F
+    if length == 126:
+        length = struct.unpack("!H", await reader.readexactly(2))[0]
+    elif length == 127:
+        length = struct.unpack("!Q", await reader.readexactly(8))[0]
+    mask = await reader.readexactly(4) if masked else None
+    payload = await reader.readexactly(length)
+    if mask:
+        payload = bytes(byte ^ mask[i & 3] for i, byte in enumerate(payload))
+    return opcode, payload
+
+
+def encodeWebSocketFrame(payload, opcode=0x1, mask=None):
+    """
+    Costruisce un frame WebSocket finale. I client devono mascherare (mask = 4 byte).
+    """
+    length = len(payload)
+    maskBit = 0x80 if mask else 0
+    if length < 126:
+        header = struct.pack("!BB", 0x80 | opcode, maskBit | length)
+    elif length < 65536:
+        header = struct.pack("!BBH", 0x80 | opcode, maskBit | 126, length)
+    else:
+        header = struct.pack("!BBQ", 0x80 | opcode, maskBit | 127, length)
+    if mask:
+        payload = bytes(byte ^ mask[i & 3] for i, byte in enumerate(payload))
+        return header + mask + payload
+    return header + payload
+
+
+if __name__ == "__main__":
+    import os
+    import socket
+    import sys
+    from PyQt6.QtCore import QCoreApplication
+
+    app = QCoreApplication(sys.argv)
+    server = ControlServer(port=0)
+    received = []
+    server.setDirectTarget(received.append)
+    server.start()
+    server.waitReady(5)
+
+    # client TCP: un batch con tre fader (ne arriva uno solo) e un cut
+    with socket.create_connection((server.host, server.port)) as client:
+        start = time.perf_counter()
+        client.sendall(b"preview 3\nfade 0.1\nfade 0.2\nfade 0.3\ncut\nbogus\n")
+        reply = b""
+        while reply.count(b"\n") < 6:
+            reply += client.recv(4096)
+        print(f"TCP round trip {(time.perf_counter() - start) * 1000:.2f} ms: {reply.decode().split()}")
+
+    # client WebSocket
+    with socket.create_connection((server.host, server.port)) as client:
+        key = base64.b64encode(os.urandom(16)).decode()
+        client.sendall((f"GET / HTTP/1.1\r\nHost: localhost\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n"
+                        f"Sec-WebSocket-Key: {key}\r\nSec-WebSocket-Version: 13\r\n\r\n").encode())
+        handshake = b""
+        while b"\r\n\r\n" not in handshake:
+            handshake += client.recv(4096)
+        client.sendall(encodeWebSocketFrame(b'auto 30; {"cmd": "effectChange", "effect": "Fade"}', mask=os.urandom(4)))
+        frame = client.recv(4096)
+        print(f"WebSocket reply: {frame[2:].decode().split(chr(10))}")
+
+    server.stop()
+    for command in received:
+        print(command)
+    print(server.getStats())
@@ -0,0 +1,177 @@
+import time
+
+from PyQt6.QtCore import QObject, QTimer
+
+"""
+Bus degli eventi di tally.
+
+Prima ogni messaggio era un dizionario che attraversava il TallyManager con test di
+sottostringa sul mittente e veniva modificato e riemesso così com'era. Qui invece:
+
+    - ogni messaggio diventa un TallyEvent compatto (__slots__) con tipo, mittente,
+      dati e istante di pubblicazione;
+    - i destinatari si iscrivono per tipo di evento e la tabella tipo -> destinatari
+      è una tupla ricostruita solo quando cambia un'iscrizione;
+    - gli eventi "coalescenti" (per ora solo faderChange) non vengono consegnati subito:
+      fino al prossimo tick di frame resta in attesa solo l'ultimo, quindi un fader
+      trascinato produce al massimo un evento per frame invece di decine;
+    - per ogni tipo di evento si contano eventi pubblicati, consegnati, assorbiti e la
+      latenza tra pubblicazione e consegna.
+
+Un evento non coalescente forza prima la consegna di quelli in attesa, così l'ordine
+tra, per esempio, un faderChange e un cut successivo non cambia.
+"""
+
+# eventi in cui solo l'ultimo valore conta
+COALESCED_EVENTS = frozenset({'faderChange'})
+
+
+class TallyEvent:
+    __slots__ = ("type", "sender", "data", "timestamp")
+
+    def __init__(self, eventType, sender, data=None, timestamp=None):
+        self.type = eventType
+        self.sender = sender
+        self.data = data or {}
+        self.timestamp = time.perf_counter_ns() if timestamp is None else timestamp
+
+    @classmethod
+    def fromDict(cls, tally_data):
+        """
+        Crea l'evento da un dizionario di tally {'sender', 'cmd', ...}.
+        """
+        data = {key: value for key, value in tally_data.items() if key not in ('sender', 'cmd')}
+        return cls(tally_data.get('cmd'), tally_data.get('sender'), data)
+
+    def toDict(self, sender=None):
+        """
+        Dizionario nel formato dei tally_SIGNAL, per i destinatari che si aspettano ancora un dict.
+        """
+        result = {'sender': sender or self.sender, 'cmd': self.type}
+        result.update(self.data)
+        return result
+
+    def __repr__(self):
+        return f"TallyEvent({self.type!r}, sender={self.sender!r}, data={self.data!r})"
+
+
+class EventBus(QObject):
+    """
+    :param tickInterval: intervallo in ms del tick che consegna gli eventi coalescenti
+                         (di default un frame a 60 fps). Con 0 il timer non parte e il
+                         tick va chiamato a mano, per esempio dal loop di mix.
+    """
+
+    def __init__(self, tickInterval=16, coalesced=COALESCED_EVENTS, parent=None):
+        super().__init__(parent)
+        self._coalesced = frozenset(coalesced)
+        self._subscribers = {}
+        self._dispatch = {}
+        self._pending = {}
+        self._stats = {}
+        self._timer = QTimer(self)
+        self._timer.timeout.connect(self.tick)
+        if tickInterval:
+            self._timer.start(tickInterval)
+
+    def subscribe(self, eventType, callback):
+        """
+        Iscrive callback(event) agli eventi di tipo eventType.
+        """
+        self._subscribers.setdefault(eventType, []).append(callback)
+        self._dispatch[eventType] = tuple(self._subscribers[eventType])
+
+    def unsubscribe(self, eventType, callback):
+        callbacks = self._subscribers.get(eventType, [])
+        if callback in callbacks:
+            callbacks.remove(callback)
+            self._dispatch[eventType] = tuple(callbacks)
+
+    def _statsFor(self, eventType):
+        stats = self._stats.get(eventType)
+        if stats is None:
+            # [pubblicati, consegnati, assorbiti, senza destinatari, ns di latenza totali, ns massimi]
+            stats = [0, 0, 0, 0, 0, 0]
+            self._stats[eventType] = stats
+        return stats
+
+    def publish(self, event):
+        """
+        Pubblica un evento: i coalescenti aspettano il tick, gli altri vengono consegnati subito.
+        """
+        stats = self._statsFor(event.type)
+        stats[0] += 1
+        if event.type in self._coalesced:
+            if event.type in self._pending:
+                stats[2] += 1
+            self._pending[event.type] = event
+            return
+        if self._pending:
+            self.tick()
+        self._deliver(event, stats)
+
+    def tick(self):
+        """
+        Consegna gli eventi coalescenti in attesa (uno per tipo, l'ultimo arrivato).
+        """
+        if not self._pending:
+            return
+        pending, self._pending = self._pending, {}
+        for event in pending.values():
+            self._deliver(event, self._statsFor(event.type))
+
+    def _deliver(self, event, stats):
+        callbacks = self._dispatch.get(event.type)
+        if not callbacks:
+            stats[3] += 1
+            return
+        latency = time.perf_counter_ns() - event.timestamp
+        stats[1] += 1
+        stats[4] += latency
+        if latency > stats[5]:
+            stats[5] = latency
+        for callback in callbacks:
+            callback(event)
+
+    def getStats(self):
+        """
+        :return: {tipo: {'published', 'dispatched', 'coalesced', 'unrouted', 'avgLatencyUs', 'maxLatencyUs'}}
+        """
+        result = {}
+        for eventType, (published, dispatched, coalesced, unrouted, total, peak) in self._stats.items():
+            result[eventType] = {
+                'published': published,
+                'dispatched': dispatched,
+                'coalesced': coalesced,
+                'unrouted': unrouted,
+                'avgLatencyUs': round(total / dispatched / 1000, 1) if dispatched else 0.0,
+                'maxLatencyUs': round(peak / 1000, 1),
+            }
+        return result
+
+    def resetStats(self):
+        self._stats.clear()
+
+    def stop(self):
+        self._timer.stop()
+        self.tick()
+
+
+if __name__ == "__main__":
+    import sys
+    from PyQt6.QtCore import QCoreApplication
+
+    app = QCoreApplication(sys.argv)
+    bus = EventBus()
+    received = []
+    bus.subscribe('faderChange', received.append)
+    bus.subscribe('cut', received.append)
+    for value in range(100):
+        bus.publish(TallyEvent('faderChange', 'keyboard', {'fade': value / 100}))
+    bus.publish(TallyEvent('cut', 'keyboard'))
+    for value in range(50):
+        bus.publish(TallyEvent('faderChange', 'keyboard', {'fade': value / 50}))
+    QTimer.singleShot(50, app.quit)
+    app.exec()
+    print(received)
+    print(bus.getStats())
@@ -1,5 +1,30 @@
 from PyQt6.QtCore import QObject, pyqtSignal
 
+from mainDir.errorClass.asyncLogger import rtLogger
+from mainDir.tallyManager.eventBus import EventBus, TallyEvent
+
+# ordine dei test sul mittente: il primo nome contenuto nel sender decide la famiglia
+SENDER_FAMILIES = ("mixBus", "keyboard", "remoteControl", "videoHub", "monitor", "camera", "streaming", "recorder")
+
+# comandi accettati per famiglia di mittente e segnali su cui vengono inoltrati
+KEYBOARD_ROUTES = {
+    'cut': ("mixBus_SIGNAL",),
+    'auto': ("mixBus_SIGNAL",),
+    'faderChange': ("mixBus_SIGNAL",),
+    'effectChange': ("mixBus_SIGNAL",),
+    'previewChange': ("mixBus_SIGNAL", "mixEffect_SIGNAL"),
+    'programChange': ("mixBus_SIGNAL", "mixEffect_SIGNAL"),
+    'replay': ("replay_SIGNAL",),
+}
+
+VIDEOHUB_ROUTES = {
+    'inputChanged': ("mixBus_SIGNAL",),
+    'inputRemoved': ("mixBus_SIGNAL",),
+    'stillImageReady': ("mixBus_SIGNAL",),
+    'stingerReady': ("mixBus_SIGNAL",),
+    'stingerChanged': ("mixBus_SIGNAL",),
+}
+
 
 class TallyManager(QObject):
     # Definisce i segnali che verranno emessi per comunicare con altri componenti
@@ -10,32 +35,55 @@ class TallyManager(QObject):
     camera_SIGNAL = pyqtSignal(dict)
     recorder_SIGNAL = pyqtSignal(dict)
     streaming_SIGNAL = pyqtSignal(dict)
+    replay_SIGNAL = pyqtSignal(dict)
 
     def __init__(self, parent=None):
         super().__init__(parent)
+        self.eventBus = EventBus(parent=self)
+        # mittente -> metodo di gestione, calcolato alla prima occorrenza di ogni sender
+        self._senderRoutes = {}
+        self._familyHandlers = {
+            "mixBus": self.processMixBus,
+            "keyboard": self.processKeyboard,
+            "remoteControl": self.processRemoteControl,
+            "videoHub": self.processVideoHub,
+            "monitor": self.processMonitor,
+            "camera": self.processCamera,
+            "streaming": self.processStreaming,
+            "recorder": self.processRecorder,
+        }
+        self._keyboardCommands = frozenset(KEYBOARD_ROUTES)
+        self._videoHubCommands = frozenset(VIDEOHUB_ROUTES)
+        for routes in (KEYBOARD_ROUTES, VIDEOHUB_ROUTES):
+            for cmd, signalNames in routes.items():
+                for signalName in signalNames:
+                    self.eventBus.subscribe(cmd, self._forwarder(getattr(self, signalName)))
+
+    def _forwarder(self, signal):
+        def forward(event):
+            signal.emit(event.toDict('tallyManager'))
+
+        return forward
+
+    def _route(self, sender):
+        handler = self._senderRoutes.get(sender)
+        if handler is None:
+            handler = self.processUnknownSender
+            for family in SENDER_FAMILIES:
+                if sender and family in sender:
+                    handler = self._familyHandlers[family]
+                    break
+            self._senderRoutes[sender] = handler
+        return handler
 
     def parseTallySignal(self, tally_data):
         """
         Interpreta i dati del segnale di tally ricevuto e decide come instradarli.
         """
-        print(f"TALLY MANAGER: Tally signal received {tally_data}")
         sender = tally_data.get('sender')
-        if "mixBus" in sender:
-            self.processMixBus(tally_data)
-        elif "keyboard" in sender:
-            self.processKeyboard(tally_data)
-        elif "videoHub" in sender:
-            self.processVideoHub(tally_data)
-        elif "monitor" in sender:
-            self.processMonitor(tally_data)
-        elif "camera" in sender:
-            self.processCamera(tally_data)
-        elif "streaming" in sender:
-            self.processStreaming(tally_data)
-        elif "recorder" in sender:
-            self.processRecorder(tally_data)
-        else:
-            self.processUnknownSender(tally_data)
+        rtLogger.debug(f"tally.{sender}", "TALLY MANAGER: Tally signal received", sender=sender,
+                       cmd=tally_data.get('cmd'))
+        self._route(sender)(tally_data)
 
     def processMixBus(self, tally_data):
         # Aggiungi logica se necessario
@@ -43,24 +91,28 @@ class TallyManager(QObject):
 
     def processKeyboard(self, tally_data):
         cmd = tally_data.get('cmd')
-        tally_data['sender'] = 'tallyManager'
-        valid_commands = ['cut', 'auto', 'faderChange', 'effectChange', 'previewChange', 'programChange']
-        if cmd in valid_commands:
-            self.mixBus_SIGNAL.emit(tally_data)
-            if cmd in ['previewChange', 'programChange']:
-                self.mixEffect_SIGNAL.emit(tally_data)
+        if cmd in self._keyboardCommands:
+            self.eventBus.publish(TallyEvent.fromDict(tally_data))
         else:
-            print(f"WARNING FROM TALLY MANAGER: Invalid command from Keyboard: {cmd}\n{tally_data}")
+            rtLogger.warning("tally.invalidKeyboardCmd", "TALLY MANAGER: Invalid command from Keyboard", cmd=cmd)
+
+    def processRemoteControl(self, tally_data):
+        """
+        I comandi del ControlServer sono gli stessi della tastiera e seguono lo stesso percorso.
+        """
+        cmd = tally_data.get('cmd')
+        if cmd in self._keyboardCommands:
+            self.eventBus.publish(TallyEvent.fromDict(tally_data))
+        else:
+            rtLogger.warning("tally.invalidRemoteCmd", "TALLY MANAGER: Invalid command from remote control",
+                             cmd=cmd)
 
     def processVideoHub(self, tally_data):
-        print(f"TALLY MANAGER: Video Hub signal received {tally_data}")
         cmd = tally_data.get('cmd')
-        tally_data['sender'] = 'tallyManager'
-        valid_commands = ['inputChanged', 'inputRemoved','stillImageReady', 'stingerReady', 'stingerChanged']
-        if cmd in valid_commands:
-            self.mixBus_SIGNAL.emit(tally_data)
+        if cmd in self._videoHubCommands:
+            self.eventBus.publish(TallyEvent.fromDict(tally_data))
         else:
-            print(f"WARNING FROM TALLY MANAGER: Invalid command from VideoHub: {cmd}\n{tally_data}")
+            rtLogger.warning("tally.invalidVideoHubCmd", "TALLY MANAGER: Invalid command from VideoHub", cmd=cmd)
 
     def processMonitor(self, tally_data):
         pass
@@ -75,4 +127,11 @@ class TallyManager(QObject):
         pass
 
     def processUnknownSender(self, tally_data):
-        print(f"WARNING FROM TALLY MANAGER: Unknown sender: {tally_data['sender']}\n{tally_data}")
+        rtLogger.warning("tally.unknownSender", "TALLY MANAGER: Unknown sender", sender=tally_data.get('sender'),
+                         cmd=tally_data.get('cmd'))
+
+    def getStats(self):
+        """
+        Contatori e latenze per tipo di evento, vedi EventBus.getStats.
+        """
+        return self.eventBus.getStats()
@@ -0,0 +1,168 @@
+import socket
+
+from PyQt6.QtCore import QObject
+
+from mainDir.errorClass.asyncLogger import rtLogger
+
+"""
+Uscita tally su UDP nel formato TSL UMD v3.1.
+
+Ogni pacchetto è di 18 byte:
+    byte 0      indirizzo del display + 0x80 (0..126)
+    byte 1      bit 0-3 tally 1-4, bit 4-5 luminosità (0-3)
+    byte 2-17   testo del display, 16 caratteri ASCII
+
+Per convenzione tally 1 è il rosso (program) e tally 2 il verde (preview).
+
+Per ogni slot dell'hub i quattro pacchetti possibili (spento, program, preview,
+entrambi) sono precalcolati: un cambio di stato è una lookup e un sendto su un socket
+UDP non bloccante. I pacchetti partono solo per gli slot il cui stato è cambiato; se il
+buffer del socket è pieno il pacchetto viene contato come perso, mai atteso, quindi
+l'uscita tally non può rallentare il render.
+"""
+
+TALLY_PROGRAM = 0x01
+TALLY_PREVIEW = 0x02
+PACKET_SIZE = 18
+
+
+def encodeTslPacket(address, tally, label="", brightness=3):
+    """
+    :param address: indirizzo del display (0..126).
+    :param tally: bit dei tally (TALLY_PROGRAM | TALLY_PREVIEW ...).
+    :param label: testo del display, troncato o completato a 16 caratteri.
+    :param brightness: luminosità 0..3.
+    """
+    if not 0 <= address <= 126:
+        raise ValueError(f"TSL address out of range: {address}")
+    control = (tally & 0x0F) | ((brightness & 0x03) << 4)
+    text = label.encode("ascii", "replace")[:16].ljust(16, b" ")
+    return bytes((0x80 + address, control)) + text
+
+
+def decodeTslPacket(packet):
+    """
+    :return: (indirizzo, bit dei tally, luminosità, testo)
+    """
+    if len(packet) != PACKET_SIZE or packet[0] < 0x80:
+        raise ValueError("Not a TSL UMD v3.1 packet")
+    return packet[0] - 0x80, packet[1] & 0x0F, (packet[1] >> 4) & 0x03, packet[2:].decode("ascii").rstrip()
+
+
+class TslTallyOutput(QObject):
+    def __init__(self, host="127.0.0.1", port=8900, slots=8, addressOffset=0, brightness=3, parent=None):
+        """
+        :param host: destinatario dei pacchetti (anche un indirizzo broadcast).
+        :param port: porta UDP del destinatario.
+        :param slots: numero di slot dell'hub (1..slots).
+        :param addressOffset: indirizzo TSL dello slot 1 meno 1.
+        :param brightness: luminosità dei tally, 0..3.
+        """
+        super().__init__(parent)
+        self.destination = (host, port)
+        self.addressOffset = addressOffset
+        self.brightness = brightness
+        self._socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self._socket.setsockopt(socket.SOL_SOCKET, socket.SO_BROADCAST, 1)
+        self._socket.setblocking(False)
+        self._labels = {}
+        self._packets = {}
+        self._state = {}
+        self.sent = 0
+        self.dropped = 0
+        self.updates = 0
+        for slot in range(1, slots + 1):
+            self.setLabel(slot, f"INPUT {slot}")
+
+    def setLabel(self, slot, label):
+        """
+        Cambia il testo del display di uno slot e ricalcola i suoi pacchetti.
+        Se il testo cambia il pacchetto dello stato attuale viene rimandato.
+        """
+        address = self.addressOffset + slot - 1
+        self._labels[slot] = label
+        self._packets[slot] = tuple(encodeTslPacket(address, tally, label, self.brightness) for tally in range(4))
+        if slot in self._state and not self._send(self._packets[slot][self._state[slot]]):
+            # invio fallito: lo slot risulta non inviato e il prossimo update lo riprova
+            del self._state[slot]
+
+    def update(self, program, preview):
+        """
+        Aggiorna i tally: manda un pacchetto solo per gli slot che hanno cambiato stato.
+        Lo stato di uno slot viene registrato solo se il pacchetto è partito: un invio
+        fallito viene riprovato all'update successivo anche se il tally non cambia.
+
+        :param program: insieme degli slot in onda (durante un mix anche la sorgente entrante).
+        :param preview: insieme degli slot in preview.
+        :return: numero di pacchetti inviati
+        """
+        self.updates += 1
+        changed = 0
+        for slot, packets in self._packets.items():
+            tally = (TALLY_PROGRAM if slot in program else 0) | (TALLY_PREVIEW if slot in preview else 0)
+            if self._state.get(slot) == tally:
+                continue
+            if self._send(packets[tally]):
+                self._state[slot] = tally
+                changed += 1
+            else:
+                self._state.pop(slot, None)
+        return changed
+
+    def updateFromState(self, state):
+        """
+        Tally da un MixState di MixBus018: durante una transizione (fade > 0 o auto in corso)
+        anche l'input in preview è in onda.
+        """
+        program = {state.programIndex}
+        if state.fade > 0 or state.autoFrames:
+            program.add(state.previewIndex)
+        return self.update(program, {state.previewIndex})
+
+    def _send(self, packet):
+        try:
+            self._socket.sendto(packet, self.destination)
+        except (BlockingIOError, InterruptedError):
+            self.dropped += 1
+            return 0
+        except OSError as e:
+            self.dropped += 1
+            rtLogger.warning("tally.tslSend", "TSL TALLY: send failed", destination=self.destination, error=e)
+            return 0
+        self.sent += 1
+        return 1
+
+    def getTally(self):
+        """
+        :return: {slot: bit dei tally} come ultimo inviato
+        """
+        return dict(self._state)
+
+    def getStats(self):
+        return {'updates': self.updates, 'sent': self.sent, 'dropped': self.dropped}
+
+    def close(self):
+        self._socket.close()
+
+
+if __name__ == "__main__":
+    import time
+
+    listener = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    listener.bind(("127.0.0.1", 0))
+    listener.settimeout(0.5)
+    output = TslTallyOutput("127.0.0.1", listener.getsockname()[1], slots=4)
+    output.setLabel(2, "CAM 2")
+
+    start = time.perf_counter()
+    for _ in range(10000):
+        output.update({1}, {2})  # stato invariato: nessun pacchetto dopo il primo giro
+    print(f"{(time.perf_counter() - start) * 100:.2f} us per unchanged update, {output.getStats()}")
+    output.update({1, 2}, {2})  # mix in corso
+    output.update({2}, {1})  # cut
+    try:
+        while True:
+            print(decodeTslPacket(listener.recv(64)))
+    except socket.timeout:
+        pass
+    output.close()
@@ -4,11 +4,14 @@ import sys
 from PyQt6.QtCore import QObject, pyqtSignal, QMetaObject, pyqtSlot, Qt, QTimer
 from PyQt6.QtWidgets import QApplication
 
+from mainDir.errorClass.asyncLogger import rtLogger
 from mainDir.errorClass.loggerClass import ErrorClass, error_logger
 from mainDir.inputDevice.generatorDevice.inputDevice_blackGenerator import InputDevice_BlackGenerator
 from mainDir.inputDevice.generatorDevice.inputDevice_colorGenerator import InputDevice_ColorGenerator
+from mainDir.inputDevice.generatorDevice.inputDevice_latencyGenerator import InputDevice_LatencyGenerator
 from mainDir.inputDevice.generatorDevice.inputDevice_noiseGenerator import InputDevice_NoiseGenerator
 from mainDir.inputDevice.generatorDevice.inputObject.generator_Black import BlackGenerator
+from mainDir.inputDevice.playerDevice.inputDevice_replayPlayer import InputDevice_ReplayPlayer
 from mainDir.inputDevice.playerDevice.inputDevice_stillImagePlayerGenerator import \
     InputDevice_StillImagePlayer
 from mainDir.inputDevice.systemWidget.inputDevice_stingerPlayer import InputDevice_StingerPlayer_mb
@@ -44,6 +47,7 @@ class VideoHubData018(QObject):
         """
         This adds an input device to the video hub matrix at the given position,
         but only if it is different from the current one.
+        The device it replaces is stopped, so its capture thread does not keep running.
         """
         position = str(position)
         current_device = self.getInputDevice(position)
@@ -51,6 +55,8 @@ class VideoHubData018(QObject):
             logging.info(f"Input device at position {position} already exists with the same type.")
             return
         logging.info(f"VIDEOHUBDATA - Adding new input device at position {position}")
+        if current_device and current_device is not inputDevice:
+            current_device.stop()
         self.videoHubMatrix[position] = inputDevice
 
     @error_logger.log(log_level=logging.DEBUG)
@@ -184,7 +190,7 @@ class VideoHubData018(QObject):
             'cmd': cmd,
             'position': position,
         }
-        print(f"Emitting tally signal: {tally_status}")
+        rtLogger.info(f"videoHub.{cmd}", "VIDEOHUBDATA -Emitting tally signal", cmd=cmd, position=position)
         self.tally_SIGNAL.emit(tally_status)
 
     @error_logger.log(log_level=logging.INFO)
@@ -245,10 +251,19 @@ class VideoHubData018(QObject):
             input_device = InputDevice_NoiseGenerator("NoiseGenerator")
             logging.debug(f"VIDEOHUBDATA -Noise generator added at position {position}")
             input_device.deserialize(input_data)
+        elif input_type == "LatencyPatternGenerator":
+            input_device = InputDevice_LatencyGenerator("LatencyGenerator")
+            logging.debug(f"VIDEOHUBDATA -Latency generator added at position {position}")
+            input_device.deserialize(input_data)
         elif input_type == "StillImagePlayer":
             input_device = InputDevice_StillImagePlayer("StillImagePlayer")
             logging.debug(f"VIDEOHUBDATA -Still image player added at position {position}")
             input_device.deserialize(input_data)
+        elif input_type == "ReplayPlayer":
+            # riproduce il ReplayBuffer attivo (quello del clean feed, avviato dal MainWindow)
+            input_device = InputDevice_ReplayPlayer("ReplayPlayer")
+            logging.debug(f"VIDEOHUBDATA -Replay player added at position {position}")
+            input_device.deserialize(input_data)
         else:
             logging.error(f"VIDEOHUBDATA -Unknown input type: {input_type} at position {position}")
             return
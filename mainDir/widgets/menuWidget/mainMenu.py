@@ -107,8 +107,75 @@ class MenuWidget(QMenuBar):
         view_menu.addAction(setMAinOutFullAction)
 
         setMAinOutFullAction.triggered.connect(self.mainWindow.setMainOutFullscreen)
+
+        exportTraceAction = QAction("Export Performance Trace", self)
+        view_menu.addAction(exportTraceAction)
+        exportTraceAction.triggered.connect(lambda checked: self.mainWindow.exportPerformanceTrace())
+
+        memoryAction = QAction("Memory Breakdown", self)
+        view_menu.addAction(memoryAction)
+        memoryAction.triggered.connect(self.mainWindow.showMemoryBreakdown)
+
+        remoteControlAction = QAction("Remote Control Server", self)
+        remoteControlAction.setCheckable(True)
+        view_menu.addAction(remoteControlAction)
+        remoteControlAction.toggled.connect(self.mainWindow.setControlServerEnabled)
+        self.tallyOutputAction = QAction("TSL Tally Output", self)
+        self.tallyOutputAction.setCheckable(True)
+        view_menu.addAction(self.tallyOutputAction)
+        self.tallyOutputAction.toggled.connect(self.onTallyOutputToggled)
+        sharedEncoderAction = QAction("Share Encoder Between Recording and Streaming", self)
+        sharedEncoderAction.setCheckable(True)
+        view_menu.addAction(sharedEncoderAction)
+        sharedEncoderAction.toggled.connect(self.mainWindow.setSharedEncoderEnabled)
+        replay_menu = view_menu.addMenu("Instant Replay")
+        self.replayAction = QAction("Instant Replay Buffer", self)
+        self.replayAction.setCheckable(True)
+        replay_menu.addAction(self.replayAction)
+        self.replayAction.toggled.connect(self.onReplayToggled)
+        replay_menu.addSeparator()
+        for text, params in (("Cue 5 s Back", {'replay': "cue", 'seconds': 5}),
+                             ("Cue 10 s Back", {'replay': "cue", 'seconds': 10}),
+                             ("Play 1x", {'replay': "play", 'speed': 1.0}),
+                             ("Play 0.5x", {'replay': "play", 'speed': 0.5}),
+                             ("Play 0.25x", {'replay': "play", 'speed': 0.25}),
+                             ("Pause", {'replay': "pause"})):
+            action = QAction(text, self)
+            replay_menu.addAction(action)
+            action.triggered.connect(lambda checked, params=params: self.mainWindow.replayCommand(params))
+        self.isoAction = QAction("ISO Recording...", self)
+        self.isoAction.setCheckable(True)
+        view_menu.addAction(self.isoAction)
+        self.isoAction.toggled.connect(self.onIsoToggled)
         return view_menu
 
+    def onTallyOutputToggled(self, checked):
+        if checked and not self.mainWindow.setTallyOutputEnabled(True):
+            # destinazione annullata o non valida: la voce torna spenta senza richiamare lo stop
+            self.tallyOutputAction.blockSignals(True)
+            self.tallyOutputAction.setChecked(False)
+            self.tallyOutputAction.blockSignals(False)
+        elif not checked:
+            self.mainWindow.setTallyOutputEnabled(False)
+
+    def onReplayToggled(self, checked):
+        if checked and not self.mainWindow.setReplayEnabled(True):
+            # l'utente non vuole sostituire l'input: la voce torna spenta
+            self.replayAction.blockSignals(True)
+            self.replayAction.setChecked(False)
+            self.replayAction.blockSignals(False)
+        elif not checked:
+            self.mainWindow.setReplayEnabled(False)
+
+    def onIsoToggled(self, checked):
+        if checked and not self.mainWindow.setIsoRecordingEnabled(True):
+            # selezione annullata o vuota
+            self.isoAction.blockSignals(True)
+            self.isoAction.setChecked(False)
+            self.isoAction.blockSignals(False)
+        elif not checked:
+            self.mainWindow.setIsoRecordingEnabled(False)
+
     def returnMenuHelp(self):
         # Crea il menu Help
         help_menu = self.addMenu("Help")